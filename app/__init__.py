@@ -8,38 +8,125 @@ db = SQLAlchemy()
 migrate = Migrate()
 
 
-def create_app():
+def create_app(config=None):
     app = Flask(__name__)
 
     # Configurações básicas
     app.config['SECRET_KEY'] = 'chave-secreta-temporaria'
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///financas.db'
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///financas.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
-    # Configuração para upload de arquivos
-    app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16 MB máximo
+    # Pool de conexões (ignorado pelo SQLite em memória)
+    app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', 5))
+    app.config['DB_MAX_OVERFLOW'] = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    app.config['DB_POOL_TIMEOUT'] = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+    app.config['DB_POOL_RECYCLE'] = int(os.environ.get('DB_POOL_RECYCLE', 3600))
+
+    # PRAGMAs aplicados a cada conexão do SQLite: com WAL as leituras dos
+    # relatórios não esperam a transação de escrita de uma importação
+    app.config['SQLITE_PRAGMAS'] = {
+        'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+        'mmap_size': int(os.environ.get('SQLITE_MMAP_MB', 256)) * 1024 * 1024,
+        'cache_size': -int(os.environ.get('SQLITE_CACHE_MB', 64)) * 1024,  # negativo = KiB
+        'temp_store': os.environ.get('SQLITE_TEMP_STORE', 'MEMORY'),
+    }
+
+    # Configuração para upload de arquivos (limite em MB configurável pelo ambiente)
+    app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_UPLOAD_MB', 256)) * 1024 * 1024
     app.config['UPLOAD_FOLDER'] = os.path.join('instance', 'uploads')
 
+    # Transações processadas por lote na importação de OFX
+    app.config['IMPORT_CHUNK_SIZE'] = int(os.environ.get('IMPORT_CHUNK_SIZE', 1000))
+
+    # Importações em segundo plano (IMPORT_ASYNC=0 processa dentro da requisição)
+    app.config['IMPORT_ASYNC'] = os.environ.get('IMPORT_ASYNC', '1').lower() not in ('0', 'false', 'no')
+    app.config['IMPORT_WORKERS'] = int(os.environ.get('IMPORT_WORKERS', 2))
+    app.config['IMPORT_PROCESSES'] = int(os.environ.get('IMPORT_PROCESSES', os.cpu_count() or 1))
+
+    # Contas (ACCTID, separadas por vírgula) cujo banco muda o FITID a cada extrato: deduplicadas
+    # pelo conteúdo como as transações sem FITID
+    app.config['DEDUP_CONTENT_ACCOUNTS'] = frozenset(
+        account.strip() for account in os.environ.get('DEDUP_CONTENT_ACCOUNTS', '').split(',') if account.strip()
+    )
+
+    # Paginação da lista de transações
+    app.config['TRANSACTIONS_PAGE_SIZE'] = int(os.environ.get('TRANSACTIONS_PAGE_SIZE', 100))
+    app.config['TRANSACTIONS_MAX_PAGE_SIZE'] = 1000
+
+    # Linhas lidas do banco por lote na exportação
+    app.config['EXPORT_BATCH_SIZE'] = int(os.environ.get('EXPORT_BATCH_SIZE', 1000))
+
+    # Motor dos relatórios: 'sql' lê o agregado mensal; 'columnar' mantém as transações
+    # em arrays NumPy no processo (app/analytics.py), atualizados de forma incremental
+    app.config['REPORTS_ENGINE'] = os.environ.get('REPORTS_ENGINE', 'sql')
+
+    # Imagens dos gráficos desenhados no servidor, guardadas por versão dos dados
+    app.config['CHART_CACHE_FOLDER'] = os.environ.get('CHART_CACHE_FOLDER', os.path.join('instance', 'charts'))
+
+    # Arquivo Parquet (pyarrow, opcional) particionado por ano/mês, atualizado após cada
+    # importação; exportações e séries históricas podem lê-lo com source=archive
+    app.config['ARCHIVE_ENABLED'] = os.environ.get('ARCHIVE_ENABLED', '0').lower() in ('1', 'true', 'yes')
+    app.config['ARCHIVE_FOLDER'] = os.environ.get('ARCHIVE_FOLDER', os.path.join('instance', 'archive'))
+
+    # Classificador Naive Bayes (app/classifier.py) treinado com as transações já categorizadas:
+    # na importação, sugere a categoria quando nenhuma palavra-chave corresponde, e a sugestão
+    # só é aplicada com confiança a partir do limiar; o modelo é retreinado após cada importação
+    app.config['CATEGORIZER_ENABLED'] = os.environ.get('CATEGORIZER_ENABLED', '1').lower() not in ('0', 'false', 'no')
+    app.config['CATEGORIZER_THRESHOLD'] = float(os.environ.get('CATEGORIZER_THRESHOLD', 0.9))
+    app.config['CATEGORIZER_FOLDER'] = os.environ.get('CATEGORIZER_FOLDER', os.path.join('instance', 'models'))
+
+    # Métricas por requisição expostas em /metrics; acima dos orçamentos a requisição gera um aviso no log
+    app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED', '1').lower() not in ('0', 'false', 'no')
+    app.config['METRICS_SLOW_REQUEST_MS'] = int(os.environ.get('METRICS_SLOW_REQUEST_MS', 500))
+    app.config['METRICS_QUERY_BUDGET'] = int(os.environ.get('METRICS_QUERY_BUDGET', 50))
+
+    # Meta de inicialização de cada worker (import da aplicação + create_app), verificada por flask benchmark-startup
+    app.config['STARTUP_TARGET_MS'] = int(os.environ.get('STARTUP_TARGET_MS', 1500))
+
+    # Sobrescritas explícitas (ex.: banco temporário das verificações de plano de consulta)
+    if config:
+        app.config.update(config)
+
+    from app import database
+    database.check_backend(app.config['SQLALCHEMY_DATABASE_URI'])
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', database.engine_options(app.config))
+
     # Inicializar extensões
     db.init_app(app)
+    database.init_app(app)
+    migrate.init_app(app, db, render_as_batch=True)  # batch: ALTER TABLE no SQLite
+
+    # Latência e SQL por requisição
+    from app import metrics
+    metrics.init_app(app)
+
+    # Fila local de importações
+    from app import jobs
+    jobs.init_app(app)
+
+    # Comandos de manutenção (flask rebuild-summary, ...)
+    from app.commands import register_commands
+    register_commands(app)
 
     # Criar pastas necessárias
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
-    # Importar blueprints
-    with app.app_context():
-        from app.routes.main import main_bp
-        from app.routes.transactions import transaction_bp
-        from app.routes.categories import category_bp
-        from app.routes.reports import reports_bp  # Novo blueprint de relatórios
-
-        # Registrar blueprints
-        app.register_blueprint(main_bp)
-        app.register_blueprint(transaction_bp)
-        app.register_blueprint(category_bp)
-        app.register_blueprint(reports_bp)  # Registrar o novo blueprint
+    # Importar blueprints (NumPy, matplotlib e pyarrow só são carregados no primeiro uso)
+    from app.routes.main import main_bp
+    from app.routes.transactions import transaction_bp
+    from app.routes.categories import category_bp
+    from app.routes.reports import reports_bp  # Novo blueprint de relatórios
+    from app.routes.metrics import metrics_bp
 
-        # Criar tabelas
-        db.create_all()
+    # Registrar blueprints
+    app.register_blueprint(main_bp)
+    app.register_blueprint(transaction_bp)
+    app.register_blueprint(category_bp)
+    app.register_blueprint(reports_bp)  # Registrar o novo blueprint
+    app.register_blueprint(metrics_bp)
 
+    # A inicialização não toca no esquema: tabelas são criadas e atualizadas
+    # pelas migrações (flask db upgrade), executadas antes de subir os workers
     return app
\ No newline at end of file
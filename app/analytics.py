@@ -0,0 +1,221 @@
+import threading
+import numpy as np
+from sqlalchemy import func, or_
+from app import db
+from app.models import Transaction, MonthlySummary
+
+# Snapshot compartilhado pelas requisições do processo
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def _period(year, month):
+    """Índice contínuo de mês (ano * 12 + mês - 1), usado nas séries mensais"""
+    return year * 12 + month - 1
+
+
+class TransactionSnapshot:
+    """Cópia colunar (arrays NumPy) das transações, para agregações vetorizadas
+
+    Colunas: id, period (ano * 12 + mês - 1), amount (centavos), category
+    (0 = sem categoria) e user (0 = sem usuário), ordenadas por id. A
+    atualização é incremental: linhas com id acima da marca d'água são
+    acrescentadas e linhas com updated_at a partir da última marca são
+    corrigidas no lugar. Exclusões são detectadas pela contagem total do
+    agregado mensal e forçam uma recarga completa.
+    """
+
+    COLUMNS = (
+        ('id', np.int64),
+        ('period', np.int32),
+        ('amount', np.int64),
+        ('category', np.int32),
+        ('user', np.int32),
+    )
+
+    def __init__(self):
+        self.max_id = 0
+        self.updated_at = None
+        for name, dtype in self.COLUMNS:
+            setattr(self, name, np.empty(0, dtype=dtype))
+
+    def __len__(self):
+        return len(self.id)
+
+    @staticmethod
+    def _query(*filters):
+        return db.session.query(
+            Transaction.id,
+            Transaction.year * 12 + Transaction.month - 1,
+            Transaction.amount_cents,
+            func.coalesce(Transaction.category_id, 0),
+            func.coalesce(Transaction.user_id, 0),
+        ).filter(*filters).order_by(Transaction.id)
+
+    def _columns(self, rows):
+        """Converte linhas (id, period, amount, category, user) em arrays"""
+        if not rows:
+            return [np.empty(0, dtype=dtype) for _, dtype in self.COLUMNS]
+        return [np.fromiter(column, dtype=dtype, count=len(rows))
+                for column, (_, dtype) in zip(zip(*rows), self.COLUMNS)]
+
+    def load(self):
+        """Carrega todas as transações"""
+        self.updated_at = db.session.query(func.max(Transaction.updated_at)).scalar()
+        columns = self._columns(self._query().all())
+        for (name, _), values in zip(self.COLUMNS, columns):
+            setattr(self, name, values)
+        self.max_id = int(self.id[-1]) if len(self.id) else 0
+
+    def refresh(self):
+        """Aplica as inserções e alterações desde a última marca d'água"""
+        updated_at = db.session.query(func.max(Transaction.updated_at)).scalar()
+        expected = db.session.query(func.coalesce(func.sum(MonthlySummary.count), 0)).scalar()
+
+        if updated_at != self.updated_at:
+            changed = [Transaction.id > self.max_id]
+            if self.updated_at is not None:
+                changed.append(Transaction.updated_at >= self.updated_at)
+            rows = self._query(or_(*changed)).all()
+            self.updated_at = updated_at
+
+            ids, period, amount, category, user = self._columns(rows)
+            existing = ids <= self.max_id
+
+            # Alterações: as linhas precisam estar no snapshot, senão houve exclusão
+            if existing.any():
+                positions = np.searchsorted(self.id, ids[existing])
+                if (positions >= len(self.id)).any() or (self.id[np.minimum(positions, len(self.id) - 1)] != ids[existing]).any():
+                    return self.load()
+                self.period[positions] = period[existing]
+                self.amount[positions] = amount[existing]
+                self.category[positions] = category[existing]
+                self.user[positions] = user[existing]
+
+            # Inserções: sempre com id acima da marca, já ordenadas
+            added = ~existing
+            if added.any():
+                for (name, _), values in zip(self.COLUMNS, (ids, period, amount, category, user)):
+                    setattr(self, name, np.concatenate([getattr(self, name), values[added]]))
+                self.max_id = int(self.id[-1])
+
+        if len(self) != expected:
+            self.load()
+
+    def mask(self, year=None, month=None, sign=None, category_id=None, user_id=None):
+        """Máscara booleana das transações que atendem aos filtros"""
+        mask = np.ones(len(self), dtype=bool)
+        if year is not None:
+            mask &= (self.period // 12) == year
+        if month is not None:
+            mask &= (self.period % 12) == month - 1
+        if sign is not None:
+            mask &= np.sign(self.amount) == sign
+        if category_id is not None:
+            mask &= self.category == category_id
+        if user_id is not None:
+            mask &= self.user == user_id
+        return mask
+
+    def category_totals(self, **filters):
+        """Soma (centavos) por categoria: {category_id: total}, com 0 = sem categoria"""
+        mask = self.mask(**filters)
+        categories, inverse = np.unique(self.category[mask], return_inverse=True)
+        totals = np.zeros(len(categories), dtype=np.int64)
+        np.add.at(totals, inverse, self.amount[mask])
+        return dict(zip(categories.tolist(), totals.tolist()))
+
+    def monthly_totals(self, year, **filters):
+        """Soma (centavos) de cada mês do ano: array de 12 posições"""
+        mask = self.mask(year=year, **filters)
+        totals = np.zeros(12, dtype=np.int64)
+        np.add.at(totals, self.period[mask] % 12, self.amount[mask])
+        return totals
+
+    def monthly_series(self, **filters):
+        """Série mensal contínua (sem lacunas) das somas: (períodos, totais em centavos)"""
+        mask = self.mask(**filters)
+        if not mask.any():
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int64)
+        periods = self.period[mask]
+        start = periods.min()
+        totals = np.zeros(periods.max() - start + 1, dtype=np.int64)
+        np.add.at(totals, periods - start, self.amount[mask])
+        return np.arange(start, start + len(totals), dtype=np.int32), totals
+
+    def period_totals(self, year, month=None):
+        """Receitas e despesas do período e do anterior (mesmo formato de summary.period_totals)"""
+        from app.models import from_cents
+        from app.summary import previous_period
+
+        prev_year, prev_month = previous_period(year, month)
+        totals = {}
+        for prefix, (y, m) in (('', (year, month)), ('previous_', (prev_year, prev_month))):
+            mask = self.mask(year=y, month=m)
+            amounts = self.amount[mask]
+            totals[f'{prefix}income'] = from_cents(int(amounts[amounts > 0].sum()))
+            totals[f'{prefix}expenses'] = from_cents(int(amounts[amounts < 0].sum()))
+        return totals
+
+
+def get_snapshot():
+    """Retorna o snapshot colunar do processo, atualizado com as últimas alterações"""
+    global _snapshot
+
+    with _snapshot_lock:
+        if _snapshot is None:
+            snapshot = TransactionSnapshot()
+            snapshot.load()
+            _snapshot = snapshot
+        else:
+            _snapshot.refresh()
+        return _snapshot
+
+
+def reset_snapshot():
+    """Descarta o snapshot; será recarregado no próximo uso"""
+    global _snapshot
+
+    with _snapshot_lock:
+        _snapshot = None
+
+
+def summary_monthly_series(sign, category_id=None):
+    """Série mensal contínua a partir do agregado mensal (motor SQL)"""
+    query = db.session.query(
+        MonthlySummary.year, MonthlySummary.month, func.sum(MonthlySummary.total_cents)
+    ).filter(MonthlySummary.sign == sign)
+    if category_id is not None:
+        query = query.filter(MonthlySummary.category_id == category_id)
+    return dense_monthly_series(query.group_by(MonthlySummary.year, MonthlySummary.month).all())
+
+
+def dense_monthly_series(rows):
+    """Converte [(ano, mês, total)] em série mensal contínua (períodos, totais em centavos)"""
+    if not rows:
+        return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int64)
+    periods = np.array([_period(year, month) for year, month, _ in rows], dtype=np.int32)
+    start = periods.min()
+    totals = np.zeros(periods.max() - start + 1, dtype=np.int64)
+    totals[periods - start] = [total for _, _, total in rows]
+    return np.arange(start, start + len(totals), dtype=np.int32), totals
+
+
+def rolling_mean(values, window):
+    """Média móvel de `window` meses; os primeiros meses usam a janela disponível"""
+    values = np.asarray(values, dtype=np.float64)
+    if not len(values):
+        return values
+    sums = np.cumsum(values)
+    sums[window:] = sums[window:] - sums[:-window]
+    counts = np.minimum(np.arange(1, len(values) + 1), window)
+    return sums / counts
+
+
+def linear_trend(values):
+    """Inclinação (por mês) e intercepto da reta de mínimos quadrados da série"""
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) < 2:
+        return 0.0, float(values[0]) if len(values) else 0.0
+    slope, intercept = np.polyfit(np.arange(len(values)), values, 1)
+    return float(slope), float(intercept)
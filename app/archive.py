@@ -0,0 +1,213 @@
+import json
+import os
+import shutil
+import threading
+from datetime import datetime
+from sqlalchemy import func, or_
+from app import db
+from app.models import Transaction, MonthlySummary
+
+# Colunas gravadas em cada arquivo (ano e mês ficam no caminho da partição)
+ARCHIVE_COLUMNS = ('id', 'date', 'description', 'amount_cents', 'category_id', 'user_id',
+                   'account_id', 'external_id', 'source_filename', 'batch_id')
+
+# Prefixos '_' e '.' são ignorados na descoberta dos arquivos do dataset
+MANIFEST = '_manifest.json'
+
+_archive_lock = threading.Lock()
+
+
+class ArchiveUnavailable(RuntimeError):
+    """Arquivo colunar desligado (ARCHIVE_ENABLED) ou pyarrow não instalado"""
+
+
+def _pyarrow():
+    """Importa o pyarrow sob demanda (dependência opcional)"""
+    try:
+        import pyarrow
+        import pyarrow.dataset
+        import pyarrow.fs
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ArchiveUnavailable('O arquivo colunar requer o pacote pyarrow') from e
+    return pyarrow
+
+
+def archive_path(app):
+    if not app.config['ARCHIVE_ENABLED']:
+        raise ArchiveUnavailable('Arquivo colunar desligado (ARCHIVE_ENABLED)')
+    return app.config['ARCHIVE_FOLDER']
+
+
+def _partition_dir(root, year, month):
+    return os.path.join(root, f'year={year}', f'month={month}')
+
+
+def _schema(pa):
+    return pa.schema([
+        ('id', pa.int64()),
+        ('date', pa.timestamp('us')),
+        ('description', pa.string()),
+        ('amount_cents', pa.int64()),
+        ('category_id', pa.int32()),
+        ('user_id', pa.int32()),
+        ('account_id', pa.string()),
+        ('external_id', pa.string()),
+        ('source_filename', pa.string()),
+        ('batch_id', pa.int64()),
+    ])
+
+
+def _load_manifest(root):
+    try:
+        with open(os.path.join(root, MANIFEST)) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {'max_id': 0, 'updated_at': None, 'partitions': {}}
+
+
+def _write_partition(pa, root, year, month):
+    """Regrava a partição (ano, mês) a partir do banco; retorna a quantidade de linhas"""
+    rows = db.session.query(*(getattr(Transaction, name) for name in ARCHIVE_COLUMNS)).filter(
+        Transaction.year == year,
+        Transaction.month == month
+    ).order_by(Transaction.date, Transaction.id).all()
+
+    directory = _partition_dir(root, year, month)
+    os.makedirs(directory, exist_ok=True)
+
+    columns = list(zip(*rows)) if rows else [[] for _ in ARCHIVE_COLUMNS]
+    table = pa.table(dict(zip(ARCHIVE_COLUMNS, columns)), schema=_schema(pa))
+
+    # Gravar ao lado e trocar de uma vez: leitores nunca veem um arquivo pela metade
+    temporary = os.path.join(directory, '.part-0.parquet.tmp')
+    pa.parquet.write_table(table, temporary, compression='zstd')
+    os.replace(temporary, os.path.join(directory, 'part-0.parquet'))
+    return len(rows)
+
+
+def sync_archive(app, full=False):
+    """Atualiza o arquivo Parquet particionado por ano/mês com as alterações do banco
+
+    Só as partições afetadas são regravadas: meses com transações inseridas ou
+    alteradas desde a última sincronização (marca d'água de id e updated_at) e
+    meses cuja contagem difere do agregado mensal (exclusões). Retorna a lista
+    de partições regravadas como (ano, mês).
+    """
+    pa = _pyarrow()
+    root = archive_path(app)
+
+    with _archive_lock:
+        manifest = {'max_id': 0, 'updated_at': None, 'partitions': {}} if full else _load_manifest(root)
+        if full and os.path.isdir(root):
+            shutil.rmtree(root)
+        os.makedirs(root, exist_ok=True)
+
+        max_id, updated_at = db.session.query(func.max(Transaction.id), func.max(Transaction.updated_at)).one()
+        counts = {
+            f'{year}-{month}': count
+            for year, month, count in db.session.query(
+                MonthlySummary.year, MonthlySummary.month, func.sum(MonthlySummary.count)
+            ).group_by(MonthlySummary.year, MonthlySummary.month)
+        }
+
+        changed = [Transaction.id > manifest['max_id']]
+        if manifest['updated_at']:
+            changed.append(Transaction.updated_at >= datetime.fromisoformat(manifest['updated_at']))
+        partitions = {
+            (year, month)
+            for year, month in db.session.query(Transaction.year, Transaction.month).filter(or_(*changed)).distinct()
+        }
+        partitions.update(
+            tuple(map(int, key.split('-'))) for key, count in counts.items()
+            if manifest['partitions'].get(key) != count
+        )
+
+        for year, month in sorted(partitions):
+            manifest['partitions'][f'{year}-{month}'] = _write_partition(pa, root, year, month)
+
+        # Meses que ficaram sem transações
+        for key in [key for key in manifest['partitions'] if key not in counts]:
+            year, month = key.split('-')
+            shutil.rmtree(_partition_dir(root, year, month), ignore_errors=True)
+            del manifest['partitions'][key]
+
+        manifest['max_id'] = max_id or 0
+        manifest['updated_at'] = updated_at.isoformat() if updated_at else None
+        manifest['synced_at'] = datetime.utcnow().isoformat()
+        with open(os.path.join(root, MANIFEST + '.tmp'), 'w') as file:
+            json.dump(manifest, file)
+        os.replace(os.path.join(root, MANIFEST + '.tmp'), os.path.join(root, MANIFEST))
+
+    return sorted(partitions)
+
+
+def archive_dataset(app):
+    """Dataset Parquet do arquivo, lido com memory-map e partições hive (year=/month=)"""
+    pa = _pyarrow()
+    root = archive_path(app)
+    if not os.path.exists(os.path.join(root, MANIFEST)):
+        raise ArchiveUnavailable('O arquivo colunar ainda não foi gerado (flask archive-sync)')
+
+    keys = pa.schema([('year', pa.int32()), ('month', pa.int32())])
+    return pa.dataset.dataset(
+        root,
+        schema=pa.unify_schemas([_schema(pa), keys]),
+        format='parquet',
+        partitioning=pa.dataset.partitioning(keys, flavor='hive'),
+        filesystem=pa.fs.LocalFileSystem(use_mmap=True)
+    )
+
+
+def archive_filter(year=None, month=None, category_id=None, sign=None):
+    """Expressão de filtro do dataset; ano e mês podam partições inteiras"""
+    pa = _pyarrow()
+    field = pa.dataset.field
+    conditions = []
+    if year is not None:
+        conditions.append(field('year') == year)
+    if month is not None:
+        conditions.append(field('month') == month)
+    if category_id is not None:
+        if category_id == -1:  # Sem categoria
+            conditions.append(field('category_id').is_null())
+        else:
+            conditions.append(field('category_id') == category_id)
+    if sign is not None:
+        conditions.append(field('amount_cents') < 0 if sign < 0 else field('amount_cents') > 0)
+
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def iter_archive_transactions(dataset, year=None, month=None, category_id=None):
+    """Transações do arquivo em ordem decrescente de (data, id), como dicionários
+
+    As partições são lidas uma a uma, da mais recente para a mais antiga, então
+    só um mês fica em memória por vez. A lista de partições vem dos caminhos
+    dos arquivos (year=/month=), sem ler nenhuma coluna.
+    """
+    pa = _pyarrow()
+    partitions = set()
+    for fragment in dataset.get_fragments(filter=archive_filter(year, month)):
+        keys = pa.dataset.get_partition_keys(fragment.partition_expression)
+        partitions.add((keys['year'], keys['month']))
+
+    for partition_year, partition_month in sorted(partitions, reverse=True):
+        table = dataset.to_table(
+            columns=list(ARCHIVE_COLUMNS),
+            filter=archive_filter(partition_year, partition_month, category_id)
+        ).sort_by([('date', 'descending'), ('id', 'descending')])
+        yield from table.to_pylist()
+
+
+def archive_monthly_series(dataset, sign, category_id=None):
+    """Totais mensais [(ano, mês, total em centavos)] agregados no arquivo, fora do SQLite"""
+    table = dataset.to_table(
+        columns=['year', 'month', 'amount_cents'],
+        filter=archive_filter(category_id=category_id, sign=sign)
+    )
+    grouped = table.group_by(['year', 'month']).aggregate([('amount_cents', 'sum')])
+    return list(zip(*grouped.select(['year', 'month', 'amount_cents_sum']).to_pydict().values()))
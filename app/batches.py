@@ -0,0 +1,108 @@
+import hashlib
+import json
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from app import db
+from app.models import ImportBatch, Transaction
+
+# Etapas da importação, na ordem em que acontecem
+STAGES = ('parse', 'dedup', 'categorize', 'insert', 'commit')
+
+
+class StageTimer:
+    """Acumula o tempo de relógio e de CPU de cada etapa da importação
+
+    A CPU é medida por thread (time.thread_time), já que várias importações
+    podem rodar ao mesmo tempo no pool de threads.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.wall = defaultdict(float)
+        self.cpu = defaultdict(float)
+
+    @contextmanager
+    def stage(self, name):
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            self.wall[name] += time.perf_counter() - wall
+            self.cpu[name] += time.thread_time() - cpu
+
+    def merge(self, timings):
+        """Soma tempos medidos em outro lugar (ex.: leitura no pool de processos)"""
+        for name, values in timings.items():
+            self.wall[name] += values['wall']
+            self.cpu[name] += values['cpu']
+
+    def elapsed(self):
+        """Tempo de relógio desde a criação do medidor"""
+        return time.perf_counter() - self.started
+
+    def as_dict(self):
+        return {
+            name: {'wall': round(self.wall[name], 6), 'cpu': round(self.cpu[name], 6)}
+            for name in sorted(self.wall, key=lambda name: STAGES.index(name) if name in STAGES else len(STAGES))
+        }
+
+
+class HashingReader:
+    """Envolve um arquivo binário e calcula o SHA-256 do que for lido"""
+
+    def __init__(self, file):
+        self.file = file
+        self.hash = hashlib.sha256()
+        self.size = 0
+
+    def read(self, size=-1):
+        data = self.file.read(size)
+        self.hash.update(data)
+        self.size += len(data)
+        return data
+
+    def hexdigest(self):
+        return self.hash.hexdigest()
+
+
+def start_batch(filename, job_id=None):
+    """Registra o início da importação de um arquivo e retorna o lote"""
+    batch = ImportBatch(filename=filename, job_id=job_id)
+    db.session.add(batch)
+    db.session.flush()
+    return batch
+
+
+def finish_batch(batch, result, timer, file_hash=None, file_size=None, error=None):
+    """Grava contadores, hash e tempos por etapa ao fim da importação do arquivo"""
+    batch.status = 'failed' if error else 'done'
+    batch.error = error
+    batch.file_hash = file_hash
+    batch.file_size = file_size
+    batch.rows_read = result.get('imported', 0) + result.get('skipped', 0)
+    batch.imported = result.get('imported', 0)
+    batch.skipped = result.get('skipped', 0)
+    batch.categorized = result.get('categorized', 0)
+    batch.wall_time = round(timer.elapsed(), 6)
+    batch.cpu_time = round(sum(timer.cpu.values()), 6)
+    batch.timings = json.dumps(timer.as_dict())
+    batch.finished_at = datetime.utcnow()
+
+
+def rollback_batch(batch):
+    """Desfaz um lote: remove suas transações com um único DELETE e atualiza o agregado
+
+    Retorna a quantidade de transações removidas. O commit fica a cargo de quem chama.
+    """
+    from app.summary import apply_deltas, deltas_from_query
+
+    apply_deltas(deltas_from_query(Transaction.batch_id == batch.id, factor=-1))
+    removed = db.session.execute(
+        Transaction.__table__.delete().where(Transaction.batch_id == batch.id)
+    ).rowcount
+
+    batch.status = 'rolled_back'
+    batch.rolled_back_at = datetime.utcnow()
+    return removed
@@ -0,0 +1,217 @@
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from sqlalchemy import update
+from app import db
+
+# Rotas medidas (nome do benchmark -> URL); {year} e {month} vêm dos dados gerados
+ENDPOINTS = {
+    'list_transactions': '/transactions/',
+    'list_transactions_filtered': '/transactions/?year={year}&month={month}',
+    'reports_category_spending': '/reports/data/category_spending?year={year}',
+    'reports_monthly_spending': '/reports/data/monthly_spending?year={year}',
+    'reports_kpi_summary_year': '/reports/data/kpi_summary?year={year}',
+    'reports_kpi_summary_month': '/reports/data/kpi_summary?year={year}&month={month}',
+    'reports_rolling_average': '/reports/data/rolling_average?year={year}',
+    'reports_trend': '/reports/data/trend?type=expenses',
+    'reports_chart_categories': '/reports/chart/categories.svg?year={year}&month={month}',
+    'reports_chart_monthly': '/reports/chart/monthly.png?year={year}',
+    'reports_imports': '/reports/imports',
+}
+
+# Módulos pesados que só devem ser carregados no primeiro uso, nunca na inicialização
+HEAVY_MODULES = ('numpy', 'pandas', 'matplotlib', 'seaborn', 'pyarrow')
+
+# Executado em um processo novo: mede o import da aplicação mais create_app
+STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from app import create_app
+create_app()
+elapsed = time.perf_counter() - start
+print(json.dumps({'seconds': elapsed, 'modules': [m for m in sys.argv[1:] if m in sys.modules]}))
+"""
+
+# Transações categorizadas uma a uma no benchmark de categorize_transaction
+CATEGORIZE_SAMPLE = 10000
+
+
+def summarize(samples, operations=1):
+    """Estatísticas de uma série de medições (em segundos)"""
+    median = statistics.median(samples)
+    return {
+        'runs': len(samples),
+        'operations': operations,
+        'median_ms': round(median * 1000, 3),
+        'min_ms': round(min(samples) * 1000, 3),
+        'max_ms': round(max(samples) * 1000, 3),
+        'per_operation_us': round(median / operations * 1e6, 3),
+    }
+
+
+def timed(function, repeat, setup=None):
+    """Executa `function` `repeat` vezes e retorna os tempos; `setup` roda antes de cada vez, fora da medição"""
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def _uncategorize_all():
+    """Remove a categoria de todas as transações, mantendo o agregado mensal"""
+    from app.models import Transaction
+    from app.summary import move_transactions
+
+    move_transactions(Transaction.category_id.isnot(None), category_id=None)
+    db.session.execute(update(Transaction).where(Transaction.category_id.isnot(None)).values(category_id=None, categorized_by=None))
+    db.session.commit()
+
+
+def measure_startup(repeat=5):
+    """Tempo de inicialização de um worker, medido em `repeat` processos novos
+
+    Retorna (tempos em segundos, módulos pesados carregados na inicialização).
+    O diretório de trabalho é temporário, então nenhuma pasta do projeto é criada.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get('PYTHONPATH')])))
+
+    samples, modules = [], set()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for _ in range(repeat):
+            output = subprocess.run(
+                [sys.executable, '-c', STARTUP_SCRIPT, *HEAVY_MODULES],
+                cwd=tmpdir, env=env, capture_output=True, text=True, check=True
+            ).stdout
+            result = json.loads(output.splitlines()[-1])
+            samples.append(result['seconds'])
+            modules.update(result['modules'])
+    return samples, sorted(modules)
+
+
+def run_benchmarks(rows=10000, extra_categories=100, repeat=5):
+    """Mede os caminhos críticos em um banco SQLite temporário com dados sintéticos
+
+    Mede a inicialização da aplicação, import_ofx (um extrato com `rows` transações), categorize_transaction,
+    a recategorização de todas as transações, a listagem de transações e cada
+    rota de /reports/data. Retorna um dicionário pronto para ser salvo em JSON.
+    """
+    from app import create_app
+    from app.models import Transaction, CategoryKeyword, Category
+    from app.services import categorize_transaction, import_ofx, recategorize_uncategorized
+    from app.synthetic import seed_keywords, synthetic_catalog, synthetic_rows, write_ofx
+
+    results = {}
+    startup, heavy_modules = measure_startup(repeat)
+    results['startup'] = summarize(startup)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tmpdir, 'bench.db'),
+            'UPLOAD_FOLDER': os.path.join(tmpdir, 'uploads'),
+            'CHART_CACHE_FOLDER': os.path.join(tmpdir, 'charts'),
+            'CATEGORIZER_FOLDER': os.path.join(tmpdir, 'models'),
+            'IMPORT_ASYNC': False,
+        })
+        catalog = synthetic_catalog(extra_categories)
+
+        ofx_path = os.path.join(tmpdir, 'bench.ofx')
+        with open(ofx_path, 'w', encoding='cp1252') as file:
+            write_ofx(file, synthetic_rows(rows, catalog=catalog))
+
+        with app.app_context():
+            db.create_all()
+            seed_keywords(catalog)
+
+            # Importação: uma única vez, já que a segunda ignoraria tudo como duplicado
+            def import_all():
+                import_ofx(ofx_path)
+                db.session.commit()
+
+            results['import_ofx'] = summarize(timed(import_all, 1), rows)
+
+            # Categorização de transações avulsas, fora da sessão
+            sample = [
+                Transaction(date=row['date'], amount_cents=row['amount_cents'], description=row['description'])
+                for row in synthetic_rows(min(rows, CATEGORIZE_SAMPLE), catalog=catalog, seed=7)
+            ]
+
+            def categorize_all():
+                for transaction in sample:
+                    categorize_transaction(transaction)
+
+            def reset_sample():
+                for transaction in sample:
+                    transaction.category_id = None
+
+            results['categorize_transaction'] = summarize(timed(categorize_all, repeat, reset_sample), len(sample))
+
+            # Recategorização de todas as transações, que antes perdem a categoria
+            def recategorize_all():
+                recategorize_uncategorized()
+                db.session.commit()
+
+            results['recategorize_all'] = summarize(timed(recategorize_all, repeat, _uncategorize_all), rows)
+
+            latest = Transaction.query.order_by(Transaction.date.desc()).first()
+            keywords = CategoryKeyword.query.count()
+            categories = Category.query.count()
+            db.session.remove()
+
+        client = app.test_client()
+        for name, url in ENDPOINTS.items():
+            url = url.format(year=latest.year, month=latest.month)
+
+            def get():
+                response = client.get(url)
+                if response.status_code != 200:
+                    raise RuntimeError(f'{url} retornou HTTP {response.status_code}')
+
+            get()  # Aquecimento: caches de consulta e de templates
+            results[name] = summarize(timed(get, repeat))
+
+        with app.app_context():
+            db.engine.dispose()
+
+    return {
+        'meta': {
+            'created_at': datetime.utcnow().isoformat(),
+            'rows': rows,
+            'categories': categories,
+            'keywords': keywords,
+            'repeat': repeat,
+            'startup_heavy_modules': heavy_modules,
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+        },
+        'results': results,
+    }
+
+
+def compare_results(current, baseline, threshold=0.2):
+    """Benchmarks cuja mediana piorou mais que `threshold` (fração) em relação à base
+
+    Retorna uma lista de (nome, mediana base em ms, mediana atual em ms, razão).
+    """
+    regressions = []
+    for name, result in current['results'].items():
+        previous = baseline['results'].get(name)
+        if not previous or not previous['median_ms']:
+            continue
+
+        ratio = result['median_ms'] / previous['median_ms']
+        if ratio > 1 + threshold:
+            regressions.append((name, previous['median_ms'], result['median_ms'], ratio))
+    return regressions
@@ -0,0 +1,160 @@
+import calendar
+import glob
+import hashlib
+import io
+import json
+import os
+from sqlalchemy import func
+from app import db
+from app.files import atomic_write
+from app.models import Category, MonthlySummary, from_cents
+
+CHARTS = ('categories', 'monthly')
+FORMATS = {'png': 'image/png', 'svg': 'image/svg+xml'}
+
+# Fatias exibidas no gráfico de categorias; as demais são somadas em "Outras"
+MAX_SLICES = 9
+UNCATEGORIZED_COLOR = '#CCCCCC'
+
+
+def _summary_filters(year, month=None, user_id=None):
+    filters = [MonthlySummary.year == year]
+    if month is not None:
+        filters.append(MonthlySummary.month == month)
+    if user_id is not None:
+        filters.append(MonthlySummary.user_id == user_id)
+    return filters
+
+
+def chart_data(chart, year, month=None, user_id=None):
+    """Linhas do agregado mensal que alimentam o gráfico
+
+    categories: [(nome, cor, total)] das despesas, do maior gasto ao menor
+    monthly: [(mês, sinal, total)] de receitas e despesas do ano
+    """
+    if chart == 'monthly':
+        return [tuple(row) for row in db.session.query(
+            MonthlySummary.month, MonthlySummary.sign, func.sum(MonthlySummary.total_cents)
+        ).filter(
+            *_summary_filters(year, user_id=user_id)
+        ).group_by(MonthlySummary.month, MonthlySummary.sign).order_by(MonthlySummary.month, MonthlySummary.sign)]
+
+    totals = db.session.query(
+        MonthlySummary.category_id, func.sum(MonthlySummary.total_cents)
+    ).filter(
+        *_summary_filters(year, month, user_id),
+        MonthlySummary.sign == -1  # Apenas despesas
+    ).group_by(MonthlySummary.category_id).all()
+
+    categories = {id: (name, color) for id, name, color in db.session.query(Category.id, Category.name, Category.color)}
+    rows = [
+        (*categories.get(category_id, ('Sem categoria', UNCATEGORIZED_COLOR)), total)
+        for category_id, total in totals if total
+    ]
+    return sorted(rows, key=lambda row: (row[2], row[0]))
+
+
+def data_version(chart, rows):
+    """Hash dos dados do gráfico: muda quando o agregado (ou nome/cor das categorias) muda"""
+    payload = json.dumps([chart, rows], default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def _currency(value, _position=None):
+    """Formata o eixo em reais, no padrão brasileiro"""
+    return 'R$ ' + f'{value:,.0f}'.replace(',', '.')
+
+
+def _render_monthly(figure, rows, year):
+    income = [0.0] * 12
+    expenses = [0.0] * 12
+    for month, sign, total in rows:
+        if 1 <= month <= 12:
+            series = income if sign > 0 else expenses
+            series[month - 1] = abs(float(from_cents(total)))
+
+    from matplotlib.ticker import FuncFormatter
+
+    axes = figure.subplots()
+    months = range(12)
+    axes.plot(months, income, marker='o', color='#28a745', label='Receitas')
+    axes.fill_between(months, income, color='#28a745', alpha=0.2)
+    axes.plot(months, expenses, marker='o', color='#dc3545', label='Despesas')
+    axes.fill_between(months, expenses, color='#dc3545', alpha=0.2)
+    axes.set_xticks(list(months), [calendar.month_abbr[month] for month in range(1, 13)])
+    axes.yaxis.set_major_formatter(FuncFormatter(_currency))
+    axes.set_ylim(bottom=0)
+    axes.set_title(f'Evolução mensal - {year}')
+    axes.grid(axis='y', alpha=0.3)
+    axes.legend(loc='lower center', bbox_to_anchor=(0.5, -0.25), ncol=2, frameon=False)
+
+
+def _render_categories(figure, rows, year, month):
+    from matplotlib.colors import is_color_like
+
+    slices = [(name, color if is_color_like(color) else UNCATEGORIZED_COLOR, abs(float(from_cents(total))))
+              for name, color, total in rows]
+    if len(slices) > MAX_SLICES:
+        others = sum(value for _, _, value in slices[MAX_SLICES - 1:])
+        slices = slices[:MAX_SLICES - 1] + [('Outras', '#999999', others)]
+
+    axes = figure.subplots()
+    period = f'{calendar.month_name[month]} {year}' if month else str(year)
+    axes.set_title(f'Gastos por categoria - {period}')
+    if not slices:
+        axes.text(0.5, 0.5, 'Nenhum dado disponível', ha='center', va='center')
+        axes.axis('off')
+        return
+
+    names, colors, values = zip(*slices)
+    total = sum(values)
+    axes.pie(values, colors=colors, startangle=90, counterclock=False,
+             wedgeprops={'width': 0.4, 'edgecolor': 'white'})
+    axes.legend([f'{name} ({value / total:.1%})' for name, value in zip(names, values)],
+                loc='center left', bbox_to_anchor=(1, 0.5), frameon=False, fontsize='small')
+    axes.axis('equal')
+
+
+def render_chart(chart, rows, year, month=None, image_format='png'):
+    """Desenha o gráfico com o matplotlib (sem pyplot, seguro entre threads) e retorna os bytes"""
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=(8, 4) if chart == 'monthly' else (7, 4), dpi=100)
+    if chart == 'monthly':
+        _render_monthly(figure, rows, year)
+    else:
+        _render_categories(figure, rows, year, month)
+
+    buffer = io.BytesIO()
+    # Sem data nos metadados: o mesmo dado gera sempre o mesmo arquivo
+    metadata = {'Date': None} if image_format == 'svg' else {'Software': None}
+    figure.savefig(buffer, format=image_format, bbox_inches='tight', metadata=metadata)
+    return buffer.getvalue()
+
+
+def get_chart(folder, chart, year, month=None, user_id=None, image_format='png'):
+    """Retorna (caminho, versão) da imagem, desenhando-a só se os dados mudaram
+
+    O arquivo é identificado por (usuário, ano, mês, gráfico, versão dos
+    dados); ao gravar uma nova versão as anteriores da mesma chave são
+    removidas.
+    """
+    rows = chart_data(chart, year, month, user_id)
+    version = data_version(chart, rows)
+
+    key = f'{chart}-u{user_id if user_id is not None else "all"}-{year}-{month or "all"}'
+    path = os.path.join(folder, f'{key}-{version}.{image_format}')
+    if os.path.exists(path):
+        return path, version
+
+    image = render_chart(chart, rows, year, month, image_format)
+    atomic_write(path, lambda file: file.write(image))
+
+    for stale in glob.glob(os.path.join(glob.escape(folder), f'{glob.escape(key)}-*.{image_format}')):
+        if stale != path:
+            try:
+                os.remove(stale)
+            except FileNotFoundError:
+                pass
+
+    return path, version
@@ -0,0 +1,270 @@
+import os
+import threading
+import zlib
+from datetime import datetime
+import numpy as np
+from sqlalchemy import func, or_, tuple_
+from app import db
+from app.dedup import normalize_description
+from app.files import atomic_write
+from app.models import Transaction, Category
+
+# Colunas do vetor de atributos: cada palavra cai em uma delas pelo hash (CRC32, estável entre processos)
+FEATURES = 2 ** 12
+
+# Suavização de Laplace: palavras nunca vistas em uma categoria não zeram a probabilidade
+ALPHA = 1.0
+
+MODEL_FILE = 'categorizer.npz'
+
+_categorizer_lock = threading.Lock()
+_training_lock = threading.Lock()
+
+
+def tokenize(description):
+    """Palavras da descrição normalizada; números soltos (parcelas, códigos de loja) são ignorados"""
+    return [token for token in normalize_description(description).split()
+            if len(token) > 1 and not token.isdigit()]
+
+
+def feature_indices(descriptions):
+    """Posições (linha, coluna) preenchidas da matriz de atributos, sem montar a matriz"""
+    cache = {}  # Descrições repetidas (o mesmo estabelecimento) são tokenizadas uma vez
+    rows, columns = [], []
+    for row, description in enumerate(descriptions):
+        features = cache.get(description)
+        if features is None:
+            features = cache[description] = sorted({zlib.crc32(token.encode('utf-8')) % FEATURES
+                                                    for token in tokenize(description)})
+        rows.extend([row] * len(features))
+        columns.extend(features)
+    return np.array(rows, dtype=np.intp), np.array(columns, dtype=np.intp)
+
+
+def feature_matrix(descriptions):
+    """Matriz (descrições x FEATURES) com 1 nas colunas das palavras presentes"""
+    matrix = np.zeros((len(descriptions), FEATURES), dtype=np.float32)
+    matrix[feature_indices(descriptions)] = 1.0
+    return matrix
+
+
+class NaiveBayesModel:
+    """Naive Bayes multinomial sobre atributos com hash, para um tipo de categoria
+
+    classes: ids das categorias; counts: ocorrências de cada atributo por
+    categoria; docs: transações de treino por categoria. As contagens são
+    somadas a cada treino, então o modelo aprende de forma incremental.
+    """
+
+    def __init__(self, classes=None, counts=None, docs=None):
+        self.classes = np.empty(0, dtype=np.int64) if classes is None else classes
+        self.counts = np.zeros((0, FEATURES)) if counts is None else counts
+        self.docs = np.zeros(0) if docs is None else docs
+        self._weights = None
+
+    def partial_fit(self, features, labels):
+        """Soma as transações de treino: posições (linha, coluna) de feature_indices e ids das categorias"""
+        new = np.setdiff1d(np.unique(labels), self.classes)
+        if len(new):
+            self.classes = np.concatenate([self.classes, new])
+            self.counts = np.vstack([self.counts, np.zeros((len(new), FEATURES))])
+            self.docs = np.concatenate([self.docs, np.zeros(len(new))])
+
+        # A matriz é quase toda zeros: somar só as posições preenchidas
+        index = {category_id: position for position, category_id in enumerate(self.classes)}
+        positions = np.array([index[label] for label in labels], dtype=np.intp)
+        rows, columns = features
+        np.add.at(self.counts, (positions[rows], columns), 1)
+        np.add.at(self.docs, positions, 1)
+        self._weights = None
+
+    def _log_weights(self):
+        """(log das probabilidades dos atributos por categoria, log das prioris), em cache até o próximo treino"""
+        if self._weights is None:
+            log_features = np.log(self.counts + ALPHA) - np.log(self.counts.sum(axis=1, keepdims=True) + ALPHA * FEATURES)
+            log_prior = np.log(self.docs) - np.log(self.docs.sum())
+            self._weights = (log_features.T.astype(np.float32), log_prior.astype(np.float32))
+        return self._weights
+
+    def predict(self, features, allowed=None):
+        """Categoria mais provável e sua probabilidade para cada linha, com um único produto de matrizes
+
+        allowed: ids das categorias que ainda existem; as demais são descartadas.
+        Retorna (ids, confianças); sem categorias possíveis, ids é None.
+        """
+        usable = self.docs > 0
+        if allowed is not None:
+            usable &= np.isin(self.classes, list(allowed))
+        if not usable.any() or not len(features):
+            return None, None
+
+        log_features, log_prior = self._log_weights()
+        scores = features @ log_features + log_prior
+        scores[:, ~usable] = -np.inf
+
+        # Softmax estável: a confiança é a probabilidade a posteriori da melhor categoria
+        scores -= scores.max(axis=1, keepdims=True)
+        probabilities = np.exp(scores)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+        best = probabilities.argmax(axis=1)
+        return self.classes[best], probabilities[np.arange(len(best)), best]
+
+
+class Categorizer:
+    """Modelos de despesas e de receitas, com a marca d'água (maior updated_at) do treino"""
+
+    def __init__(self, models=None, trained_until=None):
+        self.models = models or {True: NaiveBayesModel(), False: NaiveBayesModel()}
+        self.trained_until = trained_until
+
+    def train(self, rows, is_expense_by_category):
+        """Treina com linhas (id, description, amount_cents, category_id) já categorizadas
+
+        Linhas cujo sinal não combina com o tipo da categoria são ignoradas.
+        """
+        for is_expense, model in self.models.items():
+            selected = [row for row in rows
+                        if is_expense_by_category.get(row[3]) == is_expense and (row[2] < 0) == is_expense]
+            if selected:
+                model.partial_fit(feature_indices([row[1] for row in selected]), [row[3] for row in selected])
+
+    def predict(self, descriptions, is_expense, allowed=None):
+        """Sugestões [(categoria, confiança)] para descrições do mesmo tipo; (None, 0.0) sem modelo"""
+        ids, confidences = self.models[is_expense].predict(feature_matrix(descriptions), allowed)
+        if ids is None:
+            return [(None, 0.0)] * len(descriptions)
+        return [(int(category_id), float(confidence)) for category_id, confidence in zip(ids, confidences)]
+
+    def save(self, path):
+        """Grava os modelos em um .npz (ao lado e depois trocado, para workers nunca lerem pela metade)"""
+        trained_until = self.trained_until.isoformat() if self.trained_until else ''
+        arrays = {'trained_until': np.array(trained_until), 'features': np.array(FEATURES)}
+        for is_expense, model in self.models.items():
+            prefix = 'expense' if is_expense else 'income'
+            arrays[f'{prefix}_classes'] = model.classes
+            arrays[f'{prefix}_counts'] = model.counts
+            arrays[f'{prefix}_docs'] = model.docs
+
+        atomic_write(path, lambda file: np.savez_compressed(file, **arrays))
+
+    @classmethod
+    def load(cls, path):
+        """Lê os modelos gravados; None se o arquivo não existir ou for de outro formato
+
+        Modelos de outro número de atributos ou com a marca d'água antiga (maior
+        id) não são aproveitados: o próximo treino recomeça do zero.
+        """
+        try:
+            with np.load(path) as arrays:
+                if int(arrays['features']) != FEATURES or 'trained_until' not in arrays:
+                    return None
+                models = {
+                    is_expense: NaiveBayesModel(arrays[f'{prefix}_classes'], arrays[f'{prefix}_counts'],
+                                                arrays[f'{prefix}_docs'])
+                    for is_expense, prefix in ((True, 'expense'), (False, 'income'))
+                }
+                trained_until = str(arrays['trained_until'])
+                return cls(models, datetime.fromisoformat(trained_until) if trained_until else None)
+        except FileNotFoundError:
+            return None
+
+
+def model_path(app):
+    return os.path.join(app.config['CATEGORIZER_FOLDER'], MODEL_FILE)
+
+
+def _file_version(path):
+    """(inode, mtime) do arquivo do modelo, que muda a cada gravação (os.replace); None se não existir"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns
+
+
+def get_categorizer(app):
+    """Classificador carregado do disco; None se ainda não foi treinado
+
+    Fica em cache no processo enquanto o arquivo não muda: um treino feito
+    por outro processo (outro worker ou o flask train-categorizer) é
+    carregado na chamada seguinte.
+    """
+    path = model_path(app)
+    version = _file_version(path)
+    if version is None:
+        return None
+
+    cached = app.extensions.get('categorizer')
+    if cached is None or cached[0] != version:
+        with _categorizer_lock:
+            cached = app.extensions.get('categorizer')
+            if cached is None or cached[0] != version:
+                categorizer = Categorizer.load(path)
+                if categorizer is None:
+                    return None
+                cached = app.extensions['categorizer'] = (version, categorizer)
+    return cached[1]
+
+
+def _keyset_chunks(query, keys, chunk_size):
+    """Lotes da consulta ordenada pelas colunas `keys`, paginada por chave"""
+    last = None
+    while True:
+        page = query if last is None else query.filter(tuple_(*keys) > last)
+        rows = page.order_by(*keys).limit(chunk_size).all()
+        if not rows:
+            return
+        yield rows
+        last = tuple(getattr(rows[-1], key.key) for key in keys)
+
+
+def train_categorizer(app, full=False, chunk_size=1000):
+    """Treina o classificador com as transações categorizadas e grava o modelo
+
+    O treino é incremental: só entram as transações com updated_at acima da
+    marca d'água do modelo gravado, então categorias atribuídas depois a
+    transações antigas também são aprendidas. Categorias aplicadas pelo
+    próprio classificador ficam de fora, para ele não reforçar os próprios
+    palpites. As contagens da categoria anterior de uma transação alterada (e
+    de categorias excluídas) só saem com full=True, que treina do zero.
+    Retorna a quantidade de transações usadas no treino.
+    """
+    with _training_lock:
+        path = model_path(app)
+        categorizer = None if full else Categorizer.load(path)
+        categorizer = categorizer or Categorizer()
+        is_expense_by_category = {id: bool(is_expense) for id, is_expense in db.session.query(Category.id, Category.is_expense)}
+
+        # Alterações gravadas durante o treino ficam para a próxima rodada
+        until = db.session.query(func.max(Transaction.updated_at)).scalar()
+
+        query = db.session.query(
+            Transaction.id, Transaction.description, Transaction.amount_cents, Transaction.category_id,
+            Transaction.updated_at
+        ).filter(
+            Transaction.category_id.isnot(None),
+            or_(Transaction.categorized_by.is_(None), Transaction.categorized_by != 'classifier')
+        )
+        passes = []
+        if categorizer.trained_until is None:
+            # Transações anteriores à coluna updated_at (migração 0010) não têm data: entram no primeiro treino
+            passes.append((query.filter(Transaction.updated_at.is_(None)), (Transaction.id,)))
+        if until is not None:
+            changed = query.filter(Transaction.updated_at <= until)
+            if categorizer.trained_until is not None:
+                changed = changed.filter(Transaction.updated_at > categorizer.trained_until)
+            passes.append((changed, (Transaction.updated_at, Transaction.id)))
+
+        trained = 0
+        for pass_query, keys in passes:
+            for rows in _keyset_chunks(pass_query, keys, chunk_size):
+                categorizer.train([tuple(row)[:4] for row in rows], is_expense_by_category)
+                trained += len(rows)
+
+        # Mesmo sem nenhuma data a marca avança: as transações sem updated_at não entram de novo
+        categorizer.trained_until = max(categorizer.trained_until or datetime.min, until or datetime.min)
+
+        categorizer.save(path)
+        app.extensions['categorizer'] = (_file_version(path), categorizer)
+
+    return trained
@@ -0,0 +1,177 @@
+import json
+import os
+from datetime import datetime
+import click
+from app import db
+
+
+def register_commands(app):
+    """Registra os comandos de linha de comando da aplicação (flask <comando>)"""
+
+    @app.cli.command('rebuild-summary')
+    def rebuild_summary():
+        """Recalcula o agregado mensal a partir das transações"""
+        from app.summary import rebuild_monthly_summary
+
+        rebuild_monthly_summary()
+        db.session.commit()
+        click.echo('Agregado mensal recalculado.')
+
+    @app.cli.command('merge-duplicates')
+    @click.option('--dry-run', is_flag=True, help='Só conta as duplicatas, sem removê-las.')
+    def merge_duplicates(dry_run):
+        """Remove transações duplicadas pelo fingerprint de conteúdo (FITID vazio ou instável)"""
+        from app.dedup import merge_duplicate_transactions
+
+        groups, removed = merge_duplicate_transactions(dry_run=dry_run)
+        if dry_run:
+            db.session.rollback()
+            click.echo(f'{removed} duplicatas em {groups} grupos (nada foi removido).')
+        else:
+            db.session.commit()
+            click.echo(f'{removed} duplicatas removidas em {groups} grupos.')
+
+    @app.cli.command('archive-sync')
+    @click.option('--full', is_flag=True, help='Descarta o arquivo e regrava todas as partições.')
+    def archive_sync(full):
+        """Atualiza o arquivo Parquet com as transações alteradas desde a última sincronização"""
+        from app.archive import ArchiveUnavailable, sync_archive
+
+        try:
+            partitions = sync_archive(app, full=full)
+        except ArchiveUnavailable as e:
+            raise click.ClickException(str(e))
+        click.echo(f'{len(partitions)} partições regravadas em {app.config["ARCHIVE_FOLDER"]}.')
+
+    @app.cli.command('train-categorizer')
+    @click.option('--full', is_flag=True, help='Descarta o modelo gravado e treina com todas as transações.')
+    def train_categorizer_command(full):
+        """Treina o classificador de categorias com as transações já categorizadas"""
+        from app.classifier import model_path, train_categorizer
+
+        trained = train_categorizer(app, full=full)
+        click.echo(f'Classificador treinado com {trained} transações ({model_path(app)}).')
+
+    @app.cli.command('check-query-plans')
+    @click.option('--rows', default=5000, show_default=True, help='Transações sintéticas no banco temporário.')
+    @click.option('--verbose', '-v', is_flag=True, help='Mostra o plano de todas as consultas.')
+    def check_query_plans_command(rows, verbose):
+        """Verifica se as rotas de leitura evitam varrer tabelas grandes por inteiro"""
+        from app.query_plans import check_query_plans
+
+        failed = False
+        for url, (status, statements) in check_query_plans(rows).items():
+            scans = [item for item in statements if item[2]]
+            ok = status == 200 and not scans
+            failed = failed or not ok
+            click.echo(f'{"OK   " if ok else "FALHA"} {url} (HTTP {status}, {len(statements)} consultas)')
+
+            for statement, plan, full_scans in statements:
+                if verbose or full_scans:
+                    click.echo('    ' + ' '.join(statement.split()))
+                    for detail in plan:
+                        click.echo(f'        {detail}')
+
+        if failed:
+            raise SystemExit(1)
+        click.echo('Nenhuma varredura completa de tabela grande.')
+
+    @app.cli.group('synthetic')
+    def synthetic():
+        """Gera dados sintéticos (extratos OFX e bancos populados)"""
+
+    @synthetic.command('ofx')
+    @click.argument('path', type=click.Path(dir_okay=False, writable=True))
+    @click.option('--rows', default=10000, show_default=True, help='Transações no extrato.')
+    @click.option('--categories', default=0, show_default=True, help='Categorias geradas além das padrão.')
+    @click.option('--years', default=3, show_default=True)
+    @click.option('--seed', default=42, show_default=True)
+    @click.option('--account', default='0001-SINTETICO', show_default=True)
+    def synthetic_ofx(path, rows, categories, years, seed, account):
+        """Grava um extrato OFX com transações sintéticas"""
+        from app.synthetic import synthetic_catalog, synthetic_rows, write_ofx
+
+        catalog = synthetic_catalog(categories, seed=seed)
+        with open(path, 'w', encoding='cp1252') as file:
+            write_ofx(file, synthetic_rows(rows, years=years, seed=seed, account_id=account, catalog=catalog),
+                      account_id=account)
+        click.echo(f'{rows} transações gravadas em {path}.')
+
+    @synthetic.command('seed')
+    @click.option('--rows', default=10000, show_default=True, help='Transações inseridas.')
+    @click.option('--categories', default=0, show_default=True, help='Categorias geradas além das padrão.')
+    @click.option('--users', default=0, show_default=True, help='Usuários (0 = transações sem usuário).')
+    @click.option('--years', default=3, show_default=True)
+    @click.option('--seed', default=42, show_default=True)
+    def synthetic_seed(rows, categories, users, years, seed):
+        """Popula o banco configurado com categorias, palavras-chave e transações sintéticas"""
+        from app.synthetic import seed_database
+
+        seed_database(rows, extra_categories=categories, users=users, years=years, seed=seed)
+        click.echo(f'{rows} transações sintéticas inseridas.')
+
+    @app.cli.command('benchmark')
+    @click.option('--rows', default=10000, show_default=True, help='Transações no extrato importado.')
+    @click.option('--categories', default=100, show_default=True, help='Categorias geradas além das padrão.')
+    @click.option('--repeat', default=5, show_default=True, help='Execuções por benchmark.')
+    @click.option('--output', type=click.Path(dir_okay=False), help='Arquivo JSON dos resultados.')
+    @click.option('--compare', 'baseline', type=click.Path(exists=True, dir_okay=False),
+                  help='Resultados anteriores para comparação.')
+    @click.option('--threshold', default=0.2, show_default=True, help='Piora tolerada na mediana (fração).')
+    def benchmark(rows, categories, repeat, output, baseline, threshold):
+        """Mede importação, categorização, listagem e relatórios em um banco temporário"""
+        from app.benchmarks import run_benchmarks, compare_results
+
+        results = run_benchmarks(rows, extra_categories=categories, repeat=repeat)
+        for name, result in results['results'].items():
+            click.echo(f'{name:30} {result["median_ms"]:>10.2f} ms  '
+                       f'({result["per_operation_us"]:.2f} us/op, {result["runs"]} execuções)')
+
+        if output is None:
+            output = os.path.join(app.instance_path, 'benchmarks', f'{datetime.now():%Y%m%d-%H%M%S}.json')
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w') as file:
+            json.dump(results, file, indent=2)
+        click.echo(f'Resultados gravados em {output}.')
+
+        if results['meta']['startup_heavy_modules']:
+            click.echo('Aviso: módulos pesados carregados na inicialização: '
+                       + ', '.join(results['meta']['startup_heavy_modules']))
+
+        if baseline:
+            with open(baseline) as file:
+                previous = json.load(file)
+            if previous['meta']['rows'] != rows:
+                click.echo(f'Aviso: a base foi medida com {previous["meta"]["rows"]} transações.')
+
+            regressions = compare_results(results, previous, threshold)
+            for name, before, after, ratio in regressions:
+                click.echo(f'REGRESSÃO {name}: {before:.2f} ms -> {after:.2f} ms ({ratio:.2f}x)')
+            if regressions:
+                raise SystemExit(1)
+            click.echo('Nenhuma regressão acima do limite.')
+
+    @app.cli.command('benchmark-startup')
+    @click.option('--repeat', default=5, show_default=True, help='Processos iniciados.')
+    @click.option('--target-ms', type=float, help='Tempo máximo de inicialização (padrão: STARTUP_TARGET_MS).')
+    def benchmark_startup(repeat, target_ms):
+        """Mede o tempo de inicialização de um worker e falha acima da meta ou com imports pesados"""
+        import statistics
+        from app.benchmarks import measure_startup
+
+        target_ms = target_ms or app.config['STARTUP_TARGET_MS']
+        samples, modules = measure_startup(repeat)
+        median_ms = statistics.median(samples) * 1000
+        click.echo(f'Inicialização: mediana {median_ms:.0f} ms (mín. {min(samples) * 1000:.0f} ms, '
+                   f'máx. {max(samples) * 1000:.0f} ms, {repeat} processos); meta {target_ms:.0f} ms')
+
+        failed = False
+        if modules:
+            click.echo('FALHA módulos pesados carregados na inicialização: ' + ', '.join(modules))
+            failed = True
+        if median_ms > target_ms:
+            click.echo('FALHA inicialização acima da meta')
+            failed = True
+        if failed:
+            raise SystemExit(1)
+        click.echo('Inicialização dentro da meta.')
@@ -0,0 +1,68 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from app import db
+
+
+# Bancos com INSERT ... ON CONFLICT e RETURNING, usados na importação e no agregado mensal
+SUPPORTED_BACKENDS = ('sqlite', 'postgresql')
+
+
+class UnsupportedDatabase(RuntimeError):
+    """DATABASE_URL aponta para um banco sem os recursos de que a aplicação depende"""
+
+
+def check_backend(uri):
+    """Recusa na inicialização os bancos que quebrariam importações e recategorizações"""
+    backend = make_url(uri).get_backend_name()
+    if backend not in SUPPORTED_BACKENDS:
+        raise UnsupportedDatabase(
+            f'Banco "{backend}" não suportado: a importação e o agregado mensal usam '
+            f'INSERT ... ON CONFLICT e RETURNING (use {" ou ".join(SUPPORTED_BACKENDS)})'
+        )
+
+
+def is_sqlite(uri):
+    return make_url(uri).get_backend_name() == 'sqlite'
+
+
+def _is_memory_sqlite(url):
+    return url.database in (None, '', ':memory:') or url.query.get('mode') == 'memory'
+
+
+def engine_options(config):
+    """Opções do engine (pool de conexões) conforme o banco configurado
+
+    SQLite em memória usa um pool de conexão única, que não aceita
+    dimensionamento; nos demais bancos o pool segue as configurações DB_POOL_*.
+    """
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() == 'sqlite' and _is_memory_sqlite(url):
+        return {}
+
+    options = {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+    }
+    if url.get_backend_name() != 'sqlite':
+        # Servidores derrubam conexões ociosas; o SQLite local não
+        options['pool_recycle'] = config['DB_POOL_RECYCLE']
+        options['pool_pre_ping'] = True
+    return options
+
+
+def init_app(app):
+    """Aplica os PRAGMAs de SQLITE_PRAGMAS a cada nova conexão do SQLite"""
+    if not is_sqlite(app.config['SQLALCHEMY_DATABASE_URI']):
+        return
+
+    pragmas = app.config['SQLITE_PRAGMAS']
+
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+        cursor.close()
+
+    with app.app_context():
+        event.listen(db.engine, 'connect', set_pragmas)
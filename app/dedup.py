@@ -0,0 +1,131 @@
+import hashlib
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from sqlalchemy import func, update
+from app import db
+from app.models import Transaction
+from app.summary import apply_deltas, deltas_from_query, move_transactions
+
+
+def normalize_description(description):
+    """Descrição sem acentos, em maiúsculas, só com letras e números separados por um espaço"""
+    text = unicodedata.normalize('NFKD', description or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(re.sub(r'[^0-9A-Z]+', ' ', text.upper()).split())
+
+
+def transaction_fingerprint(account_id, date, amount_cents, description):
+    """Hash do conteúdo da transação: conta, dia, valor em centavos e descrição normalizada
+
+    Não depende do FITID, que alguns bancos enviam vazio ou mudam a cada extrato.
+    """
+    content = f'{account_id or ""}|{date:%Y-%m-%d}|{amount_cents}|{normalize_description(description)}'
+    return hashlib.blake2b(content.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def uses_content_dedup(row, accounts=()):
+    """Se a linha é deduplicada pelo conteúdo: FITID vazio ou conta com FITID instável
+
+    Com um FITID confiável, duas compras idênticas em extratos diferentes são
+    transações distintas e não podem ser descartadas pelo conteúdo.
+    """
+    return row['external_id'] is None or row['account_id'] in accounts
+
+
+def assign_fingerprints(rows, occurrences, accounts=()):
+    """Calcula fingerprint e ocorrência de cada linha, na ordem do extrato
+
+    A ocorrência numera transações idênticas do mesmo extrato (dois cafés
+    iguais no mesmo dia são 1 e 2). `occurrences` é o Counter do arquivo
+    inteiro, compartilhado entre os lotes de uma importação. Linhas fora da
+    deduplicação por conteúdo (uses_content_dedup) ficam sem fingerprint.
+    accounts: contas (ACCTID) cujo banco envia FITIDs instáveis.
+    """
+    for row in rows:
+        if not uses_content_dedup(row, accounts):
+            row['fingerprint'] = None
+            row['occurrence'] = 1
+            continue
+        fingerprint = transaction_fingerprint(row['account_id'], row['date'], row['amount_cents'], row['description'])
+        occurrences[fingerprint] += 1
+        row['fingerprint'] = fingerprint
+        row['occurrence'] = occurrences[fingerprint]
+
+
+def _duplicates_to_remove(transactions):
+    """Escolhe, entre transações de mesmo fingerprint, as que sobram e as que são duplicatas
+
+    Ocorrências legítimas vêm do mesmo extrato; então o número de transações
+    reais é o maior número de repetições dentro de uma única origem (lote de
+    importação ou arquivo). As mais antigas (menor id) são mantidas.
+    """
+    per_source = Counter(transaction.batch_id or transaction.source_filename for transaction in transactions)
+    keep = max(per_source.values())
+    ordered = sorted(transactions, key=lambda transaction: transaction.id)
+    return ordered[:keep], ordered[keep:]
+
+
+def merge_duplicate_transactions(dry_run=False):
+    """Encontra e remove transações duplicadas pelo fingerprint (importações com FITID instável)
+
+    As duplicatas são removidas mantendo o agregado mensal; a categoria de
+    uma duplicata passa para a transação mantida quando esta não tem
+    categoria, e as ocorrências mantidas são renumeradas a partir de 1 para
+    que as próximas importações as encontrem. O commit fica a cargo de quem
+    chama. Retorna (grupos com duplicatas, transações removidas).
+    """
+    from app.services import SQL_CHUNK_SIZE, chunked
+
+    fingerprints = [fingerprint for fingerprint, in db.session.query(Transaction.fingerprint).filter(
+        Transaction.fingerprint.isnot(None)
+    ).group_by(Transaction.fingerprint).having(func.count(Transaction.id) > 1)]
+
+    groups = removed = 0
+    for chunk in chunked(fingerprints, SQL_CHUNK_SIZE):
+        transactions = defaultdict(list)
+        for transaction in db.session.query(
+            Transaction.id, Transaction.fingerprint, Transaction.batch_id,
+            Transaction.source_filename, Transaction.category_id, Transaction.categorized_by
+        ).filter(Transaction.fingerprint.in_(chunk)):
+            transactions[transaction.fingerprint].append(transaction)
+
+        to_delete, to_categorize, to_renumber = [], defaultdict(list), []
+        for group in transactions.values():
+            kept, duplicates = _duplicates_to_remove(group)
+            if not duplicates:
+                continue
+            groups += 1
+            to_delete.extend(transaction.id for transaction in duplicates)
+            to_renumber.extend((occurrence, transaction.id) for occurrence, transaction in enumerate(kept, 1))
+
+            categories = [(transaction.category_id, transaction.categorized_by)
+                          for transaction in duplicates if transaction.category_id]
+            for transaction in kept:
+                if not transaction.category_id and categories:
+                    to_categorize[categories.pop(0)].append(transaction.id)
+
+        removed += len(to_delete)
+        if dry_run or not to_delete:
+            continue
+
+        for (category_id, categorized_by), ids in to_categorize.items():
+            move_transactions(Transaction.id.in_(ids), category_id=category_id)
+            db.session.execute(update(Transaction).where(Transaction.id.in_(ids)).values(
+                category_id=category_id, categorized_by=categorized_by
+            ))
+
+        apply_deltas(deltas_from_query(Transaction.id.in_(to_delete), factor=-1))
+        db.session.execute(Transaction.__table__.delete().where(Transaction.id.in_(to_delete)))
+
+        # Em duas passadas (negativo, depois o valor final) para não colidir na chave única
+        table = Transaction.__table__
+        db.session.execute(
+            table.update().where(table.c.id.in_([id for _, id in to_renumber])).values(occurrence=-table.c.occurrence)
+        )
+        db.session.execute(
+            update(Transaction),
+            [{'id': id, 'occurrence': occurrence} for occurrence, id in to_renumber]
+        )
+
+    return groups, removed
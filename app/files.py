@@ -0,0 +1,24 @@
+import os
+import tempfile
+
+
+def atomic_write(path, writer):
+    """Grava o arquivo ao lado e o troca de uma vez: leitores nunca veem um arquivo pela metade
+
+    writer recebe o arquivo temporário, aberto em modo binário. O nome
+    temporário é único por gravação, então threads ou processos que gravam o
+    mesmo caminho não disputam o arquivo; a última troca prevalece. Se a
+    gravação ou a troca falhar, o temporário é removido.
+    """
+    folder = os.path.dirname(path) or '.'
+    os.makedirs(folder, exist_ok=True)
+
+    # Prefixo '.': fora dos globs de quem lista a pasta
+    file = tempfile.NamedTemporaryFile(dir=folder, prefix='.', suffix='.tmp', delete=False)
+    try:
+        with file:
+            writer(file)
+        os.replace(file.name, path)
+    except BaseException:
+        os.remove(file.name)
+        raise
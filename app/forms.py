@@ -1,5 +1,5 @@
 from flask_wtf import FlaskForm
-from flask_wtf.file import FileField, FileRequired, FileAllowed
+from flask_wtf.file import MultipleFileField, FileRequired, FileAllowed
 from wtforms import StringField, TextAreaField, BooleanField, SelectField, SubmitField
 from wtforms.validators import DataRequired, Length, Optional
 
@@ -11,15 +11,18 @@ class CategoryForm(FlaskForm):
     submit = SubmitField('Salvar')
 
 class KeywordForm(FlaskForm):
-    keyword = StringField('Palavra-chave', validators=[DataRequired(), Length(max=64)])
+    # O índice de trigramas (app/search.py) só procura trechos de 3 caracteres ou mais
+    keyword = StringField('Palavra-chave', validators=[
+        DataRequired(), Length(min=3, max=64, message='Use de 3 a 64 caracteres')
+    ])
     match_type = SelectField('Tipo de Correspondência',
                              choices=[('contains', 'Contém'), ('exact', 'É exatamente')],
                              default='contains')
     submit = SubmitField('Adicionar')
 
 class UploadForm(FlaskForm):
-    file = FileField('Arquivo OFX', validators=[
+    file = MultipleFileField('Arquivos OFX', validators=[
         FileRequired(),
-        FileAllowed(['ofx'], 'Apenas arquivos OFX são permitidos')
+        FileAllowed(['ofx', 'zip'], 'Apenas arquivos OFX ou ZIP são permitidos')
     ])
     submit = SubmitField('Importar')
\ No newline at end of file
@@ -0,0 +1,176 @@
+import json
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from flask import current_app
+from app import db
+from app.models import ImportJob, ImportBatch
+
+_parse_pool_lock = threading.Lock()
+
+
+def init_app(app):
+    """Cria o pool de threads que processa as importações em segundo plano
+
+    Se houver um classificador gravado, ele é carregado pelo próprio pool, sem
+    atrasar a inicialização: a primeira importação já o encontra em memória.
+    """
+    executor = ThreadPoolExecutor(
+        max_workers=app.config['IMPORT_WORKERS'],
+        thread_name_prefix='import'
+    )
+    app.extensions['import_executor'] = executor
+
+    # O nome repete app.classifier.MODEL_FILE: importar o módulo aqui carregaria o NumPy
+    if app.config['CATEGORIZER_ENABLED'] and app.config['IMPORT_ASYNC'] and \
+            os.path.exists(os.path.join(app.config['CATEGORIZER_FOLDER'], 'categorizer.npz')):
+        executor.submit(_load_categorizer, app)
+
+
+def _load_categorizer(app):
+    from app.classifier import get_categorizer
+
+    try:
+        get_categorizer(app)
+    except Exception:
+        app.logger.exception('Falha ao carregar o classificador de categorias')
+
+
+def get_parse_pool(app):
+    """Retorna o pool de processos usado na leitura dos arquivos (criado no primeiro uso)"""
+    with _parse_pool_lock:
+        pool = app.extensions.get('import_parse_pool')
+        if pool is None:
+            # 'spawn' evita herdar conexões e locks das threads do servidor
+            pool = ProcessPoolExecutor(
+                max_workers=app.config['IMPORT_PROCESSES'],
+                mp_context=multiprocessing.get_context('spawn')
+            )
+            app.extensions['import_parse_pool'] = pool
+    return pool
+
+
+def submit_import(file_path, filename):
+    """Registra um job de importação de um arquivo OFX e o envia para a fila"""
+    return _submit(filename, _import_file, file_path)
+
+
+def submit_batch_import(files, label):
+    """Registra um job de importação em lote (vários OFX e/ou ZIPs)
+
+    files: lista de (caminho salvo, nome original)
+    """
+    return _submit(label, _import_batch, files)
+
+
+def _submit(filename, target, *args):
+    """Cria o job e o executa no pool; com IMPORT_ASYNC desligado roda na própria requisição"""
+    job = ImportJob(filename=filename)
+    db.session.add(job)
+    db.session.commit()
+
+    app = current_app._get_current_object()
+    if app.config['IMPORT_ASYNC']:
+        app.extensions['import_executor'].submit(_run_job, app, job.id, target, *args)
+    else:
+        _run_job(app, job.id, target, *args)
+
+    return job
+
+
+def _run_job(app, job_id, target, *args):
+    """Executa um job, registrando início, término e eventual erro"""
+    with app.app_context():
+        job = db.session.get(ImportJob, job_id)
+        job.status = 'running'
+        job.started_at = datetime.utcnow()
+        db.session.commit()
+
+        try:
+            target(app, job, *args)
+            job.status = 'done'
+        except Exception as e:
+            db.session.rollback()
+            app.logger.exception('Falha no job de importação %s', job_id)
+            job.status = 'failed'
+            job.error = str(e)
+            # Lotes já confirmados por arquivo ficam marcados como falhos
+            ImportBatch.query.filter_by(job_id=job_id, status='running').update({'status': 'failed', 'error': str(e)})
+
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+
+        if job.status == 'done' and app.config['CATEGORIZER_ENABLED']:
+            _train_categorizer(app)
+
+        if job.status == 'done' and app.config['ARCHIVE_ENABLED']:
+            _sync_archive(app)
+
+
+def _train_categorizer(app):
+    """Treina o classificador com as transações novas; uma falha aqui não desfaz a importação"""
+    from app.classifier import train_categorizer
+
+    try:
+        trained = train_categorizer(app)
+        app.logger.info('Classificador de categorias atualizado com %d transações', trained)
+    except Exception:
+        db.session.rollback()
+        app.logger.exception('Falha ao treinar o classificador de categorias')
+
+
+def _sync_archive(app):
+    """Leva as transações importadas ao arquivo Parquet; uma falha aqui não desfaz a importação"""
+    from app.archive import sync_archive
+
+    try:
+        partitions = sync_archive(app)
+        app.logger.info('Arquivo colunar atualizado: %d partições regravadas', len(partitions))
+    except Exception:
+        db.session.rollback()
+        app.logger.exception('Falha ao atualizar o arquivo colunar')
+
+
+def _import_file(app, job, file_path):
+    """Importa um único OFX, confirmando cada lote junto com os contadores do job"""
+    from app.services import import_ofx
+
+    def on_chunk(chunk_result):
+        job.imported += chunk_result['imported']
+        job.skipped += chunk_result['skipped']
+        job.categorized += chunk_result['categorized']
+        db.session.commit()
+
+    import_ofx(file_path, source_filename=job.filename, on_chunk=on_chunk, job_id=job.id)
+
+
+def _import_batch(app, job, files):
+    """Importa vários arquivos, confirmando cada lote junto com o resumo por arquivo do job
+
+    Os arquivos enviados (OFX e ZIPs) são apagados ao final, com sucesso ou não.
+    """
+    from app.services import import_ofx_batch
+
+    def on_chunk(summaries):
+        job.imported = sum(summary['imported'] for summary in summaries)
+        job.skipped = sum(summary['skipped'] for summary in summaries)
+        job.categorized = sum(summary['categorized'] for summary in summaries)
+        job.details = json.dumps(summaries)
+        db.session.commit()
+
+    try:
+        import_ofx_batch(files, parse_pool=get_parse_pool(app), job_id=job.id, on_chunk=on_chunk)
+    except BrokenProcessPool:
+        # Um processo morreu: descartar o pool para que o próximo job crie outro
+        with _parse_pool_lock:
+            app.extensions.pop('import_parse_pool', None)
+        raise
+    finally:
+        for file_path, _ in files:
+            try:
+                os.remove(file_path)
+            except FileNotFoundError:
+                pass
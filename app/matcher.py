@@ -0,0 +1,143 @@
+from collections import deque
+
+
+class AhoCorasick:
+    """Autômato Aho-Corasick para busca simultânea de várias palavras-chave
+
+    Cada padrão carrega uma prioridade (quanto menor, mais prioritário). A busca
+    percorre o texto uma única vez e devolve a menor prioridade encontrada.
+    """
+
+    def __init__(self):
+        self._goto = [{}]
+        self._fail = [0]
+        self._best = [None]
+        self._built = False
+
+    def add(self, pattern, priority):
+        """Adiciona um padrão ao autômato"""
+        if not pattern:
+            return
+
+        node = 0
+        for char in pattern:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._best.append(None)
+            node = next_node
+
+        if self._best[node] is None or priority < self._best[node]:
+            self._best[node] = priority
+        self._built = False
+
+    def build(self):
+        """Calcula os links de falha (busca em largura a partir da raiz)"""
+        queue = deque()
+        for node in self._goto[0].values():
+            self._fail[node] = 0
+            queue.append(node)
+
+        while queue:
+            current = queue.popleft()
+            for char, child in self._goto[current].items():
+                queue.append(child)
+
+                fallback = self._fail[current]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target if target != child else 0
+
+                # Propagar a melhor prioridade dos sufixos para o nó
+                inherited = self._best[self._fail[child]]
+                if inherited is not None and (self._best[child] is None or inherited < self._best[child]):
+                    self._best[child] = inherited
+
+        self._built = True
+        return self
+
+    def search(self, text):
+        """Retorna a menor prioridade entre os padrões contidos no texto"""
+        if not self._built:
+            self.build()
+
+        goto, fail, best = self._goto, self._fail, self._best
+        node = 0
+        found = None
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+
+            priority = best[node]
+            if priority is not None and (found is None or priority < found):
+                found = priority
+                if found == 0:
+                    break
+
+        return found
+
+
+class KeywordMatcher:
+    """Conjunto compilado de regras de categorização
+
+    As regras são separadas por tipo (despesa/receita). Palavras-chave 'exact'
+    ficam em um dicionário e as 'contains' em um único autômato Aho-Corasick.
+    A ordem das categorias define a prioridade em caso de várias correspondências.
+    """
+
+    def __init__(self, categories, keywords):
+        """
+        categories: lista de (id, is_expense) na ordem de prioridade
+        keywords: lista de (category_id, keyword, match_type)
+        """
+        self._rules = {
+            True: {'categories': [], 'exact': {}, 'contains': AhoCorasick()},
+            False: {'categories': [], 'exact': {}, 'contains': AhoCorasick()},
+        }
+
+        priorities = {}
+        for category_id, is_expense in categories:
+            rules = self._rules[bool(is_expense)]
+            priorities[category_id] = (bool(is_expense), len(rules['categories']))
+            rules['categories'].append(category_id)
+
+        for category_id, keyword, match_type in keywords:
+            if category_id not in priorities or not keyword:
+                continue
+
+            is_expense, priority = priorities[category_id]
+            rules = self._rules[is_expense]
+            keyword = keyword.lower()
+
+            if match_type == 'exact':
+                current = rules['exact'].get(keyword)
+                if current is None or priority < current:
+                    rules['exact'][keyword] = priority
+            else:  # 'contains' é o padrão
+                rules['contains'].add(keyword, priority)
+
+        for rules in self._rules.values():
+            rules['contains'].build()
+
+    def match(self, description, is_expense):
+        """Retorna o id da categoria correspondente à descrição, ou None"""
+        if not description:
+            return None
+
+        rules = self._rules[bool(is_expense)]
+        description = description.lower()
+
+        priority = rules['exact'].get(description)
+        if priority != 0:
+            found = rules['contains'].search(description)
+            if found is not None and (priority is None or found < priority):
+                priority = found
+
+        if priority is None:
+            return None
+        return rules['categories'][priority]
@@ -0,0 +1,152 @@
+import threading
+import time
+from collections import defaultdict
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from app import db
+
+# Limites dos histogramas (latência em segundos e consultas SQL por requisição)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class Histogram:
+    """Histograma cumulativo no formato do Prometheus"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _labels(labels, **extra):
+    labels = dict(labels, **extra)
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels.items()
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+class Metrics:
+    """Métricas por endpoint acumuladas no processo
+
+    Cada processo do servidor tem as suas; com vários workers, o Prometheus
+    deve coletar cada um separadamente.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latency = defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+        self.queries = defaultdict(lambda: Histogram(QUERY_BUCKETS))
+        self.sql_seconds = defaultdict(float)
+        self.requests = defaultdict(int)
+        self.slow = defaultdict(int)
+
+    def observe(self, endpoint, method, status, duration, queries, sql_seconds, slow):
+        key = (('endpoint', endpoint), ('method', method))
+        with self.lock:
+            self.latency[key].observe(duration)
+            self.queries[key].observe(queries)
+            self.sql_seconds[key] += sql_seconds
+            self.requests[key + (('status', status),)] += 1
+            if slow:
+                self.slow[key] += 1
+
+    def render(self):
+        """Texto no formato de exposição do Prometheus (versão 0.0.4)"""
+        lines = []
+        with self.lock:
+            self._histogram(lines, 'http_request_duration_seconds',
+                            'Latência das requisições por endpoint.', self.latency)
+            self._histogram(lines, 'http_request_sql_queries',
+                            'Consultas SQL executadas por requisição.', self.queries)
+            self._counter(lines, 'http_request_sql_duration_seconds_total',
+                          'Tempo total gasto em SQL pelas requisições.', self.sql_seconds)
+            self._counter(lines, 'http_requests_total', 'Requisições atendidas.', self.requests)
+            self._counter(lines, 'http_slow_requests_total',
+                          'Requisições acima do orçamento de latência ou de consultas.', self.slow)
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _histogram(lines, name, help_text, histograms):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for key, histogram in sorted(histograms.items()):
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                lines.append(f'{name}_bucket{_labels(key, le=bound)} {count}')
+            lines.append(f'{name}_bucket{_labels(key, le="+Inf")} {histogram.count}')
+            lines.append(f'{name}_sum{_labels(key)} {histogram.sum}')
+            lines.append(f'{name}_count{_labels(key)} {histogram.count}')
+
+    @staticmethod
+    def _counter(lines, name, help_text, counters):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} counter')
+        for key, value in sorted(counters.items()):
+            lines.append(f'{name}{_labels(key)} {value}')
+
+
+def init_app(app):
+    """Mede latência e SQL de cada requisição e registra os coletores na aplicação"""
+    if not app.config['METRICS_ENABLED']:
+        return
+
+    metrics = app.extensions['metrics'] = Metrics()
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_start_time'].pop()
+        # Consultas dos jobs em segundo plano não pertencem a nenhuma requisição
+        if has_request_context() and 'sql_queries' in g:
+            g.sql_queries += 1
+            g.sql_seconds += elapsed
+
+    def handle_error(context):
+        # Comando que falhou: descartar o início registrado para não desalinhar a pilha
+        if context.connection is not None and context.connection.info.get('query_start_time'):
+            context.connection.info['query_start_time'].pop()
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(db.engine, 'after_cursor_execute', after_cursor_execute)
+        event.listen(db.engine, 'handle_error', handle_error)
+
+    @app.before_request
+    def start_request_metrics():
+        g.request_start = time.perf_counter()
+        g.sql_queries = 0
+        g.sql_seconds = 0.0
+
+    @app.after_request
+    def record_status(response):
+        g.response_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def record_request_metrics(exc):
+        if 'request_start' not in g:
+            return
+
+        duration = time.perf_counter() - g.request_start
+        endpoint = request.endpoint or 'unmatched'
+        slow = (duration * 1000 > app.config['METRICS_SLOW_REQUEST_MS']
+                or g.sql_queries > app.config['METRICS_QUERY_BUDGET'])
+        if slow:
+            app.logger.warning(
+                'Requisição acima do orçamento: %s %s em %.0f ms, %d consultas SQL (%.0f ms)',
+                request.method, request.full_path.rstrip('?'), duration * 1000, g.sql_queries, g.sql_seconds * 1000
+            )
+
+        metrics.observe(endpoint, request.method, g.get('response_status', 500),
+                        duration, g.sql_queries, g.sql_seconds, slow)
@@ -1,6 +1,20 @@
+import json
 from datetime import datetime
+from decimal import Decimal, ROUND_HALF_UP
 from app import db
 
+CENTS = Decimal('0.01')
+
+
+def to_cents(value):
+    """Converte um valor em reais (Decimal, str, int ou float) para centavos inteiros"""
+    return int((Decimal(str(value)) * 100).to_integral_value(rounding=ROUND_HALF_UP))
+
+
+def from_cents(cents):
+    """Converte centavos inteiros em Decimal com duas casas"""
+    return (Decimal(cents or 0) / 100).quantize(CENTS)
+
 
 class Category(db.Model):
     __tablename__ = 'categories'
@@ -18,6 +32,18 @@ class Category(db.Model):
         return f'<Category {self.name}>'
 
 
+class KeywordRulesVersion(db.Model):
+    """Versão das regras de categorização (categorias e palavras-chave)
+
+    Uma única linha, incrementada na mesma transação de cada alteração; cada
+    processo recompila o matcher quando a versão gravada muda.
+    """
+    __tablename__ = 'keyword_rules_version'
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
 class CategoryKeyword(db.Model):
     __tablename__ = 'category_keywords'
 
@@ -32,19 +58,41 @@ class CategoryKeyword(db.Model):
 
 class Transaction(db.Model):
     __tablename__ = 'transactions'
+    __table_args__ = (
+        # O mesmo FITID não pode aparecer duas vezes na mesma conta
+        db.UniqueConstraint('account_id', 'external_id', name='uq_transactions_account_external_id'),
+        # Nem o mesmo conteúdo (só FITID vazio ou instável têm fingerprint); a ocorrência separa repetições legítimas
+        db.UniqueConstraint('fingerprint', 'occurrence', name='uq_transactions_fingerprint_occurrence'),
+        # Ordenação e paginação por chave da lista de transações
+        db.Index('ix_transactions_date_id', 'date', 'id'),
+        # Filtros de período dos relatórios e da listagem (cobre as somas por categoria e sinal)
+        db.Index('ix_transactions_year_month_category_amount', 'year', 'month', 'category_id', 'amount_cents'),
+        # Filtro por categoria (inclusive "sem categoria") ordenado por data
+        db.Index('ix_transactions_category_date', 'category_id', 'date'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     external_id = db.Column(db.String(128), index=True)  # ID do banco para evitar duplicação
-    date = db.Column(db.DateTime, nullable=False, index=True)
-    amount = db.Column(db.Float, nullable=False)
+    account_id = db.Column(db.String(64))  # Conta de origem (ACCTID do OFX)
+    date = db.Column(db.DateTime, nullable=False)
+    amount_cents = db.Column(db.BigInteger, nullable=False)  # Valor em centavos (negativo = despesa)
     description = db.Column(db.String(255))
 
-    # Origem do arquivo
+    # Hash de conta, dia, valor e descrição normalizada (app/dedup.py) e a ordem entre
+    # transações idênticas do mesmo extrato; só preenchido quando o FITID não é confiável
+    fingerprint = db.Column(db.String(32))
+    occurrence = db.Column(db.Integer, nullable=False, default=1)
+
+    # Origem do arquivo e execução de importação que inseriu a transação
     source_filename = db.Column(db.String(255))
+    batch_id = db.Column(db.Integer, db.ForeignKey('import_batches.id'), nullable=True, index=True)
 
     # Categorização
     category_id = db.Column(db.Integer, db.ForeignKey('categories.id'), nullable=True)
     category = db.relationship('Category', backref='transactions')
+    # Quem escolheu a categoria: 'keyword', 'classifier' ou 'manual'; None sem categoria ou de origem
+    # desconhecida. Excluir uma palavra-chave só reavalia as escolhas feitas por regras
+    categorized_by = db.Column(db.String(16))
 
     # Pode ser nullable se você não estiver usando autenticação
     user_id = db.Column(db.Integer, nullable=True)
@@ -53,15 +101,158 @@ class Transaction(db.Model):
     year = db.Column(db.Integer, nullable=False)
     month = db.Column(db.Integer, nullable=False)
 
+    # Última inserção/alteração (marca d'água da atualização incremental do snapshot colunar)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
     def __init__(self, **kwargs):
         super(Transaction, self).__init__(**kwargs)
         if 'date' in kwargs:
             self.year = kwargs['date'].year
             self.month = kwargs['date'].month
 
+    @property
+    def amount(self):
+        """Valor em reais, exato (Decimal)"""
+        return from_cents(self.amount_cents)
+
+    @amount.setter
+    def amount(self, value):
+        self.amount_cents = to_cents(value)
+
     @property
     def transaction_type(self):
-        return 'receita' if self.amount >= 0 else 'despesa'
+        return 'receita' if self.amount_cents >= 0 else 'despesa'
+
+    def __repr__(self):
+        return f'<Transaction {self.date} {self.amount}>'
+
+class ImportJob(db.Model):
+    __tablename__ = 'import_jobs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    filename = db.Column(db.String(255), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, running, done, failed
+    error = db.Column(db.Text)
+
+    # Contadores atualizados a cada lote processado
+    imported = db.Column(db.Integer, nullable=False, default=0)
+    skipped = db.Column(db.Integer, nullable=False, default=0)
+    categorized = db.Column(db.Integer, nullable=False, default=0)
+
+    # Resumo por arquivo (JSON) nas importações em lote
+    details = db.Column(db.Text)
+
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    @property
+    def finished(self):
+        return self.status in ('done', 'failed')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'filename': self.filename,
+            'status': self.status,
+            'error': self.error,
+            'imported': self.imported,
+            'skipped': self.skipped,
+            'categorized': self.categorized,
+            'files': json.loads(self.details) if self.details else [],
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+    def __repr__(self):
+        return f'<ImportJob {self.id} {self.status}>'
+
+
+class ImportBatch(db.Model):
+    """Execução da importação de um arquivo OFX, com o tempo gasto em cada etapa
+
+    timings guarda, em JSON, o tempo de relógio e de CPU (segundos) das etapas
+    parse, dedup, categorize, insert e commit.
+    """
+    __tablename__ = 'import_batches'
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.Integer, db.ForeignKey('import_jobs.id'), nullable=True, index=True)
+    filename = db.Column(db.String(255), nullable=False)
+    file_hash = db.Column(db.String(64), index=True)  # SHA-256 do arquivo
+    file_size = db.Column(db.Integer)
+    status = db.Column(db.String(20), nullable=False, default='running')  # running, done, failed, rolled_back
+    error = db.Column(db.Text)
+
+    rows_read = db.Column(db.Integer, nullable=False, default=0)
+    imported = db.Column(db.Integer, nullable=False, default=0)
+    skipped = db.Column(db.Integer, nullable=False, default=0)
+    categorized = db.Column(db.Integer, nullable=False, default=0)
+
+    wall_time = db.Column(db.Float, index=True)  # /reports/imports ordena pelos mais lentos
+    cpu_time = db.Column(db.Float)
+    timings = db.Column(db.Text)
+
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    rolled_back_at = db.Column(db.DateTime)
+
+    @property
+    def stage_timings(self):
+        return json.loads(self.timings) if self.timings else {}
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'job_id': self.job_id,
+            'filename': self.filename,
+            'file_hash': self.file_hash,
+            'file_size': self.file_size,
+            'status': self.status,
+            'error': self.error,
+            'rows_read': self.rows_read,
+            'imported': self.imported,
+            'skipped': self.skipped,
+            'categorized': self.categorized,
+            'wall_time': self.wall_time,
+            'cpu_time': self.cpu_time,
+            'timings': self.stage_timings,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+    def __repr__(self):
+        return f'<ImportBatch {self.id} {self.filename} {self.status}>'
+
+
+class MonthlySummary(db.Model):
+    """Agregado mensal de transações, mantido de forma incremental
+
+    Cada linha guarda a soma e a quantidade de transações de um usuário,
+    mês, categoria e sinal (1 receita, -1 despesa, 0 valor zerado).
+    Transações sem usuário ou sem categoria usam 0 nessas colunas.
+    """
+    __tablename__ = 'monthly_summary'
+    __table_args__ = (
+        # Ordem pensada para os relatórios, que filtram por ano/mês e sinal
+        db.UniqueConstraint('year', 'month', 'sign', 'category_id', 'user_id', name='uq_monthly_summary_key'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False, default=0)
+    year = db.Column(db.Integer, nullable=False)
+    month = db.Column(db.Integer, nullable=False)
+    category_id = db.Column(db.Integer, nullable=False, default=0)
+    sign = db.Column(db.Integer, nullable=False)
+
+    total_cents = db.Column(db.BigInteger, nullable=False, default=0)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    @property
+    def total(self):
+        """Soma em reais, exata (Decimal)"""
+        return from_cents(self.total_cents)
 
     def __repr__(self):
-        return f'<Transaction {self.date} {self.amount}>'
\ No newline at end of file
+        return f'<MonthlySummary {self.year}-{self.month} cat={self.category_id} sign={self.sign} {self.total}>'
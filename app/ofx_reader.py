@@ -0,0 +1,141 @@
+import codecs
+import re
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+from html import unescape
+
+# Tamanho dos blocos lidos do arquivo
+READ_SIZE = 64 * 1024
+
+_TAG_RE = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<]*)')
+_CHARSET_RE = re.compile(rb'CHARSET:\s*([\w-]+)')
+_SGML_ENCODING_RE = re.compile(rb'ENCODING:\s*([\w-]+)')
+_ENCODING_RE = re.compile(rb'encoding=["\']([\w-]+)["\']')
+_TZ_RE = re.compile(r'\[(?P<tz>[-+]?\d+\.?\d*):?\w*\]$')
+
+
+def _detect_encoding(head):
+    """Descobre a codificação pelo cabeçalho OFX (SGML) ou pela declaração XML
+
+    No SGML, ENCODING:UTF-8 (ou UNICODE) define a codificação; só com
+    ENCODING:USASCII (ou sem ENCODING) o CHARSET (ex.: 1252) decide.
+    """
+    match = _ENCODING_RE.search(head)
+    if match:
+        return _known_codec(match.group(1).decode('ascii'))
+
+    match = _SGML_ENCODING_RE.search(head)
+    encoding = match.group(1).decode('ascii').upper() if match else 'USASCII'
+    if encoding in ('UTF-8', 'UTF8', 'UNICODE'):
+        return 'utf-8'
+
+    match = _CHARSET_RE.search(head)
+    if encoding == 'USASCII' and match:
+        charset = match.group(1).decode('ascii').upper()
+        if charset.isdigit():
+            return _known_codec(f'cp{charset}')
+        if charset not in ('NONE', 'USASCII'):
+            return _known_codec(charset)
+
+    # Bancos brasileiros costumam usar Windows-1252
+    return 'cp1252'
+
+
+def _known_codec(name):
+    """O nome informado, se o Python conhecer a codificação; senão Windows-1252"""
+    try:
+        return codecs.lookup(name).name
+    except LookupError:
+        return 'cp1252'
+
+
+def parse_ofx_date(value):
+    """Converte uma data OFX (ex.: 20231106160000.000[-3:BRT]) para UTC"""
+    match = _TZ_RE.search(value)
+    offset = timedelta(hours=float(match.group('tz'))) if match else timedelta(0)
+
+    digits = re.match(r'\d+', value)
+    digits = digits.group(0) if digits else ''
+    if len(digits) >= 14:
+        date = datetime.strptime(digits[:14], '%Y%m%d%H%M%S')
+    else:
+        date = datetime.strptime(digits[:8], '%Y%m%d')
+
+    return date - offset
+
+
+def parse_ofx_amount(value):
+    """Converte um valor OFX em Decimal, aceitando vírgula como separador decimal"""
+    value = value.strip().replace(' ', '').replace('+', '')
+    if re.search(r'.*\..*,', value):  # 10.000,50
+        value = value.replace('.', '')
+    if re.search(r'.*,.*\.', value):  # 10,000.50
+        value = value.replace(',', '')
+    if '.' not in value and ',' in value:  # 10000,50
+        value = value.replace(',', '.')
+    return Decimal(value)
+
+
+def _build_transaction(account_id, fields):
+    """Monta o registro de uma transação a partir dos campos do STMTTRN"""
+    fitid = fields.get('FITID', '')
+    try:
+        return {
+            'account_id': account_id,
+            'fitid': fitid,
+            'date': parse_ofx_date(fields['DTPOSTED']),
+            'amount': parse_ofx_amount(fields['TRNAMT']),
+            'memo': fields.get('MEMO', ''),
+            'payee': fields.get('NAME', ''),
+        }
+    except (KeyError, ValueError, InvalidOperation) as e:
+        raise ValueError(f'Transação OFX inválida (FITID {fitid or "?"}): {e}') from e
+
+
+def iter_ofx_transactions(file):
+    """Lê um arquivo OFX (SGML ou XML) em blocos e gera as transações uma a uma
+
+    O arquivo nunca é carregado inteiro: apenas o bloco atual e o STMTTRN em
+    andamento ficam em memória. Cada transação é um dicionário com account_id,
+    fitid, date, amount (Decimal), memo e payee.
+    """
+    head = file.read(READ_SIZE)
+    decoder = codecs.getincrementaldecoder(_detect_encoding(head))(errors='replace')
+
+    account_id = ''
+    current = None
+    buffer = decoder.decode(head)
+    eof = not head
+
+    while True:
+        if not eof:
+            data = file.read(READ_SIZE)
+            eof = not data
+            buffer += decoder.decode(data, final=eof)
+
+        # Sem o fim do arquivo, o trecho após o último '<' pode estar incompleto
+        limit = len(buffer) if eof else buffer.rfind('<')
+        if limit <= 0 and not eof:
+            continue
+
+        for match in _TAG_RE.finditer(buffer, 0, limit):
+            closing, tag, value = match.groups()
+            tag = tag.upper()
+
+            if tag == 'STMTTRN':
+                if closing:
+                    if current is not None:
+                        yield _build_transaction(account_id, current)
+                    current = None
+                else:
+                    current = {}
+            elif closing:
+                continue
+            elif current is not None:
+                current[tag] = unescape(value.strip())
+            elif tag == 'ACCTID':
+                account_id = unescape(value.strip())
+
+        if eof:
+            break
+        buffer = buffer[limit:]
@@ -0,0 +1,123 @@
+import os
+import tempfile
+from sqlalchemy import event
+from app import db
+
+# Tabelas pequenas, que podem ser lidas por inteiro sem prejuízo
+SMALL_TABLES = {'categories', 'category_keywords', 'import_jobs'}
+
+
+def endpoint_urls(year, month, category_id, cursor):
+    """URLs de leitura de main, reports e transactions, com os filtros mais usados"""
+    return [
+        '/',
+        '/transactions/',
+        f'/transactions/?year={year}',
+        f'/transactions/?year={year}&month={month}',
+        f'/transactions/?year={year}&month={month}&category_id={category_id}',
+        f'/transactions/?category_id={category_id}',
+        '/transactions/?category_id=-1',
+        f'/transactions/?cursor={cursor}',
+        '/transactions/?q=uber',
+        f'/transactions/?year={year}&q=%22posto+shell%22',
+        '/transactions/?q=farm*&category_id=-1',
+        f'/transactions/export?format=csv&year={year}&month={month}',
+        f'/transactions/export?format=ndjson&category_id={category_id}',
+        f'/transactions/export?format=csv&year={year}&q=uber',
+        '/transactions/recategorize?dry_run=1',
+        '/reports/',
+        f'/reports/data/category_spending?year={year}',
+        f'/reports/data/monthly_spending?year={year}',
+        f'/reports/data/kpi_summary?year={year}',
+        f'/reports/data/kpi_summary?year={year}&month={month}',
+        f'/reports/data/rolling_average?year={year}',
+        '/reports/data/trend?type=expenses',
+        f'/reports/data/trend?type=income&category_id={category_id}',
+        f'/reports/chart/categories.svg?year={year}&month={month}',
+        f'/reports/chart/monthly.png?year={year}',
+        '/reports/imports',
+    ]
+
+
+def capture_statements(app, urls):
+    """Executa as URLs e retorna os comandos SQL emitidos por cada uma"""
+    captured = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not executemany:
+            captured.append((statement, parameters))
+
+    client = app.test_client()
+    statements = {}
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        for url in urls:
+            captured.clear()
+            response = client.get(url)
+            response.close()
+            statements[url] = (response.status_code, list(captured))
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+    return statements
+
+
+def full_scans(plan):
+    """Linhas do plano que leem uma tabela grande por inteiro, sem índice"""
+    scans = []
+    for detail in plan:
+        words = detail.split()
+        if len(words) < 2 or words[0] != 'SCAN' or words[1].startswith('('):
+            continue
+        if words[1] in SMALL_TABLES or 'INDEX' in detail or words[1] == 'CONSTANT':
+            continue
+        scans.append(detail)
+    return scans
+
+
+def explain(statement, parameters):
+    """Retorna as linhas de EXPLAIN QUERY PLAN de um comando"""
+    with db.engine.connect() as connection:
+        rows = connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters or ())
+        return [row[-1] for row in rows]
+
+
+def check_query_plans(rows=5000):
+    """Verifica os planos de consulta das rotas de leitura em um banco populado
+
+    Um banco SQLite temporário é criado e populado com dados sintéticos; cada
+    consulta emitida pelas rotas passa por EXPLAIN QUERY PLAN. Retorna, por URL,
+    o status HTTP e a lista de (sql, plano, varreduras completas).
+    """
+    from app import create_app
+    from app.models import Transaction
+    from app.synthetic import seed_database
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(tmpdir, 'plans.db'),
+            'IMPORT_ASYNC': False,
+            'CHART_CACHE_FOLDER': os.path.join(tmpdir, 'charts'),
+            'CATEGORIZER_FOLDER': os.path.join(tmpdir, 'models'),
+        })
+
+        with app.app_context():
+            db.create_all()
+            seed_database(rows)
+
+            sample = Transaction.query.filter(Transaction.category_id.isnot(None)).order_by(Transaction.id).first()
+            cursor = f'{sample.date.isoformat()}|{sample.id}'
+            urls = endpoint_urls(sample.year, sample.month, sample.category_id, cursor)
+
+            results = {}
+            for url, (status, statements) in capture_statements(app, urls).items():
+                checked = []
+                for statement, parameters in statements:
+                    plan = explain(statement, parameters)
+                    checked.append((statement, plan, full_scans(plan)))
+                results[url] = (status, checked)
+
+            db.session.remove()
+            db.engine.dispose()
+
+    return results
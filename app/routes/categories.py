@@ -1,7 +1,10 @@
 from flask import Blueprint, render_template, redirect, url_for, request, flash
+from sqlalchemy import update
 from app import db
-from app.models import Category, CategoryKeyword
+from app.models import Category, CategoryKeyword, Transaction
 from app.forms import CategoryForm, KeywordForm
+from app.services import invalidate_keyword_matcher, recategorize_for_keyword
+from app.summary import move_transactions
 
 category_bp = Blueprint('categories', __name__, url_prefix='/categories')
 
@@ -27,6 +30,7 @@ def create_category():
         )
 
         db.session.add(category)
+        invalidate_keyword_matcher()
         db.session.commit()
 
         flash('Categoria criada com sucesso!', 'success')
@@ -43,6 +47,7 @@ def edit_category(id):
 
     if form.validate_on_submit():
         form.populate_obj(category)
+        invalidate_keyword_matcher()
         db.session.commit()
 
         flash('Categoria atualizada com sucesso!', 'success')
@@ -56,7 +61,17 @@ def delete_category(id):
     """Exclui uma categoria"""
     category = Category.query.get_or_404(id)
 
+    # As transações da categoria ficam sem categoria (em massa, mantendo o agregado)
+    move_transactions(Transaction.category_id == category.id, category_id=None)
+    db.session.execute(
+        update(Transaction)
+        .where(Transaction.category_id == category.id)
+        .values(category_id=None, categorized_by=None)
+        .execution_options(synchronize_session=False)
+    )
+
     db.session.delete(category)
+    invalidate_keyword_matcher()
     db.session.commit()
 
     flash('Categoria excluída com sucesso!', 'success')
@@ -77,9 +92,14 @@ def manage_keywords(id):
         )
 
         db.session.add(keyword)
+        db.session.flush()
+        invalidate_keyword_matcher()
+
+        # Só as transações sem categoria que contêm a nova palavra
+        result = recategorize_for_keyword(keyword.keyword, category)
         db.session.commit()
 
-        flash('Palavra-chave adicionada com sucesso!', 'success')
+        flash(f'Palavra-chave adicionada com sucesso! {result["moved"]} transações foram recategorizadas.', 'success')
         return redirect(url_for('categories.manage_keywords', id=category.id))
 
     keywords = CategoryKeyword.query.filter_by(category_id=category.id).all()
@@ -94,10 +114,15 @@ def manage_keywords(id):
 def delete_keyword(id):
     """Exclui uma palavra-chave"""
     keyword = CategoryKeyword.query.get_or_404(id)
-    category_id = keyword.category_id
+    category = keyword.category
 
     db.session.delete(keyword)
+    db.session.flush()
+    invalidate_keyword_matcher()
+
+    # Transações da categoria que contêm a palavra: outra regra ou nenhuma categoria
+    result = recategorize_for_keyword(keyword.keyword, category, removed=True)
     db.session.commit()
 
-    flash('Palavra-chave excluída com sucesso!', 'success')
-    return redirect(url_for('categories.manage_keywords', id=category_id))
\ No newline at end of file
+    flash(f'Palavra-chave excluída com sucesso! {result["moved"]} transações foram recategorizadas.', 'success')
+    return redirect(url_for('categories.manage_keywords', id=category.id))
\ No newline at end of file
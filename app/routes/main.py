@@ -1,7 +1,8 @@
 from flask import Blueprint, render_template, redirect, url_for, flash  # Adicione "flash" aqui
 from datetime import datetime
 from app import db
-from app.models import Transaction, Category
+from app.models import Transaction, Category, MonthlySummary, from_cents
+from app.summary import period_totals
 
 main_bp = Blueprint('main', __name__)
 
@@ -13,32 +14,23 @@ def index():
     year = latest.year if latest else datetime.now().year
     month = latest.month if latest else datetime.now().month
 
-    # Buscar dados para dashboard
-    income = db.session.query(db.func.sum(Transaction.amount)).filter(
-        Transaction.year == year,
-        Transaction.month == month,
-        Transaction.amount > 0
-    ).scalar() or 0
-
-    expenses = db.session.query(db.func.sum(Transaction.amount)).filter(
-        Transaction.year == year,
-        Transaction.month == month,
-        Transaction.amount < 0
-    ).scalar() or 0
-
-    expenses = abs(expenses)  # Transformar em valor positivo para exibição
+    # Buscar dados para dashboard (a partir do agregado mensal, em uma consulta)
+    totals = period_totals(year, month)
+    income = totals['income']
+    expenses = abs(totals['expenses'])  # Transformar em valor positivo para exibição
     balance = income - expenses
 
     # Dados para gráfico de categorias
     category_data = db.session.query(
         Category.name,
         Category.color,
-        db.func.sum(Transaction.amount).label('total')
-    ).join(Transaction).filter(
-        Transaction.year == year,
-        Transaction.month == month,
-        Transaction.amount < 0  # Apenas despesas para o gráfico
+        db.func.sum(MonthlySummary.total_cents).label('total')
+    ).join(MonthlySummary, MonthlySummary.category_id == Category.id).filter(
+        MonthlySummary.year == year,
+        MonthlySummary.month == month,
+        MonthlySummary.sign == -1  # Apenas despesas para o gráfico
     ).group_by(Category.id).all()
+    category_data = [(name, color, from_cents(total)) for name, color, total in category_data]
 
     return render_template('index.html',
                            year=year,
@@ -0,0 +1,13 @@
+from flask import Blueprint, Response, current_app, abort
+
+metrics_bp = Blueprint('metrics', __name__)
+
+
+@metrics_bp.route('/metrics')
+def metrics():
+    """Métricas da aplicação no formato de texto do Prometheus"""
+    collector = current_app.extensions.get('metrics')
+    if collector is None:  # METRICS_ENABLED desligado
+        abort(404)
+
+    return Response(collector.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
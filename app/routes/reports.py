@@ -1,18 +1,43 @@
-from flask import Blueprint, render_template, request, jsonify
+from flask import Blueprint, render_template, request, jsonify, current_app, send_file
 from sqlalchemy import func, extract
 from datetime import datetime, timedelta
 import calendar
+import os
 from app import db
-from app.models import Transaction, Category
+from app.batches import STAGES
+from app.archive import ArchiveUnavailable
+from app.models import Category, MonthlySummary, ImportBatch, from_cents
+from app.summary import period_totals, percent_change
 
 reports_bp = Blueprint('reports', __name__, url_prefix='/reports')
 
 
+@reports_bp.errorhandler(ArchiveUnavailable)
+def archive_unavailable(error):
+    return jsonify({'error': str(error)}), 400
+
+
+def columnar_snapshot():
+    """Snapshot colunar das transações com REPORTS_ENGINE=columnar; None no motor SQL (agregado mensal)"""
+    if current_app.config['REPORTS_ENGINE'] != 'columnar':
+        return None
+
+    from app.analytics import get_snapshot
+    return get_snapshot()
+
+
+def expense_categories(totals):
+    """Converte {category_id: total} em (nome, cor, total) ordenado do maior gasto ao menor"""
+    categories = {id: (name, color) for id, name, color in db.session.query(Category.id, Category.name, Category.color)}
+    rows = [(*categories[category_id], total) for category_id, total in totals.items() if category_id in categories]
+    return sorted(rows, key=lambda row: row[2])
+
+
 @reports_bp.route('/')
 def index():
     """Página principal de relatórios"""
     # Obter anos disponíveis para o filtro
-    years = db.session.query(Transaction.year).distinct().order_by(Transaction.year.desc()).all()
+    years = db.session.query(MonthlySummary.year).distinct().order_by(MonthlySummary.year.desc()).all()
     years = [y[0] for y in years]
 
     # Se não houver anos nos dados, use o ano atual
@@ -33,22 +58,13 @@ def category_spending():
     """Retorna dados de gastos por categoria para o ano selecionado"""
     year = request.args.get('year', type=int, default=datetime.now().year)
 
-    # Consulta para obter gastos por categoria (apenas despesas - valores negativos)
-    category_data = db.session.query(
-        Category.name,
-        Category.color,
-        func.sum(Transaction.amount).label('total')
-    ).join(
-        Transaction,
-        Transaction.category_id == Category.id
-    ).filter(
-        Transaction.year == year,
-        Transaction.amount < 0  # Apenas despesas
-    ).group_by(
-        Category.id
-    ).order_by(
-        func.sum(Transaction.amount)
-    ).all()
+    snapshot = columnar_snapshot()
+    if snapshot is not None:
+        totals = snapshot.category_totals(year=year, sign=-1)
+        category_data = expense_categories(totals)
+        uncategorized = totals.get(0, 0)
+    else:
+        category_data, uncategorized = _category_spending_sql(year)
 
     # Transformar em lista para JSON
     result = []
@@ -56,28 +72,50 @@ def category_spending():
         result.append({
             'name': name,
             'color': color,
-            'value': abs(float(total))  # Converter para positivo para o gráfico
+            'value': abs(float(from_cents(total)))  # Converter para positivo para o gráfico
         })
 
-    # Adicionar categoria "Sem categoria" se houver gastos não categorizados
-    uncategorized = db.session.query(
-        func.sum(Transaction.amount).label('total')
-    ).filter(
-        Transaction.year == year,
-        Transaction.amount < 0,  # Apenas despesas
-        Transaction.category_id == None
-    ).scalar() or 0
-
     if uncategorized < 0:  # Se houver gastos não categorizados
         result.append({
             'name': 'Sem categoria',
             'color': '#CCCCCC',
-            'value': abs(float(uncategorized))
+            'value': abs(float(from_cents(uncategorized)))
         })
 
     return jsonify(result)
 
 
+def _category_spending_sql(year):
+    """Gastos por categoria e gastos sem categoria do ano, a partir do agregado mensal"""
+    # Consulta para obter gastos por categoria (apenas despesas - valores negativos)
+    category_data = db.session.query(
+        Category.name,
+        Category.color,
+        func.sum(MonthlySummary.total_cents).label('total')
+    ).join(
+        MonthlySummary,
+        MonthlySummary.category_id == Category.id
+    ).filter(
+        MonthlySummary.year == year,
+        MonthlySummary.sign == -1  # Apenas despesas
+    ).group_by(
+        Category.id
+    ).order_by(
+        func.sum(MonthlySummary.total_cents)
+    ).all()
+
+    # Gastos não categorizados
+    uncategorized = db.session.query(
+        func.sum(MonthlySummary.total_cents).label('total')
+    ).filter(
+        MonthlySummary.year == year,
+        MonthlySummary.sign == -1,  # Apenas despesas
+        MonthlySummary.category_id == 0
+    ).scalar() or 0
+
+    return category_data, uncategorized
+
+
 @reports_bp.route('/data/monthly_spending')
 def monthly_spending():
     """Retorna dados de gastos mensais para o ano selecionado"""
@@ -93,37 +131,46 @@ def monthly_spending():
             'income': 0
         })
 
+    snapshot = columnar_snapshot()
+    if snapshot is not None:
+        expenses = snapshot.monthly_totals(year, sign=-1)
+        income = snapshot.monthly_totals(year, sign=1)
+        for index in range(12):
+            monthly_data[index]['expenses'] = abs(float(from_cents(int(expenses[index]))))
+            monthly_data[index]['income'] = float(from_cents(int(income[index])))
+        return jsonify(monthly_data)
+
     # Consulta para obter gastos mensais
     monthly_expenses = db.session.query(
-        Transaction.month,
-        func.sum(Transaction.amount).label('total')
+        MonthlySummary.month,
+        func.sum(MonthlySummary.total_cents).label('total')
     ).filter(
-        Transaction.year == year,
-        Transaction.amount < 0  # Apenas despesas
+        MonthlySummary.year == year,
+        MonthlySummary.sign == -1  # Apenas despesas
     ).group_by(
-        Transaction.month
+        MonthlySummary.month
     ).all()
 
     # Preencher dados de despesas
     for month, total in monthly_expenses:
         if 1 <= month <= 12:  # Verificar se o mês está no intervalo válido
-            monthly_data[month - 1]['expenses'] = abs(float(total))  # Converter para positivo
+            monthly_data[month - 1]['expenses'] = abs(float(from_cents(total)))  # Converter para positivo
 
     # Consulta para obter receitas mensais
     monthly_income = db.session.query(
-        Transaction.month,
-        func.sum(Transaction.amount).label('total')
+        MonthlySummary.month,
+        func.sum(MonthlySummary.total_cents).label('total')
     ).filter(
-        Transaction.year == year,
-        Transaction.amount > 0  # Apenas receitas
+        MonthlySummary.year == year,
+        MonthlySummary.sign == 1  # Apenas receitas
     ).group_by(
-        Transaction.month
+        MonthlySummary.month
     ).all()
 
     # Preencher dados de receitas
     for month, total in monthly_income:
         if 1 <= month <= 12:  # Verificar se o mês está no intervalo válido
-            monthly_data[month - 1]['income'] = float(total)
+            monthly_data[month - 1]['income'] = float(from_cents(total))
 
     return jsonify(monthly_data)
 
@@ -135,104 +182,195 @@ def kpi_summary():
     month = request.args.get('month', type=int)  # Opcional
 
     # Base de filtros
-    filters = [Transaction.year == year]
+    filters = [MonthlySummary.year == year]
 
     # Se o mês for especificado, adicionar ao filtro
     if month:
-        filters.append(Transaction.month == month)
+        filters.append(MonthlySummary.month == month)
         period_name = f"{calendar.month_name[month]} {year}"
     else:
         period_name = f"{year}"
 
-    # Total de despesas
-    expenses = db.session.query(func.sum(Transaction.amount)).filter(
-        *filters, Transaction.amount < 0
-    ).scalar() or 0
+    snapshot = columnar_snapshot()
 
-    # Total de receitas
-    income = db.session.query(func.sum(Transaction.amount)).filter(
-        *filters, Transaction.amount > 0
-    ).scalar() or 0
+    # Receitas e despesas do período e do período anterior (mês anterior ou ano anterior)
+    totals = snapshot.period_totals(year, month) if snapshot is not None else period_totals(year, month)
+    expenses = totals['expenses']
+    income = totals['income']
 
     # Saldo
     balance = income + expenses  # expenses já é negativo
 
-    # Mês anterior para comparação
-    if month:
-        # Se mês atual é janeiro, mês anterior é dezembro do ano anterior
-        prev_month = 12 if month == 1 else month - 1
-        prev_year = year - 1 if month == 1 else year
-
-        prev_filters = [Transaction.year == prev_year, Transaction.month == prev_month]
-
-        prev_expenses = db.session.query(func.sum(Transaction.amount)).filter(
-            *prev_filters, Transaction.amount < 0
-        ).scalar() or 0
-
-        prev_income = db.session.query(func.sum(Transaction.amount)).filter(
-            *prev_filters, Transaction.amount > 0
-        ).scalar() or 0
-
-        # Calcular variações percentuais
-        if prev_expenses != 0:
-            expense_change = ((abs(expenses) - abs(prev_expenses)) / abs(prev_expenses)) * 100
-        else:
-            expense_change = 0
-
-        if prev_income != 0:
-            income_change = ((income - prev_income) / prev_income) * 100
-        else:
-            income_change = 0
-    else:
-        # Comparar com ano anterior
-        prev_filters = [Transaction.year == year - 1]
+    # Calcular variações percentuais
+    expense_change = percent_change(expenses, totals['previous_expenses'])
+    income_change = percent_change(income, totals['previous_income'])
 
-        prev_expenses = db.session.query(func.sum(Transaction.amount)).filter(
-            *prev_filters, Transaction.amount < 0
-        ).scalar() or 0
+    # Top categorias de despesa
+    if snapshot is not None:
+        totals = snapshot.category_totals(year=year, month=month, sign=-1)
+        top_categories = [(name, total) for name, _, total in expense_categories(totals)[:5]]
+    else:
+        top_categories = _top_categories_sql(filters)
 
-        prev_income = db.session.query(func.sum(Transaction.amount)).filter(
-            *prev_filters, Transaction.amount > 0
-        ).scalar() or 0
+    top_categories_data = [
+        {'name': name, 'total': abs(float(from_cents(total)))}
+        for name, total in top_categories
+    ]
 
-        # Calcular variações percentuais
-        if prev_expenses != 0:
-            expense_change = ((abs(expenses) - abs(prev_expenses)) / abs(prev_expenses)) * 100
-        else:
-            expense_change = 0
+    return jsonify({
+        'period': period_name,
+        'expenses': abs(float(expenses)),
+        'income': float(income),
+        'balance': float(balance),
+        'expense_change': float(expense_change),
+        'income_change': float(income_change),
+        'top_categories': top_categories_data
+    })
 
-        if prev_income != 0:
-            income_change = ((income - prev_income) / prev_income) * 100
-        else:
-            income_change = 0
 
-    # Top categorias de despesa
-    top_categories = db.session.query(
+def _top_categories_sql(filters):
+    """As cinco categorias com mais despesas no período, a partir do agregado mensal"""
+    return db.session.query(
         Category.name,
-        func.sum(Transaction.amount).label('total')
+        func.sum(MonthlySummary.total_cents).label('total')
     ).join(
-        Transaction,
-        Transaction.category_id == Category.id
+        MonthlySummary,
+        MonthlySummary.category_id == Category.id
     ).filter(
         *filters,
-        Transaction.amount < 0  # Apenas despesas
+        MonthlySummary.sign == -1  # Apenas despesas
     ).group_by(
         Category.id
     ).order_by(
-        func.sum(Transaction.amount)
+        func.sum(MonthlySummary.total_cents)
     ).limit(5).all()
 
-    top_categories_data = [
-        {'name': name, 'total': abs(float(total))}
-        for name, total in top_categories
-    ]
+
+def monthly_series(sign, category_id=None):
+    """Série mensal contínua (períodos, totais em centavos) do motor configurado
+
+    Com source=archive a série é agregada no arquivo Parquet, sem consultar o SQLite.
+    """
+    if request.args.get('source') == 'archive':
+        from app.analytics import dense_monthly_series
+        from app.archive import archive_dataset, archive_monthly_series
+        if category_id == 0:  # Sem categoria: no arquivo é category_id nulo
+            category_id = -1
+        return dense_monthly_series(archive_monthly_series(archive_dataset(current_app), sign, category_id))
+
+    snapshot = columnar_snapshot()
+    if snapshot is not None:
+        return snapshot.monthly_series(sign=sign, category_id=category_id)
+
+    from app.analytics import summary_monthly_series
+    return summary_monthly_series(sign, category_id)
+
+
+@reports_bp.route('/data/rolling_average')
+def rolling_average():
+    """Receitas e despesas mensais do ano com a média móvel dos últimos `window` meses"""
+    from app.analytics import rolling_mean
+
+    year = request.args.get('year', type=int, default=datetime.now().year)
+    window = max(1, min(request.args.get('window', type=int, default=3), 24))
+
+    result = []
+    for month in range(1, 13):
+        result.append({
+            'month': month,
+            'month_name': calendar.month_name[month],
+            'expenses': 0,
+            'income': 0,
+            'expenses_avg': 0,
+            'income_avg': 0,
+        })
+
+    # A média de janeiro usa os meses do ano anterior, por isso a série é completa
+    for key, sign in (('expenses', -1), ('income', 1)):
+        periods, totals = monthly_series(sign)
+        averages = rolling_mean(abs(totals), window)
+        in_year = periods // 12 == year
+        for period, total, average in zip(periods[in_year], totals[in_year], averages[in_year]):
+            item = result[period % 12]
+            item[key] = abs(float(from_cents(int(total))))
+            item[f'{key}_avg'] = round(float(average) / 100, 2)
+
+    return jsonify(result)
+
+
+@reports_bp.route('/data/trend')
+def trend():
+    """Tendência linear das despesas (ou receitas) nos últimos `months` meses com dados"""
+    from app.analytics import linear_trend
+
+    kind = request.args.get('type', 'expenses')
+    if kind not in ('expenses', 'income'):
+        return jsonify({'error': 'Tipo inválido; use expenses ou income'}), 400
+
+    months = max(2, min(request.args.get('months', type=int, default=12), 120))
+    category_id = request.args.get('category_id', type=int)
+    if category_id == -1:  # Sem categoria
+        category_id = 0
+
+    periods, totals = monthly_series(-1 if kind == 'expenses' else 1, category_id)
+    periods, totals = periods[-months:], abs(totals[-months:])
+    slope, intercept = linear_trend(totals)
+
+    # Variação mensal abaixo de 1% da média é considerada estável
+    mean = float(totals.mean()) if len(totals) else 0
+    if abs(slope) <= 0.01 * mean:
+        direction = 'flat'
+    else:
+        direction = 'up' if slope > 0 else 'down'
 
     return jsonify({
-        'period': period_name,
-        'expenses': abs(float(expenses)),
-        'income': float(income),
-        'balance': float(balance),
-        'expense_change': float(expense_change),
-        'income_change': float(income_change),
-        'top_categories': top_categories_data
-    })
\ No newline at end of file
+        'type': kind,
+        'category_id': request.args.get('category_id', type=int),
+        'months': [
+            {'year': int(period // 12), 'month': int(period % 12 + 1), 'value': float(from_cents(int(total)))}
+            for period, total in zip(periods, totals)
+        ],
+        'slope': round(slope / 100, 2),  # Reais por mês
+        'projection': round(max(intercept + slope * len(totals), 0) / 100, 2),  # Próximo mês
+        'direction': direction,
+    })
+
+
+@reports_bp.route('/chart/<chart>.<image_format>')
+def chart(chart, image_format):
+    """Gráfico de categorias ou mensal desenhado no servidor (PNG ou SVG), com cache em disco"""
+    from app.charts import CHARTS, FORMATS, get_chart
+
+    if chart not in CHARTS or image_format not in FORMATS:
+        return jsonify({'error': 'Gráfico inválido; use categories ou monthly, em png ou svg'}), 404
+
+    year = request.args.get('year', type=int, default=datetime.now().year)
+    month = request.args.get('month', type=int) if chart == 'categories' else None
+    if month is not None and not 1 <= month <= 12:
+        return jsonify({'error': 'Mês inválido'}), 400
+    user_id = request.args.get('user_id', type=int)
+
+    path, version = get_chart(current_app.config['CHART_CACHE_FOLDER'], chart, year, month, user_id, image_format)
+
+    # A versão dos dados é o ETag: o navegador revalida e recebe 304 enquanto nada mudar
+    response = send_file(os.path.abspath(path), mimetype=FORMATS[image_format], etag=version, max_age=0)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+@reports_bp.route('/imports')
+def import_batches():
+    """Lotes de importação mais lentos, com o tempo de cada etapa"""
+    limit = request.args.get('limit', type=int, default=50)
+    limit = max(1, min(limit, 500))
+
+    batches = ImportBatch.query.filter(
+        ImportBatch.wall_time.isnot(None)
+    ).order_by(
+        ImportBatch.wall_time.desc()
+    ).limit(limit).all()
+
+    return render_template('reports/imports.html',
+                           batches=batches,
+                           stages=STAGES + ('parse_wait',),
+                           limit=limit)
@@ -1,52 +1,109 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, flash, current_app, jsonify, Response, \
+    stream_with_context
+import csv
+import io
+import json
 import os
+import uuid
 from datetime import datetime
+from sqlalchemy import tuple_
 from werkzeug.utils import secure_filename
 from app import db
-from app.models import Transaction, Category, CategoryKeyword
+from app.models import Transaction, Category, CategoryKeyword, ImportJob, ImportBatch, MonthlySummary, from_cents
+from app.search import parse_search, search_condition
 from app.forms import UploadForm
-from app.services import import_ofx, categorize_transaction
+from app.batches import rollback_batch
+from app.jobs import submit_import, submit_batch_import
+from app.services import recategorize_uncategorized, assign_categories, assign_category_where, \
+    CategoryAssignmentError
+from app.summary import move_transactions
 
 transaction_bp = Blueprint('transactions', __name__, url_prefix='/transactions')
 
 
-@transaction_bp.route('/')
-@transaction_bp.route('/')
-def list_transactions():
-    """Lista todas as transações com filtros"""
-    # Obter parâmetros de filtro
-    year = request.args.get('year', type=int)
-    month = request.args.get('month', type=int)
-    category_id = request.args.get('category_id', type=int)
-
-    # Construir query
-    query = Transaction.query
-
-    # Aplicar filtros
+def transaction_filters(year=None, month=None, category_id=None, search=None):
+    """Condições dos filtros de ano, mês, categoria (-1 = sem categoria) e busca na descrição"""
+    conditions = []
     if year is not None:
-        query = query.filter(Transaction.year == year)
+        conditions.append(Transaction.year == year)
 
     if month is not None:
-        query = query.filter(Transaction.month == month)
+        conditions.append(Transaction.month == month)
 
     if category_id is not None:
         if category_id == -1:  # Sem categoria
-            query = query.filter(Transaction.category_id == None)
+            conditions.append(Transaction.category_id == None)
         else:
-            query = query.filter(Transaction.category_id == category_id)
+            conditions.append(Transaction.category_id == category_id)
 
-    # Executar query
-    transactions = query.order_by(Transaction.date.desc()).all()
+    if search:
+        condition = search_condition(search, db.session.get_bind().dialect.name)
+        if condition is not None:
+            conditions.append(condition)
 
-    # Adicione print para debug
-    print(f"Filtros aplicados: ano={year}, mês={month}, categoria={category_id}")
-    print(f"Total de transações após filtros: {len(transactions)}")
+    return conditions
+
+
+def filter_transactions(query, year=None, month=None, category_id=None, search=None):
+    """Aplica os filtros de ano, mês, categoria (-1 = sem categoria) e busca na descrição à consulta"""
+    return query.filter(*transaction_filters(year, month, category_id, search))
+
+
+def parse_cursor(cursor):
+    """Converte o cursor de paginação ('<data ISO>|<id>') em (data, id)"""
+    try:
+        date, transaction_id = cursor.rsplit('|', 1)
+        return datetime.fromisoformat(date), int(transaction_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+@transaction_bp.route('/')
+def list_transactions():
+    """Lista as transações com filtros, paginadas por (data, id) decrescentes"""
+    # Obter parâmetros de filtro
+    year = request.args.get('year', type=int)
+    month = request.args.get('month', type=int)
+    category_id = request.args.get('category_id', type=int)
+    search = request.args.get('q', '').strip()
+
+    # Tamanho da página (limitado para que o custo da página continue previsível)
+    per_page = request.args.get('per_page', type=int, default=current_app.config['TRANSACTIONS_PAGE_SIZE'])
+    per_page = max(1, min(per_page, current_app.config['TRANSACTIONS_MAX_PAGE_SIZE']))
+
+    query = filter_transactions(Transaction.query, year, month, category_id, search)
+
+    # Paginação por chave: continuar a partir da última linha da página anterior (cursor)
+    # ou voltar a partir da primeira linha da página seguinte (before)
+    cursor = parse_cursor(request.args.get('cursor'))
+    before = parse_cursor(request.args.get('before'))
+    key = tuple_(Transaction.date, Transaction.id)
+
+    # Uma linha a mais indica se existe mais uma página no sentido da leitura
+    if before is not None:
+        transactions = query.filter(key > before) \
+            .order_by(Transaction.date, Transaction.id).limit(per_page + 1).all()
+        has_previous, has_next = len(transactions) > per_page, True
+        transactions = transactions[:per_page][::-1]
+    else:
+        if cursor is not None:
+            query = query.filter(key < cursor)
+        transactions = query.order_by(Transaction.date.desc(), Transaction.id.desc()).limit(per_page + 1).all()
+        has_previous, has_next = cursor is not None, len(transactions) > per_page
+        transactions = transactions[:per_page]
+
+    next_cursor = prev_cursor = None
+    if transactions:
+        if has_next:
+            next_cursor = f'{transactions[-1].date.isoformat()}|{transactions[-1].id}'
+        if has_previous:
+            prev_cursor = f'{transactions[0].date.isoformat()}|{transactions[0].id}'
 
     # Obter todas as categorias para o formulário de filtro
     categories = Category.query.order_by(Category.name).all()
 
-    # Obter anos e meses únicos para o filtro
-    years = db.session.query(Transaction.year).distinct().order_by(Transaction.year.desc()).all()
+    # Obter anos únicos para o filtro (a partir do agregado mensal)
+    years = db.session.query(MonthlySummary.year).distinct().order_by(MonthlySummary.year.desc()).all()
     years = [y[0] for y in years]
 
     # Se não houver anos nos dados, use o ano atual
@@ -59,91 +116,296 @@ def list_transactions():
                            years=years,
                            selected_year=year,
                            selected_month=month,
-                           selected_category=category_id)
+                           selected_category=category_id,
+                           search=search,
+                           per_page=per_page,
+                           prev_cursor=prev_cursor,
+                           next_cursor=next_cursor)
+
+
+# Colunas exportadas, na ordem do CSV
+EXPORT_COLUMNS = ['id', 'date', 'description', 'amount', 'category_id', 'category',
+                  'account_id', 'external_id', 'source_filename']
+
+
+@transaction_bp.route('/export')
+def export_transactions():
+    """Exporta as transações filtradas em CSV ou NDJSON, em fluxo
+
+    Aceita os mesmos filtros da listagem (year, month, category_id, q). As linhas
+    são lidas do banco em lotes (yield_per) e enviadas à medida que chegam,
+    então a memória usada não depende da quantidade exportada. Com
+    source=archive a leitura vem do arquivo Parquet, um mês por vez.
+    """
+    export_format = request.args.get('format', 'csv')
+    if export_format not in ('csv', 'ndjson'):
+        return jsonify({'error': 'Formato inválido; use csv ou ndjson'}), 400
+
+    year = request.args.get('year', type=int)
+    month = request.args.get('month', type=int)
+    category_id = request.args.get('category_id', type=int)
+    search = request.args.get('q', '').strip()
+
+    source = request.args.get('source', 'db')
+    if source not in ('db', 'archive'):
+        return jsonify({'error': 'Origem inválida; use db ou archive'}), 400
+    if source == 'archive' and search:
+        return jsonify({'error': 'A busca (q) só está disponível com source=db'}), 400
+
+    query = filter_transactions(db.session.query(
+        Transaction.id,
+        Transaction.date,
+        Transaction.description,
+        Transaction.amount_cents,
+        Transaction.category_id,
+        Transaction.account_id,
+        Transaction.external_id,
+        Transaction.source_filename
+    ), year, month, category_id, search).order_by(Transaction.date.desc(), Transaction.id.desc())
+
+    # Poucas categorias: o nome é resolvido em memória em vez de um JOIN por linha
+    category_names = dict(db.session.query(Category.id, Category.name).all())
+    batch_size = current_app.config['EXPORT_BATCH_SIZE']
+
+    if source == 'archive':
+        from app.archive import ArchiveUnavailable, archive_dataset, iter_archive_transactions
+        try:
+            rows = iter_archive_transactions(archive_dataset(current_app), year, month, category_id)
+        except ArchiveUnavailable as e:
+            return jsonify({'error': str(e)}), 400
+    else:
+        rows = (row._mapping for row in query.execution_options(yield_per=batch_size))
+
+    def records():
+        for row in rows:
+            yield {
+                'id': row['id'],
+                'date': row['date'].isoformat(),
+                'description': row['description'],
+                'amount': str(from_cents(row['amount_cents'])),
+                'category_id': row['category_id'],
+                'category': category_names.get(row['category_id']),
+                'account_id': row['account_id'],
+                'external_id': row['external_id'],
+                'source_filename': row['source_filename'],
+            }
+
+    def generate_csv():
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+        writer.writeheader()
+
+        for count, record in enumerate(records(), 1):
+            writer.writerow(record)
+            if count % batch_size == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+
+        yield buffer.getvalue()
+
+    def generate_ndjson():
+        lines = []
+        for record in records():
+            lines.append(json.dumps(record, ensure_ascii=False))
+            if len(lines) >= batch_size:
+                yield '\n'.join(lines) + '\n'
+                lines = []
+
+        if lines:
+            yield '\n'.join(lines) + '\n'
+
+    if export_format == 'csv':
+        body, mimetype = generate_csv(), 'text/csv'
+    else:
+        body, mimetype = generate_ndjson(), 'application/x-ndjson'
+
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename=transacoes.{export_format}'}
+    )
 
 
 @transaction_bp.route('/upload', methods=['GET', 'POST'])
 def upload():
-    """Upload e importação de arquivo OFX"""
+    """Upload de arquivos OFX (ou ZIP); a importação roda em segundo plano"""
     form = UploadForm()
 
     if form.validate_on_submit():
         try:
-            file = form.file.data
-            filename = secure_filename(file.filename)
-            filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
+            files = []
+            for file in form.file.data:
+                filename = secure_filename(file.filename)
+                # Prefixo único para que envios simultâneos do mesmo arquivo não colidam
+                filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], f'{uuid.uuid4().hex}_{filename}')
+                file.save(filepath)
+                files.append((filepath, filename))
+
+            # Um único OFX é lido em fluxo; vários arquivos ou ZIPs vão para o lote paralelo
+            if len(files) == 1 and not filename.lower().endswith('.zip'):
+                job = submit_import(filepath, filename)
+            else:
+                filename = filename if len(files) == 1 else f'{len(files)} arquivos'
+                job = submit_batch_import(files, filename)
+
+            flash(f'Importação de {filename} iniciada.', 'info')
+            return redirect(url_for('transactions.upload', job_id=job.id))
 
-            # Importar transações
-            new_transactions = import_ofx(filepath)
+        except Exception as e:
+            db.session.rollback()
+            flash(f'Erro ao importar arquivo: {str(e)}', 'danger')
 
-            # Categorizar transações
-            categorizadas = 0
-            for transaction in new_transactions:
-                if categorize_transaction(transaction):
-                    categorizadas += 1
-                db.session.add(transaction)
+    # Job em andamento (ou concluído) para acompanhar na página
+    job = None
+    job_id = request.args.get('job_id', type=int)
+    if job_id is not None:
+        job = db.session.get(ImportJob, job_id)
 
-            db.session.commit()
+    # Certifique-se de que esta linha esteja presente e não indentada dentro do bloco if
+    return render_template('transactions/upload.html', form=form, job=job)
 
-            flash(
-                f'{len(new_transactions)} transações importadas com sucesso! {categorizadas} foram categorizadas automaticamente.',
-                'success')
-            return redirect(url_for('transactions.list_transactions'))
 
-        except Exception as e:
-            flash(f'Erro ao importar arquivo: {str(e)}', 'danger')
+@transaction_bp.route('/batches/<int:batch_id>/rollback', methods=['POST'])
+def rollback_import_batch(batch_id):
+    """Desfaz um lote de importação, removendo as transações que ele inseriu"""
+    batch = ImportBatch.query.get_or_404(batch_id)
+
+    if batch.status not in ('done', 'failed'):
+        flash(f'O lote {batch.id} não pode ser desfeito (situação: {batch.status}).', 'warning')
+        return redirect(url_for('reports.import_batches'))
+
+    removed = rollback_batch(batch)
+    db.session.commit()
+
+    flash(f'Lote {batch.id} ({batch.filename}) desfeito: {removed} transações removidas.', 'success')
+    return redirect(url_for('reports.import_batches'))
+
+
+@transaction_bp.route('/import/<int:job_id>')
+def import_status(job_id):
+    """Retorna o estado de um job de importação em JSON"""
+    job = db.session.get(ImportJob, job_id)
+    if job is None:
+        return jsonify({'error': 'Job não encontrado'}), 404
+
+    return jsonify(job.to_dict())
 
-    # Certifique-se de que esta linha esteja presente e não indentada dentro do bloco if
-    return render_template('transactions/upload.html', form=form)
+
+def _optional_int(value):
+    """Inteiro ou None (JSON null / campo vazio); ValueError para o resto"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError(value)
+    return int(value)
+
+
+def parse_assignments(items):
+    """Converte [{transaction_id, category_id}] em {transaction_id: category_id}
+
+    Retorna (atribuições, erros); a mesma transação com categorias diferentes é um erro.
+    """
+    assignments, errors = {}, []
+    for position, item in enumerate(items if isinstance(items, list) else [items]):
+        try:
+            transaction_id = _optional_int(item.get('transaction_id'))
+            category_id = _optional_int(item.get('category_id'))
+            if transaction_id is None:
+                raise ValueError(item)
+        except (AttributeError, ValueError):
+            errors.append({'index': position, 'error': f'Item {position} inválido'})
+            continue
+
+        if assignments.get(transaction_id, category_id) != category_id:
+            errors.append({'transaction_id': transaction_id,
+                           'error': f'Transação {transaction_id} repetida com categorias diferentes'})
+        assignments[transaction_id] = category_id
+    return assignments, errors
+
+
+@transaction_bp.route('/categories', methods=['POST'])
+def update_categories():
+    """Atribui categorias em lote (JSON), em uma única transação do banco
+
+    Aceita {"assignments": [{"transaction_id": 1, "category_id": 2}, ...]}
+    (category_id null = sem categoria) ou {"filter": {year, month,
+    category_id, q}, "category_id": 2} para mover todas as transações
+    filtradas. Um filtro vazio (ou só com uma busca sem termos) moveria a
+    tabela inteira: é recusado, a menos que traga "all": true. Erros de
+    validação recusam o lote inteiro com 400.
+    """
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict) or ('assignments' in payload) == ('filter' in payload) \
+            or ('filter' in payload and 'category_id' not in payload):
+        return jsonify({'error': 'Envie "assignments" ou "filter" com "category_id"'}), 400
+
+    try:
+        if 'assignments' in payload:
+            assignments, errors = parse_assignments(payload['assignments'])
+            if errors:
+                return jsonify({'error': 'Lote inválido', 'errors': errors}), 400
+            result = assign_categories(assignments)
+        else:
+            filters = payload['filter']
+            try:
+                if not isinstance(filters, dict):
+                    raise ValueError(filters)
+                search = str(filters.get('q') or '').strip()
+                conditions = transaction_filters(
+                    _optional_int(filters.get('year')),
+                    _optional_int(filters.get('month')),
+                    _optional_int(filters.get('category_id')),
+                    search
+                )
+                category_id = _optional_int(payload.get('category_id'))
+            except ValueError:
+                return jsonify({'error': 'Filtro inválido'}), 400
+
+            # transaction_filters descarta buscas sem termos (só pontuação), o que ampliaria o alcance
+            if search and not parse_search(search):
+                return jsonify({'error': 'A busca não tem termos pesquisáveis'}), 400
+            if not conditions and filters.get('all') is not True:
+                return jsonify({'error': 'Filtro vazio: informe um filtro ou "all": true para todas as transações'}), 400
+            result = assign_category_where(conditions, category_id)
+    except CategoryAssignmentError as e:
+        db.session.rollback()
+        return jsonify({'error': 'Lote inválido', 'errors': e.errors}), 400
+
+    db.session.commit()
+    return jsonify(result)
 
 
 @transaction_bp.route('/<int:id>/category', methods=['POST'])
 def update_category(id):
-    # código existente
-    pass
+    """Atribui a categoria de uma única transação (formulário sem JavaScript)"""
+    try:
+        assign_categories({id: request.form.get('category_id', type=int)})
+    except CategoryAssignmentError as e:
+        db.session.rollback()
+        flash(str(e), 'danger')
+    else:
+        db.session.commit()
+        flash('Categoria atualizada com sucesso!', 'success')
+    return redirect(request.referrer or url_for('transactions.list_transactions'))
 
 
 # Adicione a nova rota de recategorização como uma função separada no nível principal
 @transaction_bp.route('/recategorize')
 def recategorize_all():
-    """Recategoriza todas as transações sem categoria"""
-    transactions = Transaction.query.filter_by(category_id=None).all()
-    print(f"Encontradas {len(transactions)} transações sem categoria")
-
-    count = 0
-    for transaction in transactions:
-        print(f"\n--- Transação: {transaction.description} ---")
-        # Verificar categorias disponíveis
-        is_expense = transaction.amount < 0
-        categories = Category.query.filter_by(is_expense=is_expense).all()
-        print(f"Categorias disponíveis ({len(categories)}):")
-        for cat in categories:
-            keywords = CategoryKeyword.query.filter_by(category_id=cat.id).all()
-            print(f"  - {cat.name} ({len(keywords)} palavras-chave)")
-            for kw in keywords:
-                print(f"    * '{kw.keyword}' ({kw.match_type})")
-
-                # Testar manualmente cada palavra-chave
-                if kw.match_type == 'exact':
-                    if kw.keyword.lower() == transaction.description.lower():
-                        print(f"    >>> MATCH EXACT ENCONTRADO!")
-                else:  # 'contains'
-                    if kw.keyword.lower() in transaction.description.lower():
-                        print(f"    >>> MATCH CONTAINS ENCONTRADO!")
-
-        # Agora tente categorizar
-        success = categorize_transaction(transaction)
-        if success:
-            count += 1
-            print(f">>> Transação categorizada com sucesso: {transaction.category.name}")
-        else:
-            print(">>> Transação não foi categorizada")
+    """Recategoriza todas as transações sem categoria
+
+    Com ?dry_run=1 retorna em JSON o que seria alterado, sem gravar nada.
+    """
+    dry_run = request.args.get('dry_run', type=int) == 1
+
+    result = recategorize_uncategorized(dry_run=dry_run)
+    if dry_run:
+        return jsonify(result)
 
-    # Salvar alterações
     db.session.commit()
 
-    flash(f'{count} transações foram categorizadas automaticamente.', 'success')
+    flash(f'{result["categorized"]} transações foram categorizadas automaticamente.', 'success')
     return redirect(url_for('transactions.list_transactions'))
 
 
@@ -199,7 +461,9 @@ def test_match(transaction_id, keyword_id):
     if keyword_lower in transaction_lower:
         output.append("<b style='color:green'>MATCH ENCONTRADO!</b>")
         # Tenta categorizar
+        move_transactions(Transaction.id == transaction.id, category_id=keyword.category_id)
         transaction.category_id = keyword.category_id
+        transaction.categorized_by = 'keyword'
         db.session.commit()
         output.append(f"Transação categorizada como {keyword.category.name}")
     else:
@@ -0,0 +1,160 @@
+import re
+from sqlalchemy import column, event, text
+from app.models import Transaction
+
+# Índice FTS5 de conteúdo externo: guarda só os termos; o texto continua em transactions.
+# remove_diacritics faz "pao" encontrar "pão". As instruções são idempotentes: uma migração
+# que recrie a tabela transactions (batch do SQLite apaga os gatilhos) é corrigida por
+# repair_search_index, chamado pelo migrations/env.py ao fim de cada upgrade.
+FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts USING fts5("
+    "description, content='transactions', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS transactions_fts_insert AFTER INSERT ON transactions BEGIN "
+    "INSERT INTO transactions_fts (rowid, description) VALUES (new.id, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS transactions_fts_delete AFTER DELETE ON transactions BEGIN "
+    "INSERT INTO transactions_fts (transactions_fts, rowid, description) VALUES ('delete', old.id, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS transactions_fts_update AFTER UPDATE OF description ON transactions BEGIN "
+    "INSERT INTO transactions_fts (transactions_fts, rowid, description) VALUES ('delete', old.id, old.description); "
+    "INSERT INTO transactions_fts (rowid, description) VALUES (new.id, new.description); END",
+)
+
+# Índice de trigramas: busca por trecho de texto em qualquer posição (como as palavras-chave
+# 'contains' do categorizador), sem diferenciar maiúsculas; exige trechos de 3 caracteres ou mais
+TRIGRAM_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS transactions_trigram USING fts5("
+    "description, content='transactions', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS transactions_trigram_insert AFTER INSERT ON transactions BEGIN "
+    "INSERT INTO transactions_trigram (rowid, description) VALUES (new.id, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS transactions_trigram_delete AFTER DELETE ON transactions BEGIN "
+    "INSERT INTO transactions_trigram (transactions_trigram, rowid, description) "
+    "VALUES ('delete', old.id, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS transactions_trigram_update AFTER UPDATE OF description ON transactions BEGIN "
+    "INSERT INTO transactions_trigram (transactions_trigram, rowid, description) "
+    "VALUES ('delete', old.id, old.description); "
+    "INSERT INTO transactions_trigram (rowid, description) VALUES (new.id, new.description); END",
+)
+
+SEARCH_DDL = FTS_DDL + TRIGRAM_DDL
+
+# Menor trecho que o índice de trigramas consegue procurar
+TRIGRAM_MIN_LENGTH = 3
+
+# Cada índice e as instruções que o criam
+SEARCH_INDEXES = {'transactions_fts': FTS_DDL, 'transactions_trigram': TRIGRAM_DDL}
+
+_TRIGGER_NAME = re.compile(r'CREATE TRIGGER IF NOT EXISTS (\w+)')
+
+# Trechos entre aspas (frases) ou palavras soltas da busca digitada
+_QUERY_PART = re.compile(r'"([^"]*)"?|(\S+)')
+_TOKEN = re.compile(r'\w+')
+
+
+def create_search_index(connection):
+    """Cria as tabelas FTS5 e os gatilhos que as mantêm sincronizadas (só no SQLite)"""
+    if connection.dialect.name != 'sqlite':
+        return
+    for statement in SEARCH_DDL:
+        connection.exec_driver_sql(statement)
+
+
+def missing_search_triggers(connection):
+    """{índice: gatilhos ausentes} dos índices de busca que existem no banco (só no SQLite)"""
+    if connection.dialect.name != 'sqlite':
+        return {}
+    existing = {name for name, in connection.exec_driver_sql(
+        "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')"
+    )}
+
+    missing = {}
+    for index, statements in SEARCH_INDEXES.items():
+        if index not in existing:
+            continue  # Índice ainda não criado (ou removido por um downgrade)
+        triggers = [name for statement in statements for name in _TRIGGER_NAME.findall(statement)]
+        absent = [name for name in triggers if name not in existing]
+        if absent:
+            missing[index] = absent
+    return missing
+
+
+def repair_search_index(connection):
+    """Recria os gatilhos perdidos e reindexa os índices afetados; retorna {índice: gatilhos recriados}
+
+    Sem os gatilhos, as linhas alteradas nesse meio-tempo ficaram fora do
+    índice, então o índice inteiro é reconstruído a partir de transactions.
+    """
+    missing = missing_search_triggers(connection)
+    for index in missing:
+        for statement in SEARCH_INDEXES[index]:
+            connection.exec_driver_sql(statement)
+        connection.exec_driver_sql(f"INSERT INTO {index} ({index}) VALUES ('rebuild')")
+    return missing
+
+
+@event.listens_for(Transaction.__table__, 'after_create')
+def _after_create(target, connection, **kwargs):
+    # db.create_all (bancos temporários das ferramentas); os bancos reais usam as migrações
+    create_search_index(connection)
+
+
+@event.listens_for(Transaction.__table__, 'before_drop')
+def _before_drop(target, connection, **kwargs):
+    if connection.dialect.name == 'sqlite':
+        connection.exec_driver_sql('DROP TABLE IF EXISTS transactions_fts')
+        connection.exec_driver_sql('DROP TABLE IF EXISTS transactions_trigram')
+
+
+def parse_search(search):
+    """Converte a busca digitada em termos: [(palavras, prefixo)]
+
+    "posto shell" é uma frase; uber* é um prefixo; palavras soltas precisam
+    aparecer todas. Pontuação e operadores do FTS5 são descartados.
+    """
+    terms = []
+    for phrase, word in _QUERY_PART.findall(search or ''):
+        tokens = _TOKEN.findall(phrase if phrase else word)
+        if tokens:
+            terms.append((tokens, bool(word) and word.endswith('*')))
+    return terms
+
+
+def fts_expression(terms):
+    """Expressão MATCH do FTS5: cada termo entre aspas (literal), com * no prefixo"""
+    return ' '.join('"{}"{}'.format(' '.join(tokens), '*' if prefix else '') for tokens, prefix in terms)
+
+
+def search_condition(search, dialect='sqlite'):
+    """Condição de busca sobre Transaction.description; None se não houver termos
+
+    No SQLite consulta o índice FTS5; em outros bancos recorre a ILIKE.
+    """
+    terms = parse_search(search)
+    if not terms:
+        return None
+
+    if dialect != 'sqlite':
+        from sqlalchemy import and_
+        return and_(*(Transaction.description.ilike('%{}%'.format(' '.join(tokens))) for tokens, _ in terms))
+
+    matches = text('SELECT rowid FROM transactions_fts WHERE transactions_fts MATCH :search').bindparams(
+        search=fts_expression(terms)
+    ).columns(column('rowid'))
+    return Transaction.id.in_(matches)
+
+
+def substring_condition(fragment, dialect='sqlite'):
+    """Transações cuja descrição contém o trecho, sem diferenciar maiúsculas
+
+    No SQLite usa o índice de trigramas, que também ignora maiúsculas fora do
+    ASCII (Ç, Ã). Trechos com menos de TRIGRAM_MIN_LENGTH caracteres não
+    cabem no índice e retornam None: um LIKE leria a tabela inteira e o
+    lower() do SQLite só converte letras ASCII. Em outros bancos recorre a ILIKE.
+    """
+    if dialect != 'sqlite':
+        return Transaction.description.icontains(fragment, autoescape=True)
+    if len(fragment) < TRIGRAM_MIN_LENGTH:
+        return None
+
+    matches = text('SELECT rowid FROM transactions_trigram WHERE transactions_trigram MATCH :fragment').bindparams(
+        fragment='"{}"'.format(fragment.replace('"', '""'))
+    ).columns(column('rowid'))
+    return Transaction.id.in_(matches)
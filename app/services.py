@@ -1,90 +1,716 @@
 import os
-from ofxparse import OfxParser
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from collections import Counter, defaultdict
+from concurrent.futures.process import BrokenProcessPool
+from flask import current_app
+from sqlalchemy import and_, or_, update
+from werkzeug.utils import secure_filename
 from app import db
-from app.models import Transaction, Category, CategoryKeyword
+from app.models import Transaction, Category, CategoryKeyword, KeywordRulesVersion, to_cents
+from app.matcher import KeywordMatcher
+from app.ofx_reader import iter_ofx_transactions
+from app.batches import StageTimer, HashingReader, start_batch, finish_batch
+from app.dedup import assign_fingerprints
+from app.summary import apply_deltas, deltas_from_rows, merge_deltas, move_transactions
 
+# Máximo de parâmetros por consulta IN (o SQLite limita o número de variáveis)
+SQL_CHUNK_SIZE = 500
 
-def import_ofx(file_path):
-    """Importa transações de um arquivo OFX"""
-    transactions = []
-    print(f"Iniciando importação do arquivo: {file_path}")
+# Quantidade de transações do OFX processadas por lote na importação
+IMPORT_CHUNK_SIZE = 1000
 
-    with open(file_path, 'rb') as file:
-        ofx = OfxParser.parse(file)
+# Intervalo entre consultas à versão das regras: alterações feitas em outros processos
+# aparecem em até esse tempo; as do próprio processo descartam o cache na hora
+KEYWORD_RULES_CHECK_SECONDS = 1.0
 
-    account = ofx.account
+# (versão das regras, instante da última consulta à versão, matcher compilado)
+_keyword_matcher = None
+_keyword_matcher_lock = threading.Lock()
 
-    for ofx_transaction in account.statement.transactions:
-        # Verificar se a transação já existe
-        existing = Transaction.query.filter_by(external_id=ofx_transaction.id).first()
 
-        if not existing:
-            # Criar nova transação
-            transaction = Transaction(
-                external_id=ofx_transaction.id,
-                date=ofx_transaction.date,
-                amount=float(ofx_transaction.amount),
-                description=ofx_transaction.memo or ofx_transaction.payee,
-                source_filename=os.path.basename(file_path)
-            )
+def chunked(items, size):
+    """Divide uma sequência em listas de até `size` elementos"""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def dialect_insert(table):
+    """Retorna o INSERT do dialeto em uso, com ON CONFLICT (bancos em database.SUPPORTED_BACKENDS)"""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
+
+
+def existing_transaction_keys(keys):
+    """Retorna as chaves (conta, FITID) que já existem no banco (consulta IN em lotes)"""
+    found = set()
+    legacy = set()
+    for chunk in chunked({external_id for _, external_id in keys}, SQL_CHUNK_SIZE):
+        rows = db.session.query(Transaction.account_id, Transaction.external_id).filter(
+            Transaction.external_id.in_(chunk)
+        )
+        for account_id, external_id in rows:
+            # Transações antigas não têm conta; o FITID basta para considerá-las duplicadas
+            if account_id is None:
+                legacy.add(external_id)
+            else:
+                found.add((account_id, external_id))
+
+    return {key for key in keys if key in found or key[1] in legacy}
+
+
+def existing_fingerprints(keys):
+    """Retorna as chaves (fingerprint, ocorrência) que já existem no banco (consulta IN em lotes)"""
+    found = set()
+    for chunk in chunked({fingerprint for fingerprint, _ in keys}, SQL_CHUNK_SIZE):
+        found.update(db.session.query(Transaction.fingerprint, Transaction.occurrence).filter(
+            Transaction.fingerprint.in_(chunk)
+        ))
+
+    return {key for key in keys if key in found}
+
+
+def insert_transactions(rows):
+    """Insere transações em massa; duplicatas são descartadas pelo próprio banco
+
+    Mantém o agregado mensal e retorna quantas linhas foram de fato inseridas.
+    """
+    if not rows:
+        return 0
+
+    table = Transaction.__table__
+    statement = dialect_insert(table).on_conflict_do_nothing()
+
+    # Importações simultâneas podem inserir a mesma linha entre a consulta e o INSERT;
+    # o RETURNING traz apenas as linhas que entraram de fato
+    inserted = db.session.execute(
+        statement.returning(table.c.user_id, table.c.year, table.c.month, table.c.category_id, table.c.amount_cents),
+        rows
+    ).all()
+
+    apply_deltas(deltas_from_rows(inserted))
+    return len(inserted)
+
+
+def categorize_rows(rows):
+    """Categoriza linhas de transação (dicionários) usando o matcher compilado
+
+    As palavras-chave têm prioridade; as linhas sem regra correspondente
+    recebem a sugestão do classificador (suggest_categories).
+    """
+    matcher = get_keyword_matcher()
+    categorized = 0
+    unmatched = []
+    for row in rows:
+        row.setdefault('categorized_by', None)
+        if row.get('category_id'):
+            continue
+        row['category_id'] = matcher.match(row['description'], row['amount_cents'] < 0)
+        if row['category_id'] is not None:
+            row['categorized_by'] = 'keyword'
+            categorized += 1
+        else:
+            unmatched.append(row)
+    return categorized + suggest_categories(unmatched)
+
+
+def suggest_categories(rows):
+    """Aplica as sugestões do classificador estatístico (app/classifier.py) às linhas
+
+    Cada tipo (despesa/receita) é previsto de uma vez, com um produto de
+    matrizes; só sugestões com confiança a partir de CATEGORIZER_THRESHOLD
+    são aplicadas. Sem modelo treinado nada muda. Retorna as linhas categorizadas.
+    """
+    if not rows or not current_app.config['CATEGORIZER_ENABLED']:
+        return 0
+
+    from app.classifier import get_categorizer
+
+    categorizer = get_categorizer(current_app)
+    if categorizer is None:
+        return 0
+
+    threshold = current_app.config['CATEGORIZER_THRESHOLD']
+    categories = db.session.query(Category.id, Category.is_expense).all()
+    categorized = 0
+    for is_expense in (True, False):
+        selected = [row for row in rows if (row['amount_cents'] < 0) == is_expense]
+        if not selected:
+            continue
+
+        allowed = [id for id, category_is_expense in categories if bool(category_is_expense) == is_expense]
+        suggestions = categorizer.predict([row['description'] for row in selected], is_expense, allowed)
+        for row, (category_id, confidence) in zip(selected, suggestions):
+            if category_id is not None and confidence >= threshold:
+                row['category_id'] = category_id
+                row['categorized_by'] = 'classifier'
+                categorized += 1
+    return categorized
+
+
+def ofx_rows(file, source_filename):
+    """Converte as transações lidas do OFX em linhas da tabela transactions"""
+    for ofx_transaction in iter_ofx_transactions(file):
+        date = ofx_transaction['date']
+        yield {
+            'external_id': ofx_transaction['fitid'] or None,  # FITID vazio não identifica nada
+            'account_id': ofx_transaction['account_id'],
+            'date': date,
+            'year': date.year,
+            'month': date.month,
+            'amount_cents': to_cents(ofx_transaction['amount']),
+            'description': ofx_transaction['memo'] or ofx_transaction['payee'],
+            'source_filename': source_filename,
+            'category_id': None,
+        }
+
+
+def import_rows(rows, timer=None, batch_id=None, occurrences=None):
+    """Deduplica, categoriza e insere um lote de linhas; retorna o resumo do lote
 
-            transactions.append(transaction)
+    Uma linha é duplicata se a chave (conta, FITID) já existir ou, para linhas
+    com FITID vazio ou de contas em DEDUP_CONTENT_ACCOUNTS (FITID instável), se
+    a chave (fingerprint, ocorrência) já existir.
+    timer: StageTimer que acumula o tempo das etapas dedup, categorize e insert.
+    batch_id: lote de importação (ImportBatch) gravado nas transações inseridas.
+    occurrences: Counter de fingerprints do arquivo, compartilhado entre os lotes.
+    """
+    timer = timer or StageTimer()
 
-    return transactions
+    with timer.stage('dedup'):
+        assign_fingerprints(rows, Counter() if occurrences is None else occurrences,
+                            current_app.config.get('DEDUP_CONTENT_ACCOUNTS', ()))
+
+        # Descartar FITIDs repetidos dentro do próprio lote
+        unique = []
+        seen = set()
+        for row in rows:
+            if row['external_id'] is not None:
+                key = (row['account_id'], row['external_id'])
+                if key in seen:
+                    continue
+                seen.add(key)
+            unique.append(row)
+
+        existing = existing_transaction_keys(seen)
+        existing_content = existing_fingerprints({(row['fingerprint'], row['occurrence'])
+                                                  for row in unique if row['fingerprint'] is not None})
+        new_rows = [
+            row for row in unique
+            if (row['account_id'], row['external_id']) not in existing
+            and (row['fingerprint'], row['occurrence']) not in existing_content
+        ]
+
+    with timer.stage('categorize'):
+        categorized = categorize_rows(new_rows)
+
+    if batch_id is not None:
+        for row in new_rows:
+            row['batch_id'] = batch_id
+
+    with timer.stage('insert'):
+        imported = insert_transactions(new_rows)
+
+    return {
+        'imported': imported,
+        'skipped': len(rows) - imported,
+        'categorized': categorized,
+    }
+
+
+def import_ofx(file_path, chunk_size=None, source_filename=None, on_chunk=None, job_id=None):
+    """Importa transações de um arquivo OFX
+
+    O arquivo é lido de forma incremental e processado em lotes de tamanho
+    fixo, então o uso de memória não depende do tamanho do extrato. Lotes
+    posteriores enxergam as linhas já inseridas pelos anteriores, o que
+    elimina duplicatas entre lotes. O commit fica a cargo de quem chama;
+    `on_chunk` recebe o resumo de cada lote logo após a sua inserção (o tempo
+    gasto nele conta como a etapa commit). A execução é registrada em um
+    ImportBatch, com o hash do arquivo e o tempo de cada etapa.
+    Retorna um resumo com as quantidades importadas, ignoradas e categorizadas
+    e o id do lote.
+    """
+    chunk_size = chunk_size or current_app.config.get('IMPORT_CHUNK_SIZE', IMPORT_CHUNK_SIZE)
+    source_filename = source_filename or os.path.basename(file_path)
+    result = {'imported': 0, 'skipped': 0, 'categorized': 0}
+
+    batch = start_batch(source_filename, job_id)
+    timer = StageTimer()
+    occurrences = Counter()
+
+    with open(file_path, 'rb') as raw:
+        file = HashingReader(raw)
+        chunks = chunked(ofx_rows(file, source_filename), chunk_size)
+        while True:
+            # A leitura do OFX acontece sob demanda, a cada lote pedido
+            with timer.stage('parse'):
+                rows = next(chunks, None)
+            if rows is None:
+                break
+
+            chunk_result = import_rows(rows, timer, batch.id, occurrences)
+            for key, value in chunk_result.items():
+                result[key] += value
+
+            if on_chunk is not None:
+                with timer.stage('commit'):
+                    on_chunk(chunk_result)
+
+    finish_batch(batch, result, timer, file.hexdigest(), file.size)
+    result['batch_id'] = batch.id
+    return result
+
+
+def parse_ofx_file(file_path, source_filename):
+    """Lê um arquivo OFX inteiro (executado no pool de processos)
+
+    Retorna as linhas, o SHA-256 e o tamanho do arquivo e o tempo da leitura.
+    """
+    timer = StageTimer()
+    with open(file_path, 'rb') as raw, timer.stage('parse'):
+        file = HashingReader(raw)
+        rows = list(ofx_rows(file, source_filename))
+    return rows, file.hexdigest(), file.size, timer.as_dict()
+
+
+def extract_ofx_files(zip_path, dest_dir):
+    """Extrai os arquivos .ofx de um ZIP e retorna a lista de (caminho, nome)"""
+    files = []
+    with zipfile.ZipFile(zip_path) as archive:
+        for index, member in enumerate(archive.infolist()):
+            name = secure_filename(os.path.basename(member.filename))
+            if member.is_dir() or not name.lower().endswith('.ofx'):
+                continue
+
+            # Índice no nome para que membros homônimos em pastas diferentes não colidam
+            path = os.path.join(dest_dir, f'{index}_{name}')
+            with archive.open(member) as source, open(path, 'wb') as target:
+                shutil.copyfileobj(source, target)
+            files.append((path, name))
+
+    return files
+
+
+def import_ofx_batch(files, parse_pool=None, chunk_size=None, job_id=None, on_chunk=None):
+    """Importa vários arquivos OFX (ou ZIPs com arquivos OFX) de uma só vez
+
+    Os arquivos são lidos em paralelo no pool de processos e as transações
+    são mescladas e deduplicadas entre arquivos pela chave (conta, FITID) e pelo fingerprint,
+    na ordem em que os arquivos foram enviados. Cada ZIP é extraído em uma
+    pasta própria, removida ao final. O commit fica a cargo de quem chama;
+    `on_chunk` recebe a lista de resumos logo após cada lote inserido e ao fim
+    de cada arquivo, para que o lote seja confirmado aos poucos (o tempo gasto
+    nele conta como a etapa commit do arquivo). Cada arquivo vira um
+    ImportBatch; com o pool, a etapa parse é medida no processo que leu o
+    arquivo e parse_wait é a espera por ele. Retorna o resumo de cada arquivo
+    (importadas, ignoradas, categorizadas ou o erro de leitura, e o id do lote).
+    """
+    chunk_size = chunk_size or current_app.config.get('IMPORT_CHUNK_SIZE', IMPORT_CHUNK_SIZE)
+
+    # Expandir os ZIPs em arquivos OFX individuais, cada um em sua pasta: envios simultâneos
+    # (ou seguidos) de ZIPs com membros homônimos não podem ler os arquivos um do outro
+    ofx_files = []
+    extracted = []
+    try:
+        for file_path, filename in files:
+            if filename.lower().endswith('.zip'):
+                extracted.append(tempfile.mkdtemp(dir=os.path.dirname(file_path), prefix='.zip-'))
+                ofx_files.extend(extract_ofx_files(file_path, extracted[-1]))
+            else:
+                ofx_files.append((file_path, filename))
+
+        return _import_ofx_files(ofx_files, parse_pool, chunk_size, job_id, on_chunk)
+    finally:
+        for folder in extracted:
+            shutil.rmtree(folder, ignore_errors=True)
+
+
+def _import_ofx_files(ofx_files, parse_pool, chunk_size, job_id, on_chunk):
+    """Lê (no pool, se houver) e importa os arquivos OFX de import_ofx_batch, na ordem dada"""
+    if parse_pool is not None:
+        parsed = [parse_pool.submit(parse_ofx_file, path, name) for path, name in ofx_files]
+    else:
+        parsed = [None] * len(ofx_files)
+
+    summaries = []
+    for (file_path, filename), future in zip(ofx_files, parsed):
+        batch = start_batch(filename, job_id)
+        timer = StageTimer()
+        summary = {'filename': filename, 'imported': 0, 'skipped': 0, 'categorized': 0, 'error': None,
+                   'batch_id': batch.id}
+        summaries.append(summary)
+
+        try:
+            if future is not None:
+                with timer.stage('parse_wait'):
+                    rows, file_hash, file_size, timings = future.result()
+            else:
+                rows, file_hash, file_size, timings = parse_ofx_file(file_path, filename)
+        except BrokenProcessPool:
+            raise
+        except Exception as e:
+            summary['error'] = str(e)
+            finish_batch(batch, summary, timer, error=str(e))
+            if on_chunk is not None:
+                on_chunk(summaries)
+            continue
+
+        timer.merge(timings)
+
+        # Arquivos anteriores já foram inseridos: a deduplicação os enxerga
+        occurrences = Counter()
+        for chunk in chunked(rows, chunk_size):
+            for key, value in import_rows(chunk, timer, batch.id, occurrences).items():
+                summary[key] += value
+            if on_chunk is not None:
+                with timer.stage('commit'):
+                    on_chunk(summaries)
+
+        finish_batch(batch, summary, timer, file_hash, file_size)
+        if on_chunk is not None:
+            on_chunk(summaries)
+
+    return summaries
+
+
+def keyword_rules_version():
+    """Versão atual das regras de categorização (0 se nunca foram alteradas)"""
+    return db.session.query(KeywordRulesVersion.version).filter(KeywordRulesVersion.id == 1).scalar() or 0
+
+
+def load_keyword_matcher():
+    """Compila o matcher com as regras vistas pela sessão atual, sem passar pelo cache"""
+    categories = db.session.query(Category.id, Category.is_expense).order_by(Category.id).all()
+    keywords = db.session.query(
+        CategoryKeyword.category_id,
+        CategoryKeyword.keyword,
+        CategoryKeyword.match_type
+    ).order_by(CategoryKeyword.id).all()
+    return KeywordMatcher(categories, keywords)
+
+
+def get_keyword_matcher():
+    """Retorna o matcher de palavras-chave compilado (em cache no processo)
+
+    A versão das regras é consultada no máximo uma vez a cada
+    KEYWORD_RULES_CHECK_SECONDS (uma leitura por chave primária), então
+    categorizar transações uma a uma não consulta o banco; alterações feitas
+    em outros processos recompilam o matcher na consulta seguinte.
+    """
+    global _keyword_matcher
+
+    cached = _keyword_matcher
+    now = time.monotonic()
+    if cached is not None and now - cached[1] < KEYWORD_RULES_CHECK_SECONDS:
+        return cached[2]
+
+    version = keyword_rules_version()
+    with _keyword_matcher_lock:
+        if _keyword_matcher is None or _keyword_matcher[0] != version:
+            _keyword_matcher = (version, now, load_keyword_matcher())
+        else:
+            _keyword_matcher = (version, now, _keyword_matcher[2])
+        cached = _keyword_matcher
+
+    return cached[2]
+
+
+def invalidate_keyword_matcher():
+    """Registra que as regras mudaram e descarta o matcher em cache
+
+    Incrementa a versão das regras na sessão atual: deve ser chamada antes do
+    commit da alteração, para que os outros processos a vejam junto com ela.
+    """
+    global _keyword_matcher
+
+    table = KeywordRulesVersion.__table__
+    result = db.session.execute(table.update().where(table.c.id == 1).values(version=table.c.version + 1))
+    if result.rowcount == 0:
+        db.session.execute(table.insert().values(id=1, version=1))
+
+    with _keyword_matcher_lock:
+        _keyword_matcher = None
 
 
 def categorize_transaction(transaction):
     """Categoriza automaticamente uma transação baseada nas palavras-chave"""
-    print(f"Tentando categorizar: {transaction.description}")
-
     if transaction.category_id:
-        print(f"Já categorizada como: {transaction.category_id}")
         return False  # Já está categorizada
 
     # Para receitas, buscar apenas em categorias de receita
-    is_expense = transaction.amount < 0
-    print(f"É despesa: {is_expense}")
+    is_expense = transaction.amount_cents < 0
 
-    # Obter todas as categorias com suas palavras-chave
-    categories = Category.query.filter_by(is_expense=is_expense).all()
-    print(f"Categorias encontradas: {len(categories)}")
-
-    # Se não houver categorias do tipo correto, não faz nada
-    if not categories:
-        print("Nenhuma categoria encontrada do tipo correto")
+    category_id = get_keyword_matcher().match(transaction.description, is_expense)
+    if category_id is None:
         return False
 
-    for category in categories:
-        print(f"Verificando categoria: {category.name}")
-        # Obter palavras-chave da categoria
-        keywords = CategoryKeyword.query.filter_by(category_id=category.id).all()
-        print(f"Palavras-chave encontradas: {len(keywords)}")
+    transaction.category_id = category_id
+    transaction.categorized_by = 'keyword'
+    return True
 
-        # Se não tem palavras-chave, continua para a próxima categoria
-        if not keywords:
-            continue
 
-        # Verificar se alguma palavra-chave está na descrição
-        description = transaction.description.lower()
-        for keyword in keywords:
-            print(f"Verificando palavra-chave: '{keyword.keyword}' (tipo: {keyword.match_type})")
-            if keyword.match_type == 'exact':
-                print(f"Comparando exato: '{keyword.keyword.lower()}' == '{description}'")
-                # Comparação exata (ignorando maiúsculas/minúsculas)
-                if keyword.keyword.lower() == description:
-                    print(f"Match exato encontrado! Categoria: {category.name}")
-                    transaction.category_id = category.id
-                    return True
-            else:  # 'contains' é o padrão
-                print(f"Procurando: '{keyword.keyword.lower()}' em '{description}'")
-                # Verificar se contém a palavra-chave
-                if keyword.keyword.lower() in description:
-                    print(f"Match contém encontrado! Categoria: {category.name}")
-                    transaction.category_id = category.id
-                    return True
-
-    print("Nenhuma correspondência encontrada.")
-    return False
+def compatible_with(is_expense):
+    """Transações do mesmo tipo da categoria (despesa: valor negativo), como no matcher"""
+    return Transaction.amount_cents < 0 if is_expense else Transaction.amount_cents >= 0
+
+
+def move_rows(rows, category_id, categorized_by):
+    """Move as linhas lidas (id, user_id, year, month, category_id, amount_cents) para a categoria
+
+    None deixa as transações sem categoria. O agregado é ajustado pelos deltas
+    e a categoria é gravada com um UPDATE ... WHERE id IN por lote, junto com a
+    origem da escolha (categorized_by: 'keyword', 'classifier' ou 'manual').
+    """
+    apply_deltas(merge_deltas(
+        deltas_from_rows(rows, factor=-1),
+        deltas_from_rows(rows, category_id=category_id or 0),
+    ))
+    for ids_chunk in chunked([row.id for row in rows], SQL_CHUNK_SIZE):
+        db.session.execute(
+            update(Transaction)
+            .where(Transaction.id.in_(ids_chunk))
+            .values(category_id=category_id, categorized_by=categorized_by if category_id is not None else None)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def recategorize_uncategorized(dry_run=False, chunk_size=None):
+    """Recategoriza as transações sem categoria usando o matcher compilado
+
+    As transações são lidas em lotes ordenados por id (keyset) e as
+    atualizações são aplicadas com um UPDATE ... WHERE id IN por categoria.
+    Com dry_run nada é gravado. O commit fica a cargo de quem chama.
+    Retorna as quantidades analisadas e categorizadas, por categoria.
+    """
+    chunk_size = chunk_size or current_app.config.get('IMPORT_CHUNK_SIZE', IMPORT_CHUNK_SIZE)
+    matcher = get_keyword_matcher()
+    counts = defaultdict(int)
+    scanned = 0
+    last_id = 0
+
+    while True:
+        rows = db.session.query(
+            Transaction.id,
+            Transaction.description,
+            Transaction.amount_cents,
+            Transaction.user_id,
+            Transaction.year,
+            Transaction.month,
+            Transaction.category_id
+        ).filter(
+            Transaction.category_id.is_(None),
+            Transaction.id > last_id
+        ).order_by(Transaction.id).limit(chunk_size).all()
+
+        if not rows:
+            break
+
+        scanned += len(rows)
+        last_id = rows[-1].id
+
+        updates = defaultdict(list)
+        for row in rows:
+            category_id = matcher.match(row.description, row.amount_cents < 0)
+            if category_id is not None:
+                updates[category_id].append(row)
+
+        for category_id, matched in updates.items():
+            counts[category_id] += len(matched)
+            if dry_run:
+                continue
+
+            move_rows(matched, category_id, 'keyword')
+
+    names = dict(db.session.query(Category.id, Category.name).filter(Category.id.in_(list(counts))))
+    return {
+        'dry_run': dry_run,
+        'scanned': scanned,
+        'categorized': sum(counts.values()),
+        'categories': [
+            {'id': category_id, 'name': names.get(category_id), 'count': count}
+            for category_id, count in sorted(counts.items(), key=lambda item: -item[1])
+        ],
+    }
+
+
+def recategorize_for_keyword(keyword, category, removed=False, dry_run=False):
+    """Recategoriza só as transações afetadas por uma palavra-chave incluída ou excluída
+
+    Os candidatos vêm do índice de trigramas (app/search.py): transações sem
+    categoria que contêm a palavra, na inclusão, ou, na exclusão, as que uma
+    regra colocou na categoria da palavra e que a contêm; escolhas manuais e do
+    classificador não são tocadas. O custo acompanha o número de candidatos, não
+    o tamanho da tabela. Cada candidato é reavaliado pelas regras da sessão
+    atual (a regra já gravada ou já removida, ainda sem commit) e os que mudam
+    são movidos em lote. O commit fica a cargo de quem chama. Retorna as
+    quantidades analisadas e movidas.
+    """
+    from app.search import substring_condition
+
+    # Compilado aqui: o cache do processo não pode guardar regras ainda sem commit
+    matcher = load_keyword_matcher()
+
+    if removed:
+        current = and_(Transaction.category_id == category.id, Transaction.categorized_by == 'keyword')
+    else:
+        current = Transaction.category_id.is_(None)
+    filters = [current, compatible_with(category.is_expense)]
+
+    # Palavras curtas demais para o índice (regras anteriores ao limite do formulário):
+    # sem pré-filtro, o matcher reavalia todas as transações do escopo
+    candidates = substring_condition(keyword.lower(), db.engine.dialect.name)
+    if candidates is not None:
+        filters.append(candidates)
+
+    rows = db.session.query(
+        Transaction.id,
+        Transaction.description,
+        Transaction.amount_cents,
+        Transaction.user_id,
+        Transaction.year,
+        Transaction.month,
+        Transaction.category_id
+    ).filter(*filters).all()
+
+    updates = defaultdict(list)
+    for row in rows:
+        category_id = matcher.match(row.description, row.amount_cents < 0)
+        if category_id != row.category_id:
+            updates[category_id].append(row)
+
+    if not dry_run:
+        for category_id, matched in updates.items():
+            move_rows(matched, category_id, 'keyword')
+
+    return {
+        'dry_run': dry_run,
+        'scanned': len(rows),
+        'moved': sum(len(matched) for matched in updates.values()),
+    }
+
+
+class CategoryAssignmentError(ValueError):
+    """Atribuição de categorias recusada; `errors` lista cada problema encontrado"""
+
+    def __init__(self, errors):
+        super().__init__('; '.join(error['error'] for error in errors))
+        self.errors = errors
+
+
+def assign_categories(assignments):
+    """Atribui categorias manualmente a várias transações de uma vez
+
+    assignments: {transaction_id: category_id ou None (sem categoria)}.
+    Tudo é validado antes de gravar (transações e categorias existentes,
+    despesa/receita compatíveis); qualquer problema recusa o lote inteiro com
+    CategoryAssignmentError. As transações que mudam de categoria são movidas
+    em lote, por categoria de destino, mantendo o agregado; as que já estavam na
+    categoria passam a contar como escolha manual. O commit fica a cargo de quem
+    chama. Retorna as quantidades alteradas e inalteradas.
+    """
+    targets = {category_id for category_id in assignments.values() if category_id is not None}
+    categories = dict(db.session.query(Category.id, Category.is_expense).filter(Category.id.in_(targets)))
+
+    rows = []
+    for ids_chunk in chunked(list(assignments), SQL_CHUNK_SIZE):
+        rows.extend(db.session.query(
+            Transaction.id,
+            Transaction.amount_cents,
+            Transaction.user_id,
+            Transaction.year,
+            Transaction.month,
+            Transaction.category_id,
+            Transaction.categorized_by
+        ).filter(Transaction.id.in_(ids_chunk)))
+
+    errors = [
+        {'category_id': category_id, 'error': f'Categoria {category_id} não encontrada'}
+        for category_id in sorted(targets - set(categories))
+    ]
+    found = {row.id for row in rows}
+    errors.extend(
+        {'transaction_id': transaction_id, 'error': f'Transação {transaction_id} não encontrada'}
+        for transaction_id in sorted(set(assignments) - found)
+    )
+    for row in rows:
+        category_id = assignments[row.id]
+        if category_id in categories and bool(categories[category_id]) != (row.amount_cents < 0):
+            kind = 'despesa' if categories[category_id] else 'receita'
+            errors.append({
+                'transaction_id': row.id,
+                'category_id': category_id,
+                'error': f'Transação {row.id} não é compatível com a categoria {category_id} ({kind})'
+            })
+    if errors:
+        raise CategoryAssignmentError(errors)
+
+    moves = defaultdict(list)
+    confirmed = []
+    for row in rows:
+        if assignments[row.id] != row.category_id:
+            moves[assignments[row.id]].append(row)
+        elif row.category_id is not None and row.categorized_by != 'manual':
+            confirmed.append(row.id)
+
+    for category_id, moved in moves.items():
+        move_rows(moved, category_id, 'manual')
+    for ids_chunk in chunked(confirmed, SQL_CHUNK_SIZE):
+        db.session.execute(
+            update(Transaction)
+            .where(Transaction.id.in_(ids_chunk))
+            .values(categorized_by='manual')
+            .execution_options(synchronize_session=False)
+        )
+
+    updated = sum(len(moved) for moved in moves.values())
+    return {'updated': updated, 'unchanged': len(rows) - updated}
+
+
+def assign_category_where(filters, category_id):
+    """Move todas as transações que atendem aos filtros para a categoria (None = sem categoria)
+
+    Transações de tipo incompatível com a categoria (receita em categoria de
+    despesa e vice-versa) ficam de fora e são contadas em `skipped`. O agregado
+    é ajustado no banco e a categoria gravada com um único UPDATE. O commit fica
+    a cargo de quem chama.
+    """
+    conditions = list(filters)
+    skipped = 0
+    if category_id is None:
+        conditions.append(Transaction.category_id.isnot(None))
+    else:
+        category = db.session.get(Category, category_id)
+        if category is None:
+            raise CategoryAssignmentError([
+                {'category_id': category_id, 'error': f'Categoria {category_id} não encontrada'}
+            ])
+        conditions.append(or_(Transaction.category_id.is_(None), Transaction.category_id != category_id))
+        skipped = db.session.query(Transaction.id).filter(
+            *conditions, ~compatible_with(category.is_expense)
+        ).count()
+        conditions.append(compatible_with(category.is_expense))
+
+    move_transactions(*conditions, category_id=category_id)
+    result = db.session.execute(
+        update(Transaction)
+        .where(*conditions)
+        .values(category_id=category_id, categorized_by='manual' if category_id is not None else None)
+        .execution_options(synchronize_session=False)
+    )
+    return {'updated': result.rowcount, 'skipped': skipped}
 
 
 def criar_categorias_padrao():
@@ -123,5 +749,6 @@ def criar_categorias_padrao():
             )
             db.session.add(categoria)
 
+    invalidate_keyword_matcher()
     db.session.commit()
     print("Categorias básicas criadas com sucesso!")
\ No newline at end of file
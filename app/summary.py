@@ -0,0 +1,163 @@
+from collections import defaultdict
+from sqlalchemy import and_, case, func, literal, or_
+from app import db
+from app.models import Transaction, MonthlySummary, from_cents
+
+
+def amount_sign(amount):
+    """Sinal usado no agregado: 1 receita, -1 despesa, 0 valor zerado"""
+    return (amount > 0) - (amount < 0)
+
+
+def summary_key(user_id, year, month, category_id, amount_cents):
+    """Chave da linha do agregado mensal de uma transação"""
+    return (user_id or 0, year, month, category_id or 0, amount_sign(amount_cents))
+
+
+def deltas_from_rows(rows, factor=1, category_id=None):
+    """Soma as transações por chave do agregado
+
+    rows: sequência com user_id, year, month, category_id e amount_cents.
+    factor: 1 para transações incluídas, -1 para removidas.
+    category_id: se informado, substitui a categoria das linhas (recategorização).
+    """
+    deltas = defaultdict(lambda: [0, 0])
+    for row in rows:
+        row = row if isinstance(row, dict) else row._mapping
+        key = summary_key(
+            row['user_id'],
+            row['year'],
+            row['month'],
+            category_id if category_id is not None else row['category_id'],
+            row['amount_cents'],
+        )
+        deltas[key][0] += factor * row['amount_cents']
+        deltas[key][1] += factor
+    return deltas
+
+
+def deltas_from_query(*filters, factor=1, category_id=None):
+    """Agrega no banco as transações que atendem aos filtros, por chave do agregado"""
+    sign = case((Transaction.amount_cents > 0, 1), (Transaction.amount_cents < 0, -1), else_=0)
+    category = literal(category_id) if category_id is not None else func.coalesce(Transaction.category_id, 0)
+
+    rows = db.session.query(
+        func.coalesce(Transaction.user_id, 0),
+        Transaction.year,
+        Transaction.month,
+        category,
+        sign,
+        func.sum(Transaction.amount_cents),
+        func.count(Transaction.id)
+    ).filter(*filters).group_by(
+        func.coalesce(Transaction.user_id, 0), Transaction.year, Transaction.month, category, sign
+    )
+
+    return {
+        (user_id, year, month, category, sign): [factor * (total or 0), factor * count]
+        for user_id, year, month, category, sign, total, count in rows
+    }
+
+
+def merge_deltas(*all_deltas):
+    """Combina vários dicionários de deltas em um só"""
+    merged = defaultdict(lambda: [0, 0])
+    for deltas in all_deltas:
+        for key, (total, count) in deltas.items():
+            merged[key][0] += total
+            merged[key][1] += count
+    return merged
+
+
+def apply_deltas(deltas):
+    """Aplica os deltas ao agregado com um único upsert em massa"""
+    from app.services import dialect_insert
+
+    rows = [
+        {'user_id': user_id, 'year': year, 'month': month, 'category_id': category_id,
+         'sign': sign, 'total_cents': total, 'count': count}
+        for (user_id, year, month, category_id, sign), (total, count) in deltas.items()
+        if count
+    ]
+    if not rows:
+        return
+
+    table = MonthlySummary.__table__
+    statement = dialect_insert(table)
+    statement = statement.on_conflict_do_update(
+        index_elements=[table.c.year, table.c.month, table.c.sign, table.c.category_id, table.c.user_id],
+        set_={
+            'total_cents': table.c.total_cents + statement.excluded.total_cents,
+            'count': table.c.count + statement.excluded.count,
+        }
+    )
+    db.session.execute(statement, rows)
+
+    # Linhas que ficaram sem transações não precisam ser mantidas
+    db.session.execute(table.delete().where(table.c.count <= 0))
+
+
+def move_transactions(*filters, category_id):
+    """Atualiza o agregado antes de mover as transações filtradas para outra categoria"""
+    apply_deltas(merge_deltas(
+        deltas_from_query(*filters, factor=-1),
+        deltas_from_query(*filters, category_id=category_id or 0),
+    ))
+
+
+def rebuild_monthly_summary():
+    """Recalcula todo o agregado mensal a partir da tabela de transações"""
+    db.session.execute(MonthlySummary.__table__.delete())
+    apply_deltas(deltas_from_query())
+
+
+def previous_period(year, month=None):
+    """Período anterior: o mês anterior ou, sem mês, o ano anterior"""
+    if month:
+        return (year - 1, 12) if month == 1 else (year, month - 1)
+    return year - 1, None
+
+
+def _period_filter(year, month):
+    condition = MonthlySummary.year == year
+    if month:
+        condition = and_(condition, MonthlySummary.month == month)
+    return condition
+
+
+def period_totals(year, month=None):
+    """Receitas e despesas do período e do período anterior em uma única consulta
+
+    Uma só leitura do agregado cobre os dois períodos: as linhas são
+    rotuladas por período com CASE e as somas por sinal são condicionais.
+    As somas são inteiras (centavos) e voltam como Decimal; despesas vêm com
+    sinal negativo, como na tabela de transações.
+    """
+    prev_year, prev_month = previous_period(year, month)
+    current = _period_filter(year, month)
+    previous = _period_filter(prev_year, prev_month)
+
+    period = case((current, 'current'), else_='previous').label('period')
+    rows = db.session.query(
+        period,
+        func.sum(case((MonthlySummary.sign == 1, MonthlySummary.total_cents), else_=0)),
+        func.sum(case((MonthlySummary.sign == -1, MonthlySummary.total_cents), else_=0)),
+    ).filter(or_(current, previous)).group_by(period).all()
+
+    totals = {
+        'income': from_cents(0), 'expenses': from_cents(0),
+        'previous_income': from_cents(0), 'previous_expenses': from_cents(0),
+    }
+    for label, income, expenses in rows:
+        prefix = '' if label == 'current' else 'previous_'
+        totals[f'{prefix}income'] = from_cents(income)
+        totals[f'{prefix}expenses'] = from_cents(expenses)
+
+    return totals
+
+
+def percent_change(current, previous):
+    """Variação percentual entre dois valores (0 quando não há base de comparação)"""
+    if previous == 0:
+        return 0
+    return ((abs(current) - abs(previous)) / abs(previous)) * 100
@@ -0,0 +1,132 @@
+import random
+from collections import Counter
+from datetime import datetime, timedelta
+from html import escape
+from app import db
+from app.models import Category, CategoryKeyword, from_cents
+
+# Estabelecimentos por categoria padrão; os marcados com None ficam sem palavra-chave
+MERCHANTS = {
+    'Alimentação': ['PADARIA PAO QUENTE', 'SUPERMERCADO EXTRA', 'IFOOD *RESTAURANTE', 'ACOUGUE BOI GORDO'],
+    'Transporte': ['UBER *TRIP', 'POSTO SHELL', '99 *CORRIDA', 'ESTACIONAMENTO CENTRO'],
+    'Moradia': ['ALUGUEL', 'CONDOMINIO EDIFICIO', 'ENEL ENERGIA'],
+    'Saúde': ['FARMACIA DROGASIL', 'LABORATORIO FLEURY'],
+    'Lazer': ['NETFLIX.COM', 'SPOTIFY', 'CINEMARK'],
+    'Salário': ['SALARIO EMPRESA X'],
+    'Transferências': ['PIX RECEBIDO'],
+    None: ['COMPRA CARTAO LOJA', 'DEBITO AUTOMATICO', 'TED ENVIADA'],
+}
+
+INCOME_CATEGORIES = {'Salário', 'Transferências'}
+
+# Partes dos nomes de estabelecimentos das categorias geradas
+PREFIXES = ['COMPRA', 'PAG*', 'DEB', 'PIX', 'MP *', 'PG *', 'EC *']
+WORDS = ['MERCADO', 'LOJA', 'POSTO', 'FARMACIA', 'RESTAURANTE', 'PADARIA', 'ACADEMIA', 'LIVRARIA',
+         'PET SHOP', 'OFICINA', 'CLINICA', 'PAPELARIA', 'HORTIFRUTI', 'CONVENIENCIA', 'ELETRONICOS']
+
+
+def synthetic_catalog(extra_categories=0, merchants_per_category=3, seed=42):
+    """Catálogo categoria -> estabelecimentos: o padrão mais `extra_categories` geradas
+
+    Cada estabelecimento das categorias geradas termina com um código único,
+    então a palavra-chave de um não casa com a descrição de outro.
+    """
+    rng = random.Random(seed)
+    catalog = {name: list(merchants) for name, merchants in MERCHANTS.items()}
+    for index in range(extra_categories):
+        catalog[f'Categoria {index + 1:03d}'] = [
+            f'{rng.choice(PREFIXES)} {rng.choice(WORDS)} {index + 1:03d}{chr(ord("A") + k)}'
+            for k in range(merchants_per_category)
+        ]
+    return catalog
+
+
+def synthetic_rows(count, start_year=2022, years=3, seed=42, account_id='0001-SINTETICO',
+                   source_filename='sintetico.ofx', catalog=None, users=0):
+    """Gera linhas de transação realistas (mesmo formato das linhas importadas do OFX)
+
+    catalog: categoria -> estabelecimentos (padrão: MERCHANTS).
+    users: quantidade de usuários; com 0 as transações ficam sem usuário.
+    """
+    rng = random.Random(seed)
+    catalog = catalog or MERCHANTS
+    start = datetime(start_year, 1, 1)
+    span = (datetime(start_year + years, 1, 1) - start).days
+    names = list(catalog)
+
+    for index in range(count):
+        category = rng.choice(names)
+        description = rng.choice(catalog[category])
+        if rng.random() < 0.5:
+            description = f'{description} {rng.randint(1, 9999):04d}'
+
+        amount_cents = round(rng.lognormvariate(4, 1.2) * 100)
+        if category not in INCOME_CATEGORIES:
+            amount_cents = -amount_cents
+
+        date = start + timedelta(days=rng.randrange(span), seconds=rng.randrange(86400))
+        yield {
+            'external_id': f'SYN{seed}-{index:09d}',
+            'account_id': account_id,
+            'date': date,
+            'year': date.year,
+            'month': date.month,
+            'amount_cents': amount_cents,
+            'description': description,
+            'source_filename': source_filename,
+            'category_id': None,
+            'user_id': rng.randint(1, users) if users else None,
+        }
+
+
+def write_ofx(file, rows, account_id='0001-SINTETICO'):
+    """Grava as linhas em um extrato OFX 1.x (SGML), como os exportados pelos bancos"""
+    file.write(
+        'OFXHEADER:100\nDATA:OFXSGML\nVERSION:102\nSECURITY:NONE\nENCODING:USASCII\n'
+        'CHARSET:1252\nCOMPRESSION:NONE\nOLDFILEUID:NONE\nNEWFILEUID:NONE\n\n'
+        '<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><CURDEF>BRL\n'
+        f'<BANKACCTFROM><BANKID>0001<ACCTID>{account_id}<ACCTTYPE>CHECKING</BANKACCTFROM>\n'
+        '<BANKTRANLIST>\n'
+    )
+    for row in rows:
+        kind = 'CREDIT' if row['amount_cents'] >= 0 else 'DEBIT'
+        file.write(
+            f'<STMTTRN><TRNTYPE>{kind}<DTPOSTED>{row["date"]:%Y%m%d%H%M%S}[0:GMT]'
+            f'<TRNAMT>{from_cents(row["amount_cents"])}<FITID>{row["external_id"]}'
+            f'<MEMO>{escape(row["description"], quote=False)}</STMTTRN>\n'
+        )
+    file.write('</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\n')
+
+
+def seed_keywords(catalog=None):
+    """Cria as categorias do catálogo e uma palavra-chave por estabelecimento"""
+    from app.services import criar_categorias_padrao, invalidate_keyword_matcher
+
+    criar_categorias_padrao()
+    for name, merchants in (catalog or MERCHANTS).items():
+        if name is None:
+            continue
+
+        category = Category.query.filter_by(name=name).first()
+        if category is None:
+            category = Category(name=name, description=name, is_expense=name not in INCOME_CATEGORIES)
+            db.session.add(category)
+            db.session.flush()
+
+        for merchant in merchants:
+            db.session.add(CategoryKeyword(keyword=merchant.lower(), match_type='contains', category_id=category.id))
+
+    invalidate_keyword_matcher()
+    db.session.commit()
+
+
+def seed_database(count, extra_categories=0, **kwargs):
+    """Popula o banco com categorias, palavras-chave e `count` transações sintéticas"""
+    from app.services import chunked, import_rows
+
+    catalog = synthetic_catalog(extra_categories, seed=kwargs.get('seed', 42))
+    seed_keywords(catalog)
+    occurrences = Counter()
+    for rows in chunked(synthetic_rows(count, catalog=catalog, **kwargs), 1000):
+        import_rows(rows, occurrences=occurrences)
+        db.session.commit()
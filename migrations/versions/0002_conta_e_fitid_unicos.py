@@ -0,0 +1,28 @@
+"""conta da transação e FITID único por conta
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('account_id', sa.String(length=64), nullable=True))
+        batch_op.create_unique_constraint('uq_transactions_account_external_id', ['account_id', 'external_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_transactions_account_external_id', type_='unique')
+        batch_op.drop_column('account_id')
@@ -0,0 +1,46 @@
+"""agregado mensal de transações
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('monthly_summary',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('year', sa.Integer(), nullable=False),
+    sa.Column('month', sa.Integer(), nullable=False),
+    sa.Column('category_id', sa.Integer(), nullable=False),
+    sa.Column('sign', sa.Integer(), nullable=False),
+    sa.Column('total', sa.Float(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('year', 'month', 'sign', 'category_id', 'user_id', name='uq_monthly_summary_key')
+    )
+
+    # Preencher o agregado com as transações existentes
+    op.execute("""
+        INSERT INTO monthly_summary (user_id, year, month, category_id, sign, total, count)
+        SELECT COALESCE(user_id, 0), year, month, COALESCE(category_id, 0),
+               CASE WHEN amount > 0 THEN 1 WHEN amount < 0 THEN -1 ELSE 0 END,
+               SUM(amount), COUNT(id)
+        FROM transactions
+        GROUP BY COALESCE(user_id, 0), year, month, COALESCE(category_id, 0),
+                 CASE WHEN amount > 0 THEN 1 WHEN amount < 0 THEN -1 ELSE 0 END
+    """)
+
+
+def downgrade():
+    op.drop_table('monthly_summary')
@@ -0,0 +1,28 @@
+"""índice (date, id) para a paginação por chave
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 11:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.drop_index('ix_transactions_date')
+        batch_op.create_index('ix_transactions_date_id', ['date', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.drop_index('ix_transactions_date_id')
+        batch_op.create_index('ix_transactions_date', ['date'], unique=False)
@@ -0,0 +1,29 @@
+"""índices compostos para os filtros de período e categoria
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.create_index('ix_transactions_year_month_category_amount',
+                              ['year', 'month', 'category_id', 'amount'], unique=False)
+        batch_op.create_index('ix_transactions_category_date', ['category_id', 'date'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.drop_index('ix_transactions_category_date')
+        batch_op.drop_index('ix_transactions_year_month_category_amount')
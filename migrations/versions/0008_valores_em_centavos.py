@@ -0,0 +1,72 @@
+"""valores em centavos inteiros
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.drop_index('ix_transactions_year_month_category_amount')
+        batch_op.add_column(sa.Column('amount_cents', sa.BigInteger(), nullable=True))
+
+    op.execute('UPDATE transactions SET amount_cents = CAST(ROUND(amount * 100) AS INTEGER)')
+
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.alter_column('amount_cents', existing_type=sa.BigInteger(), nullable=False)
+        batch_op.drop_column('amount')
+        batch_op.create_index('ix_transactions_year_month_category_amount',
+                              ['year', 'month', 'category_id', 'amount_cents'], unique=False)
+
+    # O agregado é recalculado a partir dos centavos para não herdar o erro de arredondamento
+    with op.batch_alter_table('monthly_summary', schema=None) as batch_op:
+        batch_op.drop_column('total')
+        batch_op.add_column(sa.Column('total_cents', sa.BigInteger(), nullable=False, server_default='0'))
+
+    op.execute('DELETE FROM monthly_summary')
+    op.execute("""
+        INSERT INTO monthly_summary (user_id, year, month, category_id, sign, total_cents, count)
+        SELECT COALESCE(user_id, 0), year, month, COALESCE(category_id, 0),
+               CASE WHEN amount_cents > 0 THEN 1 WHEN amount_cents < 0 THEN -1 ELSE 0 END,
+               SUM(amount_cents), COUNT(id)
+        FROM transactions
+        GROUP BY COALESCE(user_id, 0), year, month, COALESCE(category_id, 0),
+                 CASE WHEN amount_cents > 0 THEN 1 WHEN amount_cents < 0 THEN -1 ELSE 0 END
+    """)
+
+    with op.batch_alter_table('monthly_summary', schema=None) as batch_op:
+        batch_op.alter_column('total_cents', existing_type=sa.BigInteger(), server_default=None)
+
+
+def downgrade():
+    with op.batch_alter_table('monthly_summary', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('total', sa.Float(), nullable=True))
+
+    op.execute('UPDATE monthly_summary SET total = total_cents / 100.0')
+
+    with op.batch_alter_table('monthly_summary', schema=None) as batch_op:
+        batch_op.alter_column('total', existing_type=sa.Float(), nullable=False)
+        batch_op.drop_column('total_cents')
+
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.drop_index('ix_transactions_year_month_category_amount')
+        batch_op.add_column(sa.Column('amount', sa.Float(), nullable=True))
+
+    op.execute('UPDATE transactions SET amount = amount_cents / 100.0')
+
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.alter_column('amount', existing_type=sa.Float(), nullable=False)
+        batch_op.drop_column('amount_cents')
+        batch_op.create_index('ix_transactions_year_month_category_amount',
+                              ['year', 'month', 'category_id', 'amount'], unique=False)
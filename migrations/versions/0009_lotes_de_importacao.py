@@ -0,0 +1,61 @@
+"""lotes de importação com tempos por etapa
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('import_batches',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('job_id', sa.Integer(), nullable=True),
+    sa.Column('filename', sa.String(length=255), nullable=False),
+    sa.Column('file_hash', sa.String(length=64), nullable=True),
+    sa.Column('file_size', sa.Integer(), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('rows_read', sa.Integer(), nullable=False),
+    sa.Column('imported', sa.Integer(), nullable=False),
+    sa.Column('skipped', sa.Integer(), nullable=False),
+    sa.Column('categorized', sa.Integer(), nullable=False),
+    sa.Column('wall_time', sa.Float(), nullable=True),
+    sa.Column('cpu_time', sa.Float(), nullable=True),
+    sa.Column('timings', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.Column('rolled_back_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['job_id'], ['import_jobs.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('import_batches', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_import_batches_file_hash'), ['file_hash'], unique=False)
+        batch_op.create_index(batch_op.f('ix_import_batches_job_id'), ['job_id'], unique=False)
+
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('batch_id', sa.Integer(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_transactions_batch_id'), ['batch_id'], unique=False)
+        batch_op.create_foreign_key('fk_transactions_batch_id_import_batches', 'import_batches', ['batch_id'], ['id'])
+
+
+def downgrade():
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_transactions_batch_id_import_batches', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_transactions_batch_id'))
+        batch_op.drop_column('batch_id')
+
+    with op.batch_alter_table('import_batches', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_import_batches_job_id'))
+        batch_op.drop_index(batch_op.f('ix_import_batches_file_hash'))
+
+    op.drop_table('import_batches')
@@ -0,0 +1,81 @@
+"""fingerprint de conteúdo das transações
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+import hashlib
+import re
+import unicodedata
+from collections import Counter
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0011'
+down_revision = '0010'
+branch_labels = None
+depends_on = None
+
+
+# Cópia de app/dedup.py nesta revisão: a migração não pode mudar se o hash da aplicação mudar
+def normalize_description(description):
+    text = unicodedata.normalize('NFKD', description or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(re.sub(r'[^0-9A-Z]+', ' ', text.upper()).split())
+
+
+def transaction_fingerprint(account_id, date, amount_cents, description):
+    content = f'{account_id or ""}|{date:%Y-%m-%d}|{amount_cents}|{normalize_description(description)}'
+    return hashlib.blake2b(content.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def upgrade():
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('fingerprint', sa.String(length=32), nullable=True))
+        batch_op.add_column(sa.Column('occurrence', sa.Integer(), nullable=False, server_default='1'))
+
+    # Transações existentes sem FITID: ocorrências numeradas por id, então duplicatas
+    # antigas não violam a chave única e ficam para o flask merge-duplicates
+    transactions = sa.table(
+        'transactions',
+        sa.column('id', sa.Integer()),
+        sa.column('external_id', sa.String()),
+        sa.column('account_id', sa.String()),
+        sa.column('date', sa.DateTime()),
+        sa.column('amount_cents', sa.BigInteger()),
+        sa.column('description', sa.String()),
+        sa.column('fingerprint', sa.String()),
+        sa.column('occurrence', sa.Integer()),
+    )
+    connection = op.get_bind()
+    occurrences = Counter()
+    updates = []
+    for row in connection.execute(sa.select(
+        transactions.c.id, transactions.c.account_id, transactions.c.date,
+        transactions.c.amount_cents, transactions.c.description
+    ).where(transactions.c.external_id.is_(None)).order_by(transactions.c.id)):
+        fingerprint = transaction_fingerprint(row.account_id, row.date, row.amount_cents, row.description)
+        occurrences[fingerprint] += 1
+        updates.append({'row_id': row.id, 'fingerprint': fingerprint, 'occurrence': occurrences[fingerprint]})
+
+    if updates:
+        connection.execute(
+            transactions.update().where(transactions.c.id == sa.bindparam('row_id')).values(
+                fingerprint=sa.bindparam('fingerprint'), occurrence=sa.bindparam('occurrence')
+            ),
+            updates
+        )
+
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.alter_column('occurrence', existing_type=sa.Integer(), server_default=None)
+        batch_op.create_unique_constraint('uq_transactions_fingerprint_occurrence', ['fingerprint', 'occurrence'])
+
+
+def downgrade():
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_transactions_fingerprint_occurrence', type_='unique')
+        batch_op.drop_column('occurrence')
+        batch_op.drop_column('fingerprint')
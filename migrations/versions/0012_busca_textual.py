@@ -0,0 +1,39 @@
+"""busca textual (FTS5) nas descrições das transações
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0012'
+down_revision = '0011'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    from app.search import FTS_DDL
+
+    connection = op.get_bind()
+    if connection.dialect.name != 'sqlite':
+        return  # Outros bancos usam ILIKE (app/search.py)
+
+    for statement in FTS_DDL:
+        connection.exec_driver_sql(statement)
+    # Indexar as transações existentes
+    op.execute("INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute('DROP TRIGGER IF EXISTS transactions_fts_update')
+    op.execute('DROP TRIGGER IF EXISTS transactions_fts_delete')
+    op.execute('DROP TRIGGER IF EXISTS transactions_fts_insert')
+    op.execute('DROP TABLE IF EXISTS transactions_fts')
@@ -0,0 +1,39 @@
+"""índice de trigramas para a recategorização por palavra-chave
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0013'
+down_revision = '0012'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    from app.search import TRIGRAM_DDL
+
+    connection = op.get_bind()
+    if connection.dialect.name != 'sqlite':
+        return  # Outros bancos usam ILIKE (app/search.py)
+
+    for statement in TRIGRAM_DDL:
+        connection.exec_driver_sql(statement)
+    # Indexar as transações existentes
+    op.execute("INSERT INTO transactions_trigram (transactions_trigram) VALUES ('rebuild')")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute('DROP TRIGGER IF EXISTS transactions_trigram_update')
+    op.execute('DROP TRIGGER IF EXISTS transactions_trigram_delete')
+    op.execute('DROP TRIGGER IF EXISTS transactions_trigram_insert')
+    op.execute('DROP TABLE IF EXISTS transactions_trigram')
@@ -0,0 +1,28 @@
+"""origem da categoria das transações
+
+Revision ID: 0016
+Revises: 0015
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0016'
+down_revision = '0015'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Transações já categorizadas ficam com origem desconhecida (None): excluir uma
+    # palavra-chave não as reavalia, já que podem ter sido escolhas manuais
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('categorized_by', sa.String(length=16), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.drop_column('categorized_by')
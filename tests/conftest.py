@@ -0,0 +1,99 @@
+import os
+from datetime import datetime
+import pytest
+from app import create_app, db, services
+from app.models import Category, CategoryKeyword, MonthlySummary, Transaction
+
+
+@pytest.fixture
+def app(tmp_path):
+    """Aplicação com banco SQLite temporário e importações síncronas"""
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + str(tmp_path / 'test.db'),
+        'UPLOAD_FOLDER': str(tmp_path / 'uploads'),
+        'CHART_CACHE_FOLDER': str(tmp_path / 'charts'),
+        'CATEGORIZER_FOLDER': str(tmp_path / 'models'),
+        'IMPORT_ASYNC': False,
+        'METRICS_ENABLED': False,
+        'WTF_CSRF_ENABLED': False,
+    })
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+
+    # O matcher fica em cache no processo; o próximo teste usa outro banco
+    services._keyword_matcher = None
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def transaction_row(**overrides):
+    """Linha de transação (como as de import_rows), com ano e mês tirados da data"""
+    row = {
+        'external_id': None,
+        'account_id': '123',
+        'date': datetime(2026, 3, 10),
+        'amount_cents': -1250,
+        'description': 'CAFE DA ESQUINA',
+        'source_filename': 'extrato.ofx',
+        'category_id': None,
+    }
+    row.update(overrides)
+    row.setdefault('year', row['date'].year)
+    row.setdefault('month', row['date'].month)
+    return row
+
+
+@pytest.fixture
+def make_transaction(app):
+    """Grava uma transação pelo ORM (transaction_row com os valores dados) e a retorna"""
+    def make(**overrides):
+        transaction = Transaction(**transaction_row(**overrides))
+        db.session.add(transaction)
+        db.session.commit()
+        return transaction
+    return make
+
+
+def keyword_rule(name, keyword, is_expense=True):
+    """Cria uma categoria com uma palavra-chave 'contains' e retorna a categoria"""
+    from app.services import invalidate_keyword_matcher
+
+    category = Category(name=name, is_expense=is_expense)
+    db.session.add(category)
+    db.session.flush()
+    db.session.add(CategoryKeyword(keyword=keyword, match_type='contains', category_id=category.id))
+    invalidate_keyword_matcher()
+    db.session.commit()
+    return category
+
+
+def summary_rows():
+    """Linhas do agregado mensal, em ordem estável para comparação"""
+    return db.session.query(
+        MonthlySummary.user_id, MonthlySummary.year, MonthlySummary.month, MonthlySummary.category_id,
+        MonthlySummary.sign, MonthlySummary.total_cents, MonthlySummary.count
+    ).order_by(MonthlySummary.year, MonthlySummary.month, MonthlySummary.category_id, MonthlySummary.sign).all()
+
+
+@pytest.fixture
+def make_ofx(tmp_path):
+    """Grava as linhas (de synthetic_rows, por exemplo) em um extrato OFX em tmp_path e retorna o caminho"""
+    from app.synthetic import write_ofx
+
+    def make(name, rows):
+        path = tmp_path / name
+        with open(path, 'w', encoding='cp1252') as file:
+            write_ofx(file, rows)
+        return str(path)
+    return make
+
+
+def fixture_path(name):
+    return os.path.join(os.path.dirname(__file__), 'fixtures', name)
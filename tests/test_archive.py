@@ -0,0 +1,41 @@
+from datetime import datetime
+import pytest
+from app import db
+from app.archive import archive_dataset, iter_archive_transactions, sync_archive
+from app.models import Category, Transaction
+from app.summary import rebuild_monthly_summary
+
+
+@pytest.fixture
+def archive(app, tmp_path, make_transaction):
+    """Arquivo sincronizado com transações em três meses de dois anos"""
+    app.config.update(ARCHIVE_ENABLED=True, ARCHIVE_FOLDER=str(tmp_path / 'archive'))
+    category = Category(name='Mercado', is_expense=True)
+    db.session.add(category)
+    db.session.flush()
+    for date in (datetime(2025, 12, 5), datetime(2026, 1, 3), datetime(2026, 1, 3), datetime(2026, 2, 1)):
+        make_transaction(date=date)
+        make_transaction(date=date, category_id=category.id)
+    rebuild_monthly_summary()
+    db.session.commit()
+
+    assert sync_archive(app) == [(2025, 12), (2026, 1), (2026, 2)]
+    return category
+
+
+def ids(rows):
+    return [row['id'] for row in rows]
+
+
+def test_archive_transactions_are_read_newest_first(app, archive):
+    dataset = archive_dataset(app)
+    ordered = Transaction.query.order_by(Transaction.date.desc(), Transaction.id.desc())
+
+    assert ids(iter_archive_transactions(dataset)) == [transaction.id for transaction in ordered]
+    assert ids(iter_archive_transactions(dataset, year=2026, month=1)) == [
+        transaction.id for transaction in ordered.filter(Transaction.month == 1)
+    ]
+    assert ids(iter_archive_transactions(dataset, year=2026, category_id=archive.id)) == [
+        transaction.id for transaction in ordered.filter(Transaction.year == 2026, Transaction.category_id == archive.id)
+    ]
+    assert list(iter_archive_transactions(dataset, year=2024)) == []
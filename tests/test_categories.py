@@ -0,0 +1,90 @@
+import time
+from sqlalchemy import event
+from app import db, services
+from app.models import Category, CategoryKeyword, KeywordRulesVersion, Transaction
+from app.services import assign_categories, import_rows
+from tests.conftest import keyword_rule, transaction_row
+
+
+def test_deleting_a_keyword_keeps_manual_choices(app, client):
+    category = keyword_rule('Padaria', 'padaria')
+    keyword, = category.keywords
+
+    import_rows([transaction_row(description='PADARIA CENTRAL', external_id='A1'),
+                 transaction_row(description='PADARIA DO ZE', external_id='A2')])
+    db.session.commit()
+    by_rule, confirmed = Transaction.query.order_by(Transaction.id).all()
+    assert (by_rule.categorized_by, confirmed.categorized_by) == ('keyword', 'keyword')
+
+    assign_categories({confirmed.id: category.id})
+    db.session.commit()
+
+    response = client.post(f'/categories/keywords/{keyword.id}/delete')
+    assert response.status_code == 302
+
+    db.session.expire_all()
+    assert (by_rule.category_id, by_rule.categorized_by) == (None, None)
+    assert (confirmed.category_id, confirmed.categorized_by) == (category.id, 'manual')
+    # A reavaliação usou um matcher próprio: o cache do processo não guardou regras sem commit
+    assert services._keyword_matcher is None
+
+
+def test_categorize_transaction_does_not_query_the_database(app):
+    category = keyword_rule('Padaria', 'padaria')
+    services.get_keyword_matcher()
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    transactions = [Transaction(description=f'PADARIA {index}', amount_cents=-100) for index in range(100)]
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        categorized = [services.categorize_transaction(transaction) for transaction in transactions]
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+    assert all(categorized) and transactions[0].category_id == category.id
+    assert statements == []
+
+
+def test_rules_changed_by_another_process_are_picked_up(app, monkeypatch):
+    keyword_rule('Padaria', 'padaria')
+    assert services.get_keyword_matcher().match('POSTO SHELL', True) is None
+
+    # Outro processo grava uma regra e incrementa a versão, sem passar pelo cache deste
+    category = Category(name='Combustível', is_expense=True)
+    db.session.add(category)
+    db.session.flush()
+    db.session.add(CategoryKeyword(keyword='shell', match_type='contains', category_id=category.id))
+    db.session.query(KeywordRulesVersion).update({KeywordRulesVersion.version: KeywordRulesVersion.version + 1})
+    db.session.commit()
+
+    now = time.monotonic()
+    monkeypatch.setattr(services.time, 'monotonic', lambda: now + services.KEYWORD_RULES_CHECK_SECONDS)
+    assert services.get_keyword_matcher().match('POSTO SHELL', True) == category.id
+
+
+def test_keywords_need_three_characters(app, client):
+    category = keyword_rule('Transporte', 'uber')
+
+    response = client.post(f'/categories/{category.id}/keywords', data={'keyword': '99', 'match_type': 'contains'})
+
+    assert response.status_code == 200
+    assert [keyword.keyword for keyword in CategoryKeyword.query] == ['uber']
+
+
+def test_deleting_a_short_legacy_keyword_reevaluates_the_category(app, client):
+    category = keyword_rule('Transporte', '99')
+    import_rows([transaction_row(description='99 *CORRIDA', external_id='A1'),
+                 transaction_row(description='PÃO 99', external_id='A2'),
+                 transaction_row(description='POSTO SHELL', external_id='A3')])
+    db.session.commit()
+    assert Transaction.query.filter_by(category_id=category.id).count() == 2
+
+    keyword, = category.keywords
+    assert client.post(f'/categories/keywords/{keyword.id}/delete').status_code == 302
+
+    db.session.expire_all()
+    assert Transaction.query.filter(Transaction.category_id.isnot(None)).count() == 0
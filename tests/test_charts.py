@@ -0,0 +1,23 @@
+import os
+from datetime import datetime
+from app import charts, db
+from app.services import import_rows
+from app.synthetic import seed_database
+from tests.conftest import transaction_row
+
+
+def test_chart_is_redrawn_only_when_the_data_changes(app, tmp_path):
+    seed_database(200, years=1)
+    db.session.commit()
+    folder = str(tmp_path / 'charts')
+
+    path, version = charts.get_chart(folder, 'monthly', 2022, image_format='svg')
+    assert charts.get_chart(folder, 'monthly', 2022, image_format='svg') == (path, version)
+
+    import_rows([transaction_row(external_id='N1', date=datetime(2022, 6, 1))])
+    db.session.commit()
+    new_path, new_version = charts.get_chart(folder, 'monthly', 2022, image_format='svg')
+
+    assert new_version != version
+    # A versão anterior da mesma chave foi removida
+    assert os.listdir(folder) == [os.path.basename(new_path)]
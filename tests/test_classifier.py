@@ -0,0 +1,39 @@
+from app import db
+from app.classifier import Categorizer, get_categorizer, model_path, train_categorizer
+from app.models import Category, Transaction
+from app.services import assign_categories
+
+
+def test_labels_set_after_import_are_trained(app, make_transaction):
+    category = Category(name='Padaria', is_expense=True)
+    db.session.add(category)
+    make_transaction(description='PADARIA CENTRAL')
+    make_transaction(description='PADARIA DO ZE')
+    assert train_categorizer(app) == 0
+
+    ids = [id for id, in db.session.query(Transaction.id)]
+    assign_categories({id: category.id for id in ids})
+    db.session.commit()
+
+    assert train_categorizer(app) == 2
+    assert train_categorizer(app) == 0
+
+
+def test_labels_applied_by_the_classifier_are_not_trained(app, make_transaction):
+    category = Category(name='Padaria', is_expense=True)
+    db.session.add(category)
+    db.session.flush()
+    make_transaction(description='PADARIA CENTRAL', category_id=category.id, categorized_by='classifier')
+    make_transaction(description='PADARIA DO ZE', category_id=category.id, categorized_by='keyword')
+
+    assert train_categorizer(app) == 1
+
+
+def test_model_saved_by_another_process_is_reloaded(app):
+    train_categorizer(app)
+    first = get_categorizer(app)
+    assert get_categorizer(app) is first
+
+    Categorizer().save(model_path(app))
+    assert get_categorizer(app) is not first
+
@@ -0,0 +1,37 @@
+from collections import Counter
+from app import db
+from app.models import Transaction
+from app.services import import_rows
+from tests.conftest import transaction_row
+
+
+def statement(source_filename, *fitids):
+    """Extrato com uma compra idêntica por FITID"""
+    return [transaction_row(external_id=fitid, source_filename=source_filename) for fitid in fitids]
+
+
+def test_identical_purchases_with_distinct_fitids_are_kept(app):
+    import_rows(statement('marco.ofx', 'A1'))
+    result = import_rows(statement('marco-2.ofx', 'B7'))
+
+    assert result['imported'] == 1
+    assert Transaction.query.count() == 2
+
+
+def test_empty_fitid_is_deduplicated_by_content(app):
+    import_rows(statement('marco.ofx', None, None), occurrences=Counter())
+    result = import_rows(statement('marco-2.ofx', None, None, None), occurrences=Counter())
+
+    # Duas já existiam; a terceira repetição do extrato é nova
+    assert result['imported'] == 1
+    assert Transaction.query.count() == 3
+
+
+def test_unstable_fitid_accounts_are_deduplicated_by_content(app):
+    app.config['DEDUP_CONTENT_ACCOUNTS'] = frozenset({'123'})
+    import_rows(statement('marco.ofx', 'A1'))
+    result = import_rows(statement('marco-2.ofx', 'B7'))
+    db.session.commit()
+
+    assert result['imported'] == 0
+    assert Transaction.query.count() == 1
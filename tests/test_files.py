@@ -0,0 +1,73 @@
+import os
+import threading
+import numpy as np
+import pytest
+from app.files import atomic_write
+
+
+def write_image(file):
+    file.write(b'<svg/>')
+
+
+def read_image(path):
+    with open(path, 'rb') as file:
+        return file.read() == b'<svg/>'
+
+
+def write_model(file):
+    np.savez_compressed(file, counts=np.arange(4))
+
+
+def read_model(path):
+    with np.load(path) as arrays:
+        return arrays['counts'].tolist() == [0, 1, 2, 3]
+
+
+@pytest.mark.parametrize('writer, reader', [(write_image, read_image), (write_model, read_model)],
+                         ids=['chart', 'categorizer'])
+def test_concurrent_writes_of_the_same_path(tmp_path, monkeypatch, writer, reader):
+    """Threads que gravam o mesmo arquivo ao mesmo tempo não disputam o temporário"""
+    path = str(tmp_path / 'files' / 'saved')
+
+    # Todas as threads gravam o arquivo temporário antes que alguma o troque pelo definitivo
+    barrier = threading.Barrier(4)
+    replace = os.replace
+
+    def synchronized_replace(source, destination):
+        barrier.wait(timeout=10)
+        replace(source, destination)
+
+    monkeypatch.setattr(os, 'replace', synchronized_replace)
+
+    errors = []
+
+    def worker():
+        try:
+            atomic_write(path, writer)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert os.listdir(tmp_path / 'files') == ['saved']
+    assert reader(path)
+
+
+def test_failed_write_keeps_the_previous_file(tmp_path):
+    path = str(tmp_path / 'saved')
+    atomic_write(path, write_image)
+
+    def failing_writer(file):
+        file.write(b'<sv')
+        raise ValueError('disco cheio')
+
+    with pytest.raises(ValueError):
+        atomic_write(path, failing_writer)
+
+    assert os.listdir(tmp_path) == ['saved']
+    assert read_image(path)
@@ -0,0 +1,38 @@
+from app import db, services
+from app.models import Transaction
+from app.services import import_ofx
+from app.synthetic import synthetic_rows
+
+
+def test_reimporting_a_statement_skips_every_row(app, make_ofx):
+    path = make_ofx('extrato.ofx', synthetic_rows(300, years=1))
+
+    first = import_ofx(path, chunk_size=100)
+    db.session.commit()
+    second = import_ofx(path, chunk_size=100)
+    db.session.commit()
+
+    assert (first['imported'], first['skipped']) == (300, 0)
+    assert (second['imported'], second['skipped']) == (0, 300)
+    assert Transaction.query.count() == 300
+
+
+def test_rows_inserted_concurrently_are_skipped_by_the_database(app, make_ofx, monkeypatch):
+    path = make_ofx('extrato.ofx', synthetic_rows(300, years=1))
+    import_ofx(path)
+    db.session.commit()
+
+    # Outra importação inseriu as mesmas linhas entre a consulta de FITIDs e o INSERT
+    monkeypatch.setattr(services, 'existing_transaction_keys', lambda keys: set())
+    result = import_ofx(path, chunk_size=100)
+    db.session.commit()
+
+    assert (result['imported'], result['skipped']) == (0, 300)
+    assert Transaction.query.count() == 300
+
+
+def test_repeated_fitid_in_the_same_statement_is_imported_once(app, make_ofx):
+    rows = list(synthetic_rows(5, years=1))
+    result = import_ofx(make_ofx('repetido.ofx', rows + rows[:2]))
+
+    assert (result['imported'], result['skipped']) == (5, 2)
@@ -0,0 +1,123 @@
+import io
+import os
+import sqlite3
+import zipfile
+from contextlib import closing
+from app import db, jobs, services
+from app.models import ImportJob, Transaction
+from app.synthetic import synthetic_rows, write_ofx
+
+INVALID_OFX = (b'OFXHEADER:100\n<OFX><BANKTRANLIST><STMTTRN><TRNTYPE>DEBIT<DTPOSTED>ontem'
+               b'<TRNAMT>-10.00<FITID>1</STMTTRN></BANKTRANLIST></OFX>')
+
+
+def upload(client, name, content):
+    response = client.post('/transactions/upload', data={'file': (io.BytesIO(content), name)},
+                           content_type='multipart/form-data')
+    # O job grava com a sessão do próprio contexto; as requisições do teste reaproveitam a do
+    # contexto do fixture, que ainda guarda o job lido pela rota de upload
+    db.session.expire_all()
+    return response
+
+
+def statement(count, **kwargs):
+    file = io.StringIO()
+    write_ofx(file, synthetic_rows(count, years=1, **kwargs))
+    return file.getvalue().encode('cp1252')
+
+
+def track_statuses(monkeypatch):
+    """Situação gravada do job ao entrar em _run_job e ao chamar o importador"""
+    statuses = []
+    run_job = jobs._run_job
+
+    def tracked_run_job(app, job_id, target, *args):
+        with app.app_context():  # Como o próprio _run_job, com outra sessão
+            statuses.append(db.session.get(ImportJob, job_id).status)
+
+        def tracked_target(app, job, *args):
+            statuses.append(job.status)
+            return target(app, job, *args)
+
+        return run_job(app, job_id, tracked_target, *args)
+
+    monkeypatch.setattr(jobs, '_run_job', tracked_run_job)
+    return statuses
+
+
+def test_import_job_lifecycle(client, monkeypatch):
+    statuses = track_statuses(monkeypatch)
+
+    response = upload(client, 'extrato.ofx', statement(120))
+    assert response.status_code == 302
+    job = ImportJob.query.one()
+
+    status = client.get(f'/transactions/import/{job.id}').get_json()
+    assert statuses == ['pending', 'running']
+    assert (status['status'], status['error']) == ('done', None)
+    assert (status['imported'], status['skipped']) == (120, 0)
+    assert status['started_at'] and status['finished_at']
+    assert Transaction.query.count() == 120
+
+
+def test_parse_failure_marks_the_job_failed(client, monkeypatch):
+    statuses = track_statuses(monkeypatch)
+
+    assert upload(client, 'quebrado.ofx', INVALID_OFX).status_code == 302
+    job = ImportJob.query.one()
+
+    status = client.get(f'/transactions/import/{job.id}').get_json()
+    assert statuses == ['pending', 'running']
+    assert status['status'] == 'failed'
+    assert 'FITID 1' in status['error']
+    assert Transaction.query.count() == 0
+
+
+def test_unknown_job(client):
+    assert client.get('/transactions/import/999').status_code == 404
+
+
+def zip_of(**members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name, content in members.items():
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+
+def test_zip_uploads_with_the_same_member_names(app, client, monkeypatch):
+    monkeypatch.setattr(jobs, 'get_parse_pool', lambda app: None)  # Leitura no próprio processo
+    first = zip_of(**{'extrato.ofx': statement(30, seed=1)})
+    second = zip_of(**{'extrato.ofx': statement(40, seed=2)})
+
+    upload(client, 'janeiro.zip', first)
+    upload(client, 'janeiro.zip', second)
+
+    assert [job.imported for job in ImportJob.query.order_by(ImportJob.id)] == [30, 40]
+    # O ZIP e os OFX extraídos não ficam na pasta de uploads
+    assert os.listdir(app.config['UPLOAD_FOLDER']) == []
+
+
+def test_batch_import_commits_each_chunk(app, client, monkeypatch):
+    monkeypatch.setattr(jobs, 'get_parse_pool', lambda app: None)
+    app.config['IMPORT_CHUNK_SIZE'] = 50
+
+    # Transações já confirmadas (vistas por outra conexão) antes de cada lote
+    committed = []
+    import_rows = services.import_rows
+    path = app.config['SQLALCHEMY_DATABASE_URI'][len('sqlite:///'):]
+
+    def tracked_import_rows(rows, *args):
+        with closing(sqlite3.connect(path)) as connection:
+            committed.append(connection.execute('SELECT count(*) FROM transactions').fetchone()[0])
+        return import_rows(rows, *args)
+
+    monkeypatch.setattr(services, 'import_rows', tracked_import_rows)
+
+    upload(client, 'bancos.zip', zip_of(**{'banco1.ofx': statement(120, seed=1),
+                                           'banco2.ofx': statement(80, seed=2, account_id='0002')}))
+
+    assert committed == [0, 50, 100, 120, 170]
+    job = client.get(f'/transactions/import/{ImportJob.query.one().id}').get_json()
+    assert job['status'] == 'done'
+    assert [(file['filename'], file['imported']) for file in job['files']] == [('banco1.ofx', 120), ('banco2.ofx', 80)]
@@ -0,0 +1,33 @@
+from decimal import Decimal
+import pytest
+from app.models import Transaction, from_cents, to_cents
+
+
+@pytest.mark.parametrize('value, cents', [
+    ('0.005', 1),
+    ('0.004', 0),
+    ('-0.005', -1),
+    ('-1.005', -101),
+    ('-2.675', -268),
+    (Decimal('10.125'), 1013),
+    (7, 700),
+])
+def test_to_cents_rounds_halves_away_from_zero(value, cents):
+    assert to_cents(value) == cents
+
+
+@pytest.mark.parametrize('value, cents', [
+    (0.1, 10),
+    (1.005, 101),  # 1.005 * 100 em float é 100.49999999999999
+    (2.675, 268),
+    (0.1 + 0.2, 30),
+    (-19.99, -1999),
+])
+def test_to_cents_uses_the_float_repr(value, cents):
+    assert to_cents(value) == cents
+
+
+def test_amount_round_trips_through_cents():
+    transaction = Transaction(amount=-0.1)
+    assert transaction.amount_cents == -10
+    assert transaction.amount == from_cents(-10) == Decimal('-0.10')
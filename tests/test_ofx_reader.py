@@ -0,0 +1,28 @@
+from app.models import Transaction
+from app.ofx_reader import _detect_encoding, iter_ofx_transactions
+from app.services import import_ofx
+from tests.conftest import fixture_path
+
+
+def test_detect_encoding_sgml_headers():
+    assert _detect_encoding(b'ENCODING:UTF-8\r\nCHARSET:NONE\r\n') == 'utf-8'
+    assert _detect_encoding(b'ENCODING:USASCII\r\nCHARSET:1252\r\n') == 'cp1252'
+    assert _detect_encoding(b'ENCODING:USASCII\r\nCHARSET:ISO-8859-1\r\n') == 'iso8859-1'
+    assert _detect_encoding(b'ENCODING:USASCII\r\nCHARSET:NONE\r\n') == 'cp1252'
+    assert _detect_encoding(b'<?xml version="1.0" encoding="UTF-8"?>') == 'utf-8'
+
+
+def test_utf8_sgml_statement_is_decoded_as_utf8():
+    with open(fixture_path('extrato_utf8_sgml.ofx'), 'rb') as file:
+        memos = [transaction['memo'] for transaction in iter_ofx_transactions(file)]
+
+    assert memos == ['Padaria São João', 'Açougue Irmãos Ávila', 'Salário Janeiro']
+
+
+def test_utf8_sgml_import_is_searchable(app, client):
+    import_ofx(fixture_path('extrato_utf8_sgml.ofx'), source_filename='extrato_utf8_sgml.ofx')
+
+    assert Transaction.query.filter_by(external_id='UTF8-0001').one().description == 'Padaria São João'
+    response = client.get('/transactions/export?format=ndjson&q=sao')
+    assert response.status_code == 200
+    assert 'Padaria São João' in response.get_data(as_text=True)
@@ -0,0 +1,38 @@
+import pytest
+from sqlalchemy import event
+from app import db
+from app.models import Transaction
+from app.synthetic import seed_database
+
+# Comandos SQL por requisição: não dependem da quantidade de transações nem de categorias
+BUDGETS = {
+    '/': 3,  # últimas transações, totais do mês atual e anterior, gastos por categoria
+    '/reports/data/kpi_summary?year={year}': 2,  # totais dos dois períodos, maiores categorias
+    '/reports/data/kpi_summary?year={year}&month={month}': 2,
+}
+
+
+def count_statements(app, url):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    client = app.test_client()
+    event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
+    assert response.status_code == 200
+    return len(statements)
+
+
+@pytest.mark.parametrize('rows', [200, 2000])
+@pytest.mark.parametrize('url', BUDGETS)
+def test_statements_per_request(app, url, rows):
+    seed_database(rows, extra_categories=20, years=2)
+    year, month = db.session.query(Transaction.year, Transaction.month).order_by(Transaction.id).first()
+
+    assert count_statements(app, url.format(year=year, month=month)) <= BUDGETS[url]
@@ -0,0 +1,17 @@
+from datetime import datetime, timedelta
+from app import db
+from app.services import import_ofx
+
+
+def test_many_ten_cent_amounts_add_up_exactly(client, make_ofx):
+    # Em float, somar 0.10 mil vezes dá 99.9999999999986 e três vezes 0.30000000000000004
+    start = datetime(2026, 3, 1)
+    rows = [{'external_id': f'C{index}', 'date': start + timedelta(minutes=index),
+             'amount_cents': -10 if index >= 3 else 10, 'description': 'TARIFA PIX'}
+            for index in range(1003)]
+    import_ofx(make_ofx('centavos.ofx', rows))
+    db.session.commit()
+
+    summary = client.get('/reports/data/kpi_summary?year=2026&month=3').get_json()
+
+    assert (summary['expenses'], summary['income'], summary['balance']) == (100.0, 0.3, -99.7)
@@ -0,0 +1,37 @@
+from app import db
+from app.models import Transaction
+from app.search import missing_search_triggers, repair_search_index, search_condition, substring_condition
+
+
+def test_repair_recreates_lost_triggers_and_reindexes(app, make_transaction):
+    make_transaction(description='PADARIA CENTRAL')
+    # Como depois de uma migração em batch que recria a tabela transactions
+    db.session.execute(db.text('DROP TRIGGER transactions_fts_insert'))
+    db.session.commit()
+    make_transaction(description='POSTO SHELL')
+
+    connection = db.session.connection()
+    assert missing_search_triggers(connection) == {'transactions_fts': ['transactions_fts_insert']}
+
+    assert repair_search_index(connection) == {'transactions_fts': ['transactions_fts_insert']}
+    assert missing_search_triggers(connection) == {}
+    assert Transaction.query.filter(search_condition('shell')).count() == 1
+
+    make_transaction(description='SHELL SELECT')
+    assert Transaction.query.filter(search_condition('shell')).count() == 2
+
+
+def test_repair_does_nothing_with_triggers_in_place(app):
+    assert repair_search_index(db.session.connection()) == {}
+
+
+def test_substring_search_folds_accented_capitals(app, make_transaction):
+    make_transaction(description='AÇOUGUE SÃO JOÃO')
+    make_transaction(description='ACOUGUE DO ZE')
+
+    assert [transaction.description for transaction in Transaction.query.filter(substring_condition('são j'))] == [
+        'AÇOUGUE SÃO JOÃO'
+    ]
+    assert Transaction.query.filter(substring_condition('açougue')).count() == 1
+    # Curto demais para o índice de trigramas
+    assert substring_condition('sã') is None
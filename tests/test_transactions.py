@@ -0,0 +1,158 @@
+import csv
+import io
+import json
+import re
+from datetime import datetime
+from html import unescape
+from urllib.parse import parse_qs, urlsplit
+import pytest
+from app import db
+from app.models import Category, Transaction
+from app.routes.transactions import EXPORT_COLUMNS
+from tests.conftest import keyword_rule, summary_rows
+
+
+@pytest.fixture
+def transactions(app, make_transaction):
+    category = Category(name='Mercado', is_expense=True)
+    db.session.add(category)
+    for month, description in ((3, 'SUPERMERCADO BOM PRECO'), (4, 'POSTO SHELL')):
+        make_transaction(date=datetime(2026, month, 10), amount_cents=-5000, description=description)
+    return category
+
+
+@pytest.mark.parametrize('search', ['"', '!!!', '" "'])
+def test_filter_with_search_without_terms_is_rejected(client, transactions, search):
+    response = client.post('/transactions/categories', json={
+        'filter': {'q': search}, 'category_id': transactions.id
+    })
+
+    assert response.status_code == 400
+    assert Transaction.query.filter(Transaction.category_id.isnot(None)).count() == 0
+
+
+def test_empty_filter_requires_all(client, transactions):
+    response = client.post('/transactions/categories', json={'filter': {}, 'category_id': transactions.id})
+    assert response.status_code == 400
+    assert Transaction.query.filter(Transaction.category_id.isnot(None)).count() == 0
+
+    response = client.post('/transactions/categories', json={
+        'filter': {'all': True}, 'category_id': transactions.id
+    })
+    assert response.status_code == 200
+    assert response.get_json()['updated'] == 2
+
+
+def test_filter_moves_only_matching_transactions(client, transactions):
+    response = client.post('/transactions/categories', json={
+        'filter': {'q': 'supermercado'}, 'category_id': transactions.id
+    })
+
+    assert response.status_code == 200
+    assert response.get_json()['updated'] == 1
+    moved = Transaction.query.filter(Transaction.category_id == transactions.id).one()
+    assert (moved.description, moved.categorized_by) == ('SUPERMERCADO BOM PRECO', 'manual')
+
+
+def test_recategorize_dry_run_does_not_write(client, make_transaction):
+    category = keyword_rule('Padaria', 'padaria')
+    for description in ('PADARIA CENTRAL', 'PADARIA DO ZE', 'POSTO SHELL'):
+        make_transaction(description=description)
+    summary = summary_rows()
+
+    response = client.get('/transactions/recategorize?dry_run=1')
+
+    assert response.get_json() == {
+        'dry_run': True,
+        'scanned': 3,
+        'categorized': 2,
+        'categories': [{'id': category.id, 'name': 'Padaria', 'count': 2}],
+    }
+    db.session.expire_all()
+    assert Transaction.query.filter(Transaction.category_id.isnot(None)).count() == 0
+    assert summary_rows() == summary
+
+    assert client.get('/transactions/recategorize').status_code == 302
+    db.session.expire_all()
+    assert Transaction.query.filter(Transaction.category_id == category.id).count() == 2
+
+
+def transaction_page(client, **params):
+    """Ids da página, na ordem exibida, e os parâmetros dos links de página anterior e seguinte"""
+    html = client.get('/transactions/', query_string={'per_page': 3, **params}).get_data(as_text=True)
+    links = {}
+    for href, label in re.findall(r'<a href="([^"]+)"[^>]*>(Página anterior|Próxima página)</a>', html):
+        query = parse_qs(urlsplit(unescape(href)).query)
+        links[label] = {name: query[name][0] for name in ('cursor', 'before') if name in query}
+    ids = [int(id) for id in re.findall(r'data-transaction-id="(\d+)"', html)]
+    return ids, links.get('Página anterior'), links.get('Próxima página')
+
+
+def test_pagination_through_rows_with_the_same_date(client, make_transaction):
+    # Três dias com 4 transações cada: as páginas de 3 cortam os grupos da mesma data
+    for day in (10, 11, 12):
+        for _ in range(4):
+            make_transaction(date=datetime(2026, 3, day))
+    expected = [id for id, in db.session.query(Transaction.id)
+                .order_by(Transaction.date.desc(), Transaction.id.desc())]
+
+    pages, params = [], {}
+    while params is not None:
+        ids, previous, params = transaction_page(client, **params)
+        pages.append(ids)
+    assert [id for ids in pages for id in ids] == expected
+    assert [len(ids) for ids in pages] == [3, 3, 3, 3]
+
+    backward, params = [], previous
+    while params is not None:
+        ids, params, _ = transaction_page(client, **params)
+        backward.insert(0, ids)
+    assert backward == pages[:-1]
+
+
+@pytest.fixture
+def export_rows(app, transactions, make_transaction):
+    """Cinco transações, duas na categoria Mercado, exportadas em lotes de 2"""
+    app.config['EXPORT_BATCH_SIZE'] = 2
+    make_transaction(date=datetime(2026, 3, 12), description='AÇOUGUE, "BOI GORDO"',
+                     category_id=transactions.id, external_id='F1')
+    make_transaction(date=datetime(2026, 3, 15), amount_cents=250000, description='SALARIO')
+    make_transaction(date=datetime(2026, 4, 2), amount_cents=-1999, description='PADARIA',
+                     category_id=transactions.id)
+    return [
+        {'id': transaction.id, 'date': transaction.date.isoformat(), 'description': transaction.description,
+         'amount': str(transaction.amount), 'category_id': transaction.category_id,
+         'category': 'Mercado' if transaction.category_id else None, 'account_id': '123',
+         'external_id': transaction.external_id, 'source_filename': 'extrato.ofx'}
+        for transaction in Transaction.query.order_by(Transaction.date.desc(), Transaction.id.desc())
+    ]
+
+
+def test_export_csv(client, export_rows):
+    response = client.get('/transactions/export')
+
+    assert response.is_streamed
+    assert response.mimetype == 'text/csv'
+    assert response.headers['Content-Disposition'] == 'attachment; filename=transacoes.csv'
+    text = response.get_data(as_text=True)
+    assert text.splitlines()[0] == ','.join(EXPORT_COLUMNS)
+    assert list(csv.DictReader(io.StringIO(text))) == [
+        {name: '' if value is None else str(value) for name, value in row.items()} for row in export_rows
+    ]
+
+
+def test_export_ndjson(client, export_rows):
+    response = client.get('/transactions/export?format=ndjson')
+
+    assert response.is_streamed
+    assert response.mimetype == 'application/x-ndjson'
+    assert [json.loads(line) for line in response.get_data(as_text=True).splitlines()] == export_rows
+
+
+def test_export_applies_the_list_filters(client, transactions, export_rows):
+    response = client.get(f'/transactions/export?format=ndjson&month=3&category_id={transactions.id}')
+
+    assert [json.loads(line)['description'] for line in response.get_data(as_text=True).splitlines()] == [
+        'AÇOUGUE, "BOI GORDO"'
+    ]
+    assert client.get('/transactions/export?format=xml').status_code == 400